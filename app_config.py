@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+config.yaml Access
+Loads config.yaml once per process (PyYAML is optional: without it every
+section reads as empty and callers fall back to their defaults)
+"""
+
+from pathlib import Path
+
+try:
+    import yaml
+except ImportError:  # Optional - callers use their built-in defaults
+    yaml = None
+
+CONFIG_PATH = Path(__file__).resolve().parent / 'config.yaml'
+
+_config = None
+
+
+def load_config(path=CONFIG_PATH):
+    """The parsed config.yaml ({} if PyYAML or the file is missing)"""
+    global _config
+    if _config is None:
+        config = {}
+        if yaml is not None and Path(path).exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                config = yaml.safe_load(f) or {}
+        _config = config
+    return _config
+
+
+def config_section(*keys):
+    """Nested section, e.g. config_section('data_sources', 'csv_import'); {} if absent"""
+    section = load_config()
+    for key in keys:
+        section = section.get(key) if isinstance(section, dict) else None
+    return section if isinstance(section, dict) else {}
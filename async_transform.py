@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Async Booking Confirmation Transformer
+Same pipeline as CloudbedsTransformer on the async Anthropic client:
+rasterization, PNG encoding and other local work run in an executor while
+other documents' API calls are in flight, so one process can take a burst
+of bookings without a thread per booking
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from anthropic import AsyncAnthropic, BadRequestError
+
+from booking_schema import STRUCTURED_OUTPUTS_BETA, TEXT_SCHEMA, VISION_SCHEMA
+from claude_transform import CloudbedsTransformer, field_values, reply_values, strip_html_fences
+from extraction_cache import hash_document, hash_text
+from logo_asset import inline_logo
+from metrics import record_usage, span
+
+
+class AsyncCloudbedsTransformer:
+    """Async wrapper around CloudbedsTransformer's local steps + AsyncAnthropic"""
+
+    def __init__(self, api_key=None, debug=False, max_workers=None, **options):
+        """Accepts the same options as CloudbedsTransformer
+
+        max_workers bounds the executor used for CPU-bound and blocking local
+        work (poppler, PNG encoding, cache, rule-based parsing, text
+        preprocessing, rendering, file writes), so none of it runs on the
+        event loop. Validation (check_reply) stays on the loop: it only
+        walks one reply dict.
+        """
+        self.sync = CloudbedsTransformer(api_key=api_key, debug=debug, **options)
+        self.client = AsyncAnthropic(api_key=self.sync.api_key, max_retries=0) if self.sync.api_key else None
+        self.debug = debug
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or min(8, (os.cpu_count() or 1) + 2))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the HTTP client and executor"""
+        if self.client is not None:
+            await self.client.close()
+        self.executor.shutdown(wait=False)
+
+    def require_client(self):
+        """Fail clearly when a Claude API call is needed but no key is set"""
+        if self.client is None:
+            raise ValueError("ANTHROPIC_API_KEY not found in environment or .env file")
+
+    async def send_message(self, params):
+        """messages.create, via the beta endpoint when a structured output format is set"""
+        if "output_format" in params:
+            return await self.client.beta.messages.create(betas=[STRUCTURED_OUTPUTS_BETA], **params)
+        return await self.client.messages.create(**params)
+
+    async def create_message(self, params, call='api'):
+        """Send a request through the shared rate-limit scheduler (timed, tokens counted)"""
+        self.require_client()
+        with span('api_call', call=call):
+            message = await self.sync.scheduler.call_async(self.send_message, params, self.sync.priority)
+        record_usage(call, getattr(message, 'usage', None))
+        return message
+
+    async def run_local(self, fn, *args):
+        """Run blocking local work in the executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def extract_booking_data(self, pdf_path, pdf_mode=None):
+        """Extract booking data from PDF (text layer if usable, else Claude vision)"""
+        content_hash = await self.run_local(hash_document, pdf_path)
+        cache_key, cached = await self.run_local(self.sync.cached_extraction, content_hash, 'pdf')
+        if cached is not None:
+            return cached
+
+        text_content = await self.run_local(self.sync.usable_text_layer, pdf_path)
+        if text_content is not None:
+            booking_data = await self.extract_from_text(text_content)
+        else:
+            if self.debug:
+                print(f"Extracting booking data with Claude vision: {pdf_path}")
+            self.require_client()
+            # Read / rasterize + encode off the event loop while other requests are in flight
+            content_blocks = await self.run_local(self.sync.pdf_content, pdf_path, pdf_mode)
+            try:
+                message = await self.create_message(self.sync.vision_request(content_blocks),
+                                                    'vision_extraction')
+            except BadRequestError:
+                if content_blocks[0]["type"] != "document":
+                    raise
+                content_blocks = await self.run_local(self.sync.pdf_to_image_content, pdf_path)
+                message = await self.create_message(self.sync.vision_request(content_blocks),
+                                                    'vision_extraction')
+            self.sync.log_usage("Vision extraction", message)
+            booking_data = await self.validated(
+                reply_values(message.content[0].text), content_blocks, VISION_SCHEMA)
+
+        await self.run_local(self.sync.store_extraction, cache_key, booking_data)
+        return booking_data
+
+    async def extract_fields(self, source, fields):
+        """Ask Claude for just the named fields (targeted re-ask)"""
+        # Raw text sources are preprocessed while the request is built
+        params = await self.run_local(self.sync.fields_request, source, fields)
+        message = await self.create_message(params, 'field_reask')
+        self.sync.log_usage("Field re-ask", message)
+        return field_values(message, fields)
+
+    async def validated(self, values, source, schema):
+        """Validate a reply against the booking schema, re-asking only for failing fields"""
+        booking_data, failing = self.sync.check_reply(values, schema)
+        if failing:
+            values = dict(values, **await self.extract_fields(source, failing))
+            booking_data, _ = self.sync.check_reply(values, schema, reasked=True)
+        return booking_data
+
+    async def extract_from_text(self, text_content):
+        """Extract booking data from plain text (Cloudbeds rules first, then Claude API)"""
+        cache_key, cached = await self.run_local(
+            self.sync.cached_extraction, hash_text(text_content), 'text')
+        if cached is not None:
+            return cached
+
+        booking_data = None
+        if self.sync.use_rules:
+            booking_data, missing = await self.run_local(self.sync.rule_based_extraction, text_content)
+            if booking_data is not None and missing:
+                booking_data.update(await self.extract_fields(text_content, missing))
+
+        if booking_data is None:
+            prompt_text, params = await self.run_local(self.sync.text_extraction_request, text_content)
+            message = await self.create_message(params, 'text_extraction')
+            self.sync.log_usage("Text extraction", message)
+            booking_data = await self.validated(
+                reply_values(message.content[0].text), prompt_text, TEXT_SCHEMA)
+
+        await self.run_local(self.sync.store_extraction, cache_key, booking_data)
+        return booking_data
+
+    async def generate_html(self, booking_data):
+        """Generate branded HTML from the local templates (Claude if use_llm)"""
+        if not self.sync.use_llm:
+            return await self.run_local(self.sync.renderer.render, booking_data)
+
+        message = await self.create_message(self.sync.generation_request(booking_data), 'html_generation')
+        self.sync.log_usage("HTML generation", message)
+        return inline_logo(strip_html_fences(message.content[0].text))
+
+    async def generate_confirmation(self, booking_data):
+        """Generate confirmation HTML and return file paths (for web interface)"""
+        html_content = await self.generate_html(booking_data)
+        html_path = await self.run_local(self.sync.save_outputs, booking_data, html_content)
+        pdf_path = await self.run_local(self.sync.save_pdf, html_path, html_content)
+        return html_path, pdf_path
+
+    async def transform(self, pdf_path):
+        """Extract → generate → save one PDF, returning (booking_data, html_path, pdf_path)"""
+        booking_data = await self.extract_booking_data(pdf_path)
+        html_path, confirmation_pdf = await self.generate_confirmation(booking_data)
+        return booking_data, html_path, confirmation_pdf
+
+    async def transform_many(self, pdf_paths, concurrency=8, on_result=None):
+        """Transform many PDFs with at most `concurrency` in flight
+
+        Returns one result dict per input (same shape as batch_transform's);
+        on_result is called with each result as it completes.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def one(pdf_path):
+            async with semaphore:
+                start = time.perf_counter()
+                result = {'file': pdf_path, 'ok': False, 'res_id': '', 'guest': '',
+                          'output': None, 'pdf': None, 'error': ''}
+                try:
+                    booking_data, html_path, confirmation_pdf = await self.transform(pdf_path)
+                    result.update(ok=True, output=html_path, pdf=confirmation_pdf,
+                                  res_id=str(booking_data.get('res_id', '')),
+                                  guest=booking_data.get('guest_name', ''))
+                except Exception as e:
+                    result['error'] = f"{type(e).__name__}: {e}"
+                result['seconds'] = time.perf_counter() - start
+                if on_result is not None:
+                    on_result(result)
+                return result
+
+        return await asyncio.gather(*(one(path) for path in pdf_paths))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Batch Booking Confirmation Transformer
+Processes a folder (or glob) of Cloudbeds PDFs with a bounded worker pool,
+reporting each file as it finishes and a summary table at the end
+
+Usage:
+  python batch_transform.py                         # every PDF in inbox/
+  python batch_transform.py --input-dir season/ --concurrency 8
+  python claude_transform.py --input "inbox/*.pdf"  # same engine
+"""
+
+import argparse
+import glob
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+DEFAULT_INBOX = 'inbox'
+DEFAULT_CONCURRENCY = 4
+
+
+def collect_inputs(input_path=None, input_dir=None, pattern='*.pdf'):
+    """Resolve --input (file or glob) / --input-dir into a sorted list of PDFs"""
+    if input_dir:
+        paths = Path(input_dir).glob(pattern)
+    elif glob.has_magic(str(input_path)):
+        paths = (Path(p) for p in glob.glob(str(input_path), recursive=True))
+    else:
+        paths = [Path(input_path)]
+    return sorted({p for p in paths if p.is_file() and p.suffix.lower() == '.pdf'})
+
+
+def process_one(transformer, pdf_path):
+    """Extract → generate → save one PDF; never raises"""
+    start = time.perf_counter()
+    result = {'file': pdf_path, 'ok': False, 'res_id': '', 'guest': '', 'output': None, 'pdf': None,
+              'error': ''}
+    try:
+        booking_data = transformer.extract_booking_data(pdf_path)
+        result['res_id'] = str(booking_data.get('res_id', ''))
+        result['guest'] = booking_data.get('guest_name', '')
+        html_content = transformer.generate_html(booking_data)
+        result['output'] = transformer.save_outputs(booking_data, html_content)
+        result['pdf'] = transformer.save_pdf(result['output'], html_content)
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_batch(transformer, pdf_paths, concurrency=DEFAULT_CONCURRENCY):
+    """Transform PDFs concurrently, printing each result as it completes"""
+    results = []
+    total = len(pdf_paths)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(process_one, transformer, path) for path in pdf_paths]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            if result['ok']:
+                print(f"[{done}/{total}] ✓ {result['file'].name} → {result['output']} "
+                      f"({result['seconds']:.1f}s)")
+            else:
+                print(f"[{done}/{total}] ❌ {result['file'].name}: {result['error']}")
+    # Report in input order regardless of completion order
+    order = {path: idx for idx, path in enumerate(pdf_paths)}
+    return sorted(results, key=lambda r: order[r['file']])
+
+
+def print_summary(results, elapsed):
+    """Summary table of every file in the batch"""
+    name_width = min(max([len(r['file'].name) for r in results] + [4]), 50)
+    print()
+    print(f"{'File':<{name_width}}  {'Status':<6}  {'Res ID':<15}  {'Time':>6}  Output / Error")
+    print("-" * (name_width + 60))
+    for r in results:
+        status = 'OK' if r['ok'] else 'FAILED'
+        detail = str(r['output']) if r['ok'] else r['error']
+        print(f"{r['file'].name[:name_width]:<{name_width}}  {status:<6}  {r['res_id'][:15]:<15}  "
+              f"{r['seconds']:>5.1f}s  {detail}")
+
+    failed = sum(1 for r in results if not r['ok'])
+    rate = len(results) / elapsed if elapsed else 0
+    print("-" * (name_width + 60))
+    print(f"{len(results) - failed} succeeded, {failed} failed in {elapsed:.1f}s "
+          f"({rate:.2f} files/sec)")
+    return failed
+
+
+def main(argv=None):
+    """Process every PDF in inbox/ (accepts all claude_transform.py options)"""
+    from claude_transform import main as transform_main
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Only the input options matter here; the rest (and --help) go to claude_transform
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--input', '-i')
+    parser.add_argument('--input-dir')
+    inputs, _ = parser.parse_known_args(argv)
+    if inputs.input is None and inputs.input_dir is None:
+        argv = ['--input-dir', DEFAULT_INBOX] + argv
+    transform_main(argv)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+CSV Bulk Import Benchmark
+Writes a synthetic Cloudbeds export (a quarter of the reservations are
+multi-room, with their rows a few lines apart), then measures csv_import.py:
+parsing + grouping + validation alone with its peak memory for two export
+sizes (the row buffer is fixed; only the set of finished reservation ids
+grows), and the full run rendering every confirmation to HTML
+
+Usage: python benchmarks/csv_bulk_import.py [--reservations 5000] [--buffer-rows 1000]
+"""
+
+import argparse
+import csv
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from csv_import import CsvImporter, import_csv, import_settings  # noqa: E402
+
+HEADER = ['Reservation ID', 'Guest Name', 'Guest Email', 'Phone', 'Country', 'Check In', 'Check Out',
+          'Room', 'Adults', 'Children', 'Room Total', 'Total Amount', 'Amount Paid', 'Balance Due', 'Source']
+ROOMS = ['The Garden Suite', 'The Sunbird Suite', 'The Oriole Room']
+
+
+def write_export(path, reservations, seed=7):
+    """Synthetic export; rows of multi-room reservations are interleaved with others"""
+    rng = random.Random(seed)
+    start = datetime(2025, 11, 1)
+    pending = []
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for n in range(reservations):
+            check_in = start + timedelta(days=rng.randrange(150))
+            nights = rng.randint(1, 7)
+            rooms = rng.sample(ROOMS, 2 if n % 4 == 0 else 1)
+            rates = [rng.choice((120, 135, 150)) * nights for _ in rooms]
+            total = sum(rates)
+            paid = rng.choice((0, total // 2, total))
+            for room, rate in zip(rooms, rates):
+                pending.append([f"{4400000 + n}", f"Guest {n}", f"guest{n}@example.com", '+44 7700 900123',
+                                'United Kingdom', check_in.strftime('%d/%m/%Y'),
+                                (check_in + timedelta(days=nights)).strftime('%d/%m/%Y'), room,
+                                2, rng.randint(0, 1), rate, total, paid, total - paid,
+                                rng.choice(('Direct', 'Booking.com', 'Website'))])
+            if len(pending) >= 6:
+                rng.shuffle(pending)
+                writer.writerows(pending[:3])
+                del pending[:3]
+        writer.writerows(pending)
+
+
+def parse_only(path, buffer_rows):
+    """(reservations/s, peak KB, counts) for grouping + validation without rendering"""
+    importer = CsvImporter(import_settings(), buffer_rows)
+    start = time.perf_counter()
+    count = sum(1 for _ in importer.bookings([path]))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()  # Separate pass: tracing slows parsing down several times
+    sum(1 for _ in CsvImporter(import_settings(), buffer_rows).bookings([path]))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count / elapsed, peak / 1024, importer.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming CSV importer")
+    parser.add_argument('--reservations', type=int, default=5000)
+    parser.add_argument('--buffer-rows', type=int, default=1000)
+    args = parser.parse_args()
+
+    from claude_transform import CloudbedsTransformer
+
+    work_dir = Path(tempfile.mkdtemp(prefix='csv_bench_'))
+    print(f"{'Export':<22} {'Rows':>8} {'Parse res/s':>12} {'Peak KB':>9}")
+    print("-" * 54)
+    for size in (args.reservations, args.reservations * 4):
+        path = work_dir / f"export_{size}.csv"
+        write_export(path, size)
+        rate, peak_kb, counts = parse_only(path, args.buffer_rows)
+        print(f"{f'{size} reservations':<22} {counts['rows']:>8} {rate:>12.0f} {peak_kb:>9.0f}")
+
+    transformer = CloudbedsTransformer(make_pdf=False)
+    transformer.output_dir = work_dir / 'output'
+    transformer.output_dir.mkdir()
+    start = time.perf_counter()
+    counts = import_csv(transformer, [work_dir / f"export_{args.reservations}.csv"],
+                        CsvImporter(import_settings(), args.buffer_rows), progress_every=0)
+    elapsed = time.perf_counter() - start
+    print(f"\nRendered {counts['saved']} confirmations in {elapsed:.1f}s "
+          f"({counts['saved'] / elapsed:.0f}/s, skipped {counts['skipped']}) → {transformer.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
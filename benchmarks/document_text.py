@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Word Document Extraction Benchmark
+Docs/sec for the streaming DOCX reader vs. the python-docx walk the web
+interface used to do (when python-docx is installed), and for the process
+pool with several documents in flight
+
+Usage: python benchmarks/document_text.py [path/to/voucher.docx] [--seconds 3] [--workers 2]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from document_text import docx_text, extract_text  # noqa: E402
+
+SAMPLE = (Path(__file__).resolve().parent.parent / '.reference' / 'Before'
+          / 'Hotel booking voucher -Josefine Family -The Planters House (4).docx')
+
+
+def python_docx_text(path):
+    """The previous extraction: paragraphs, then every table cell via python-docx"""
+    from docx import Document
+
+    doc = Document(path)
+    text_parts = [para.text for para in doc.paragraphs if para.text.strip()]
+    for table in doc.tables:
+        for row in table.rows:
+            row_text = ' | '.join([cell.text.strip() for cell in row.cells if cell.text.strip()])
+            if row_text:
+                text_parts.append(row_text)
+    return '\n'.join(text_parts)
+
+
+def rate(fn, seconds, workers=1):
+    """Calls/sec of fn from `workers` threads"""
+    def run():
+        count = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            fn()
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        total = sum(executor.map(lambda _: run(), range(workers)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Word document text extraction")
+    parser.add_argument('path', nargs='?', default=str(SAMPLE))
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DOCUMENT_WORKERS', str(args.workers))
+    text = docx_text(args.path)
+    print(f"{Path(args.path).name}: {len(text)} characters\n")
+    print(f"{'Method':<34} {'Docs/s':>10}")
+    print("-" * 45)
+    print(f"{'Streaming XML (in process)':<34} {rate(lambda: docx_text(args.path), args.seconds):>10.1f}")
+    try:
+        legacy = python_docx_text(args.path)
+    except ImportError:
+        print(f"{'python-docx':<34} {'not installed':>10}")
+    else:
+        print(f"{'python-docx':<34} {rate(lambda: python_docx_text(args.path), args.seconds):>10.1f}"
+              f"   ({len(legacy)} characters)")
+    extract_text(args.path)  # Start the pool workers outside the measurement
+    print(f"{f'Process pool x{args.workers}':<34} "
+          f"{rate(lambda: extract_text(args.path), args.seconds, args.workers * 2):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
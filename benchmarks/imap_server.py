@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Local IMAP Stand-In
+Minimal read-only IMAP4rev1 server holding a synthetic mailbox (every Nth
+message carries a PDF attachment, the rest are plain replies), then runs a
+full catch-up of mail_ingest.py against it followed by an incremental sync
+that should find nothing new. By default attachments are only parsed and
+recorded, so the numbers cover IMAP sync and MIME parsing, not API calls
+
+Usage: python benchmarks/imap_server.py [--messages 5000] [--pdf-every 3] [--batch-size 100]
+       python benchmarks/imap_server.py --transform      (also run the pipeline)
+       python benchmarks/imap_server.py --serve [--port 1143]   (server only)
+"""
+
+import argparse
+import re
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from email.message import EmailMessage
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+UIDVALIDITY = 1
+FAKE_PDF = (b"%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+            b"2 0 obj << /Type /Pages /Kids [] /Count 0 >> endobj\n" + b"% padding\n" * 4000
+            + b"trailer << /Root 1 0 R >>\n%%EOF\n")
+COMMAND_PATTERN = re.compile(r'^(\S+) (?:(UID) )?(\S+) ?(.*)$', re.IGNORECASE)
+
+
+def build_mailbox(count, pdf_every, pdf_bytes=FAKE_PDF):
+    """[(uid, raw message, raw Content-Type header)] with every pdf_every-th message carrying a PDF"""
+    messages = []
+    for uid in range(1, count + 1):
+        message = EmailMessage()
+        message['From'] = 'reservations@cloudbeds.example'
+        message['To'] = 'bookings@plantershouse.example'
+        message['Subject'] = f"Reservation {100000 + uid}"
+        message['Message-ID'] = f"<{uid}@stand-in.example>"
+        message.set_content(f"Booking {100000 + uid} for Guest {uid}.\n" * 20)
+        if pdf_every and uid % pdf_every == 0:
+            message.add_attachment(pdf_bytes, maintype='application', subtype='pdf',
+                                   filename=f"reservation-{100000 + uid}.pdf")
+        raw = message.as_bytes().replace(b'\r\n', b'\n').replace(b'\n', b'\r\n')
+        header_block = raw.split(b'\r\n\r\n', 1)[0] + b'\r\n'
+        content_type = re.search(rb'^Content-Type:.*\r\n(?:[ \t].*\r\n)*', header_block,
+                                 re.IGNORECASE | re.MULTILINE)
+        messages.append((uid, raw, (content_type.group(0) if content_type else b'') + b'\r\n'))
+    return messages
+
+
+def parse_set(text, highest):
+    """UIDs matched by an IMAP sequence set like '1:3,7,9:*'"""
+    uids = set()
+    for part in text.split(','):
+        low, _, high = part.partition(':')
+        low = highest if low == '*' else int(low)
+        high = low if not high else (highest if high == '*' else int(high))
+        uids.update(range(min(low, high), max(low, high) + 1))
+    return uids
+
+
+class ImapStandIn(socketserver.ThreadingTCPServer):
+    """Read-only single-mailbox IMAP server"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, messages):
+        super().__init__(address, ImapHandler)
+        self.messages = messages
+        self.by_uid = {uid: (seq, raw, header) for seq, (uid, raw, header) in enumerate(messages, 1)}
+        self.commands = 0
+
+
+class ImapHandler(socketserver.StreamRequestHandler):
+    def send(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.send("* OK [CAPABILITY IMAP4rev1] stand-in ready")
+        for raw_line in self.rfile:
+            match = COMMAND_PATTERN.match(raw_line.decode('utf-8', 'replace').rstrip('\r\n'))
+            if not match:
+                self.send("* BAD unparsable command")
+                continue
+            tag, uid, command, args = match.groups()
+            command = command.upper()
+            self.server.commands += 1
+            if command == 'CAPABILITY':
+                self.send("* CAPABILITY IMAP4rev1")
+            elif command in ('LOGIN', 'NOOP', 'CLOSE'):
+                pass
+            elif command == 'LOGOUT':
+                self.send("* BYE logging out")
+                self.send(f"{tag} OK LOGOUT completed")
+                return
+            elif command in ('SELECT', 'EXAMINE'):
+                messages = self.server.messages
+                self.send(f"* {len(messages)} EXISTS")
+                self.send("* 0 RECENT")
+                self.send(f"* OK [UIDVALIDITY {UIDVALIDITY}] UIDs valid")
+                self.send(f"* OK [UIDNEXT {messages[-1][0] + 1 if messages else 1}] next UID")
+                self.send(f"{tag} OK [READ-ONLY] {command} completed")
+                continue
+            elif uid and command == 'SEARCH':
+                self.search(args)
+            elif uid and command == 'FETCH':
+                self.fetch(args)
+            else:
+                self.send(f"{tag} BAD {command} not supported")
+                continue
+            self.send(f"{tag} OK {command} completed")
+
+    def search(self, args):
+        criteria = args.split()
+        highest = self.server.messages[-1][0] if self.server.messages else 0
+        if len(criteria) == 2 and criteria[0].upper() == 'UID':
+            uids = sorted(uid for uid in parse_set(criteria[1], highest) if uid in self.server.by_uid)
+        else:
+            uids = sorted(self.server.by_uid)
+        self.send("* SEARCH" + ''.join(f" {uid}" for uid in uids))
+
+    def fetch(self, args):
+        uid_text, _, items = args.partition(' ')
+        highest = self.server.messages[-1][0] if self.server.messages else 0
+        headers_only = 'HEADER.FIELDS' in items.upper()
+        name = 'BODY[HEADER.FIELDS (CONTENT-TYPE)]' if headers_only else 'BODY[]'
+        for uid in sorted(parse_set(uid_text, highest)):
+            if uid not in self.server.by_uid:
+                continue
+            seq, raw, header = self.server.by_uid[uid]
+            literal = header if headers_only else raw
+            self.wfile.write(f"* {seq} FETCH (UID {uid} {name} {{{len(literal)}}}\r\n".encode('ascii'))
+            self.wfile.write(literal)
+            self.wfile.write(b")\r\n")
+
+
+def run_catch_up(port, args):
+    from mail_ingest import DONE, SKIPPED, MailIngestor, MailState, pdf_attachments
+
+    class ParseOnlyIngestor(MailIngestor):
+        """Finds and records attachments without running the pipeline"""
+
+        def process_message(self, uid, raw_message):
+            attachments = list(pdf_attachments(raw_message))
+            self.count(pdfs=len(attachments))
+            self.state.mark(self.mailbox, [uid], DONE if attachments else SKIPPED, len(attachments))
+
+    ingestor_class, transformer = ParseOnlyIngestor, object()
+    if args.transform:
+        from claude_transform import CloudbedsTransformer
+        from request_scheduler import BATCH
+        ingestor_class, transformer = MailIngestor, CloudbedsTransformer(priority=BATCH)
+
+    state = MailState(Path(tempfile.mkdtemp(prefix='mail_state_')) / 'mail_state.db')
+    for label in ('Catch-up', 'Incremental'):
+        ingestor = ingestor_class(transformer, '127.0.0.1', port, 'bench', 'bench', use_ssl=False, state=state,
+                                  batch_size=args.batch_size, concurrency=args.concurrency)
+        start = time.perf_counter()
+        counts = ingestor.sync()
+        seconds = time.perf_counter() - start
+        print(f"{label:<12} {counts['messages']:>6} messages  {counts['pdfs']:>5} PDFs  {seconds:>7.2f}s  "
+              f"{counts['messages'] / seconds if seconds else 0:>8.0f} msg/s")
+    print(f"State: {state.counts()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local IMAP stand-in + mail ingestion catch-up benchmark")
+    parser.add_argument('--port', type=int, default=1143)
+    parser.add_argument('--serve', action='store_true', help='Only run the server')
+    parser.add_argument('--messages', type=int, default=5000, help='Messages in the mailbox')
+    parser.add_argument('--pdf-every', type=int, default=3, help='Every Nth message has a PDF attached')
+    parser.add_argument('--batch-size', type=int, default=100, help='UIDs per fetch')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--transform', action='store_true', help='Run attachments through the pipeline')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    messages = build_mailbox(args.messages, args.pdf_every)
+    size_mb = sum(len(raw) for _, raw, _ in messages) / 1024 / 1024
+    print(f"Mailbox: {len(messages)} messages, {size_mb:.1f} MB (built in {time.perf_counter() - start:.1f}s)")
+
+    server = ImapStandIn(('127.0.0.1', args.port), messages)
+    if args.serve:
+        print(f"IMAP stand-in on 127.0.0.1:{args.port} (plain, any login; use --no-ssl)")
+        server.serve_forever()
+        return
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        run_catch_up(args.port, args)
+    finally:
+        server.shutdown()
+    print(f"Server: {server.commands} IMAP commands")
+
+
+if __name__ == '__main__':
+    main()
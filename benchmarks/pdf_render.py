@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+PDF Rendering Benchmark
+PDFs/sec for the single-room direct and three-room agent confirmations: a
+fresh WeasyPrint renderer per document (cold) vs. the warm renderer pool,
+and the pool with several worker threads
+
+Usage: python benchmarks/pdf_render.py [--seconds 5] [--workers 2]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from confirmation_renderer import ConfirmationRenderer  # noqa: E402
+from pdf_renderer import PdfRenderer, PdfRendererPool, pdf_available  # noqa: E402
+from template_render import SINGLE_ROOM, THREE_ROOM_AGENT  # noqa: E402
+
+
+def run_for(fn, seconds):
+    """Call fn repeatedly for ~seconds, returning the number of calls"""
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        fn()
+        count += 1
+    return count
+
+
+def measure(fn, seconds, workers=1):
+    """Calls/sec of fn, from `workers` threads at once"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        count = sum(executor.map(lambda _: run_for(fn, seconds), range(workers)))
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML-to-PDF rendering")
+    parser.add_argument('--seconds', type=float, default=5.0, help='Time per measurement')
+    parser.add_argument('--workers', type=int, default=2, help='Threads / pooled renderers')
+    args = parser.parse_args()
+
+    if not pdf_available():
+        print("WeasyPrint is not installed: pip install weasyprint")
+        sys.exit(1)
+
+    renderer = ConfirmationRenderer()
+    pool = PdfRendererPool(size=args.workers)
+    out_dir = Path(tempfile.mkdtemp(prefix='pdf_bench_'))
+
+    print(f"{'Confirmation':<22} {'Cold PDFs/s':>12} {'Warm PDFs/s':>12} "
+          f"{f'Pool x{args.workers} PDFs/s':>16} {'PDF KB':>8}")
+    print("-" * 74)
+    for label, booking in (("1 room, direct", SINGLE_ROOM), ("3 rooms, agent", THREE_ROOM_AGENT)):
+        html = renderer.render(booking)
+        pdf_path = out_dir / f"{booking['res_id']}.pdf"
+
+        cold = measure(lambda: PdfRenderer().render(html, pdf_path), args.seconds)
+        warm_renderer = PdfRenderer()
+        warm = measure(lambda: warm_renderer.render(html, pdf_path), args.seconds)
+        pooled = measure(
+            lambda: pool.render(html, out_dir / f"{booking['res_id']}_{time.perf_counter_ns()}.pdf"),
+            args.seconds, args.workers)
+
+        print(f"{label:<22} {cold:>12.2f} {warm:>12.2f} {pooled:>16.2f} "
+              f"{pdf_path.stat().st_size / 1024:>8.0f}")
+
+    print(f"\nPDFs written to {out_dir}")
+
+
+if __name__ == '__main__':
+    main()
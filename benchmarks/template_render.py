@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Template Rendering Benchmark
+Renders/sec for the single-room direct and three-room agent confirmations,
+compiled+cached engine vs. re-reading the file and chaining .replace() calls
+
+Usage: python benchmarks/template_render.py [--seconds 2]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from confirmation_renderer import ConfirmationRenderer  # noqa: E402
+
+SINGLE_ROOM = {
+    "booking_type": "direct",
+    "guest_name": "Meagan Gunn",
+    "email": "meagan@example.com",
+    "phone": "+61 428 514 491",
+    "nationality": "Australian",
+    "res_id": "5405998299727",
+    "check_in": "10/01/2026",
+    "check_out": "11/01/2026",
+    "nights": 1,
+    "rooms": [
+        {"room_name": "The Sunbird Suite", "adults": 2, "children": 2,
+         "rate_per_night": 370, "total_rate": 370}
+    ],
+    "total_amount": 370,
+    "deposit_amount": 185,
+    "amount_paid": 0,
+    "balance_due": 370,
+    "booking_via": "Direct",
+    "heard_about": "TBC",
+}
+
+THREE_ROOM_AGENT = {
+    "booking_type": "agent",
+    "guest_name": "Harriet Josefine",
+    "nationality": "Danish",
+    "res_id": "SLIL1144",
+    "check_in": "01/01/2026",
+    "check_out": "03/01/2026",
+    "nights": 2,
+    "rooms": [
+        {"room_name": "The Sunbird Suite", "adults": 2, "children": 0,
+         "rate_per_night": 148.05, "total_rate": 296.10},
+        {"room_name": "The Bunk Room", "adults": 0, "children": 2,
+         "rate_per_night": 0, "total_rate": 0},
+        {"room_name": "The Oriole Room", "adults": 2, "children": 0,
+         "rate_per_night": 110, "total_rate": 220},
+    ],
+    "total_amount": 516.10,
+    "agent_info": {
+        "agent_name": "Sri Lanka in Luxury Travels",
+        "agent_contact": "Rangila",
+        "agent_email": "reservations@srilankainluxury.com",
+        "tour_reference": "SLIL1144",
+        "voucher_number": "SLIL1144-002",
+    },
+}
+
+
+def naive_render(renderer, booking_data):
+    """Baseline: read the file and .replace() each placeholder in turn"""
+    with open(renderer.template_dir / renderer.template_name(booking_data), 'r', encoding='utf-8') as f:
+        html = f.read()
+    for name, value in renderer.build_context(booking_data).items():
+        html = html.replace('{{' + name + '}}', value)
+    return html
+
+
+def measure(fn, seconds):
+    """Call fn repeatedly for ~seconds, returning calls/sec"""
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            fn()
+        count += 100
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark confirmation template rendering")
+    parser.add_argument('--seconds', type=float, default=2.0, help='Time per measurement')
+    args = parser.parse_args()
+
+    cached = ConfirmationRenderer()
+    hot_reload = ConfirmationRenderer(hot_reload=True)
+
+    print(f"{'Case':<22} {'Mode':<22} {'Renders/sec':>12}")
+    print("-" * 58)
+    for label, booking in (("single-room direct", SINGLE_ROOM), ("three-room agent", THREE_ROOM_AGENT)):
+        assert cached.render(booking) == naive_render(cached, booking)
+        modes = (
+            ("read + .replace()", lambda: naive_render(cached, booking)),
+            ("compiled (hot reload)", lambda: hot_reload.render(booking)),
+            ("compiled (cached)", lambda: cached.render(booking)),
+        )
+        for mode, fn in modes:
+            print(f"{label:<22} {mode:<22} {measure(fn, args.seconds):>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
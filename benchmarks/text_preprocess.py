@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Text Preprocessing Benchmark
+Input tokens of the text extraction prompt before and after text_preprocess,
+reported separately for the reference samples in .reference/Before (the
+Word voucher, and the PDF text layers when pypdf is installed) and for a
+synthetic case built from the voucher: our rate terms pasted in and its
+header repeated per page, the way agents sometimes forward them. Clean
+reference documents have little to remove (the voucher: 541 -> 540), so the
+saving shown for the synthetic case is not expected on them. Counts are the ~4 chars/token
+estimate; with ANTHROPIC_API_KEY set the prompts are counted with the token
+counting API instead
+
+Usage: python benchmarks/text_preprocess.py [--budget 3000] [--no-api]
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from document_text import docx_text  # noqa: E402
+from pdf_text import extract_pdf_text  # noqa: E402
+from text_preprocess import CHARS_PER_TOKEN, prepare_text  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+BEFORE = ROOT / '.reference' / 'Before'
+VOUCHER = BEFORE / 'Hotel booking voucher -Josefine Family -The Planters House (4).docx'
+TERMS = sorted((ROOT / 'docs').glob('*_terms.txt'))
+
+
+def forwarded(text, pages=3):
+    """The voucher as a forwarded email: split into pages with a repeated header, terms pasted below"""
+    header = "HOTEL BOOKING VOUCHER - PLEASE PRESENT AT CHECK-IN"
+    lines = text.splitlines()
+    size = max(len(lines) // pages, 1)
+    parts = []
+    for page, start in enumerate(range(0, len(lines), size), 1):
+        parts += [header, "   ", *lines[start:start + size], "", f"Page {page} of {pages}", "\r\n"]
+    for path in TERMS:
+        parts.append(path.read_text(encoding='utf-8').replace('\n', '\n\n'))
+    return '\n'.join(parts)
+
+
+def reference_samples():
+    """(name, text) for every reference sample readable here"""
+    yield VOUCHER.name, docx_text(VOUCHER)
+    for path in sorted(BEFORE.glob('*.pdf')):
+        text = extract_pdf_text(path)
+        if text:
+            yield path.name, text
+        else:
+            print(f"⚠️  {path.name}: no text layer (pypdf not installed?), skipped")
+
+
+def synthetic_samples():
+    yield 'Voucher + rate terms + repeated headers', forwarded(docx_text(VOUCHER))
+
+
+def api_counter():
+    """Exact prompt token counter via the API, or None without a key / SDK"""
+    if not os.getenv('ANTHROPIC_API_KEY'):
+        return None
+    try:
+        import anthropic
+        from claude_transform import DEFAULT_MODEL, TEXT_INPUT_PREFIX
+    except ImportError:
+        return None
+    client = anthropic.Anthropic()
+    model = os.getenv('CLAUDE_MODEL', DEFAULT_MODEL)
+
+    def count(text):
+        return client.messages.count_tokens(
+            model=model, messages=[{"role": "user", "content": TEXT_INPUT_PREFIX + text}]).input_tokens
+    return count
+
+
+def report(title, samples, budget, counter):
+    """Before / after table for the samples, with a total row"""
+    print(f"\n{title}")
+    print(f"{'Sample':<46} {'Before':>7} {'After':>7} {'Saved':>6}  Removed (boilerplate/dup/budget)")
+    print("-" * 105)
+    before_total = after_total = 0
+    for name, text in samples:
+        stats = {}
+        prepared = prepare_text(text, budget=budget, stats=stats)
+        before, after = stats['original_tokens'], stats['tokens']
+        if counter:
+            before, after = counter(text), counter(prepared)
+        before_total += before
+        after_total += after
+        print(f"{name[:46]:<46} {before:>7} {after:>7} {1 - after / before:>6.0%}  "
+              f"{stats['boilerplate_lines']}/{stats['duplicate_lines']}/{stats['budget_lines']} lines")
+    print("-" * 105)
+    print(f"{'Total':<46} {before_total:>7} {after_total:>7} {1 - after_total / before_total:>6.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark token reduction of text preprocessing")
+    parser.add_argument('--budget', type=int, default=None, help="Token budget (default TEXT_TOKEN_BUDGET)")
+    parser.add_argument('--no-api', action='store_true', help="Estimates only, no token counting API")
+    args = parser.parse_args()
+
+    counter = None if args.no_api else api_counter()
+    report("Reference samples (.reference/Before)", reference_samples(), args.budget, counter)
+    report("Synthetic (not a reference sample)", synthetic_samples(), args.budget, counter)
+    print(f"\nTokens: {'counted with the token counting API' if counter else f'estimated, {CHARS_PER_TOKEN} chars per token'}")
+
+
+if __name__ == '__main__':
+    main()
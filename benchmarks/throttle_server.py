@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Throttling Fake Messages API
+Local stand-in for /v1/messages that enforces its own requests-per-minute
+limit (429 + retry-after) and randomly reports overload (529), then drives a
+burst of interactive and batch calls through the request scheduler against
+it and reports retries, queueing and latency per priority
+
+Usage: python benchmarks/throttle_server.py [--requests 40] [--server-rpm 30] [--overload 0.1]
+       python benchmarks/throttle_server.py --serve [--port 8765]   (server only)
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+REPLY = {"guest_name": "Test Guest", "res_id": "TEST-1", "check_in": "01/12/2025",
+         "check_out": "03/12/2025"}
+
+
+class ThrottlingServer(ThreadingHTTPServer):
+    """Messages API fake with a server-side RPM limit and random overloads"""
+
+    daemon_threads = True
+
+    def __init__(self, address, rpm=30, overload=0.1, latency=0.2, window=60.0):
+        super().__init__(address, MessagesHandler)
+        self.rpm = rpm
+        self.window = window
+        self.overload = overload
+        self.latency = latency
+        self.accepted = deque()
+        self.lock = threading.Lock()
+        self.counts = {'ok': 0, '429': 0, '529': 0}
+
+    def admit(self):
+        """'ok', or the status to throttle with"""
+        now = time.monotonic()
+        with self.lock:
+            while self.accepted and now - self.accepted[0] >= self.window:
+                self.accepted.popleft()
+            if len(self.accepted) >= self.rpm:
+                self.counts['429'] += 1
+                return '429'
+            if random.random() < self.overload:
+                self.counts['529'] += 1
+                return '529'
+            self.accepted.append(now)
+            self.counts['ok'] += 1
+            return 'ok'
+
+
+class MessagesHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.startswith('/v1/messages'):
+            return self.reply(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+
+        outcome = self.server.admit()
+        if outcome == '429':
+            return self.reply(429, {"type": "error", "error": {"type": "rate_limit_error",
+                                                               "message": "Too many requests"}},
+                              {'retry-after': '2'})
+        if outcome == '529':
+            return self.reply(529, {"type": "error", "error": {"type": "overloaded_error",
+                                                               "message": "Overloaded"}})
+
+        time.sleep(self.server.latency)
+        self.reply(200, {
+            "id": f"msg_fake_{time.time_ns()}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get('model', 'fake'),
+            "content": [{"type": "text", "text": json.dumps(REPLY)}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 800, "output_tokens": 120},
+        })
+
+
+def run_burst(port, total, concurrency):
+    """Fire total requests (every fourth interactive) through the scheduler"""
+    os.environ['ANTHROPIC_BASE_URL'] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'fake-key')
+    from claude_transform import CloudbedsTransformer
+    from request_scheduler import BATCH, INTERACTIVE, get_scheduler
+
+    scheduler = get_scheduler()
+    transformers = {priority: CloudbedsTransformer(use_cache=False, structured=False,
+                                                   priority=priority, scheduler=scheduler)
+                    for priority in (INTERACTIVE, BATCH)}
+    params = transformers[BATCH].text_request("Reservation TEST-1 for Test Guest, 1-3 December 2025")
+
+    def one(idx):
+        priority = INTERACTIVE if idx % 4 == 0 else BATCH
+        start = time.perf_counter()
+        try:
+            transformers[priority].create_message(params)
+            ok = True
+        except Exception as e:
+            print(f"❌ request {idx}: {e}")
+            ok = False
+        return priority, ok, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+
+    for priority in (INTERACTIVE, BATCH):
+        latencies = sorted(seconds for p, ok, seconds in results if p == priority and ok)
+        failed = sum(1 for p, ok, _ in results if p == priority and not ok)
+        if latencies:
+            print(f"{priority:<12} ok {len(latencies):>3}  failed {failed:>3}  "
+                  f"median {latencies[len(latencies) // 2]:>6.2f}s  max {latencies[-1]:>6.2f}s")
+    print(f"Scheduler: {scheduler.stats.snapshot()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake throttling Messages API + scheduler burst test")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--serve', action='store_true', help='Only run the server')
+    parser.add_argument('--server-rpm', type=int, default=30, help='Requests per window before 429s')
+    parser.add_argument('--window', type=float, default=60.0, help='Server rate-limit window in seconds')
+    parser.add_argument('--overload', type=float, default=0.1, help='Share of requests answered 529')
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds per successful reply')
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    server = ThrottlingServer(('127.0.0.1', args.port), args.server_rpm, args.overload, args.latency,
+                              args.window)
+    if args.serve:
+        print(f"Fake Messages API on http://127.0.0.1:{args.port} "
+              f"(rpm {args.server_rpm}, overload {args.overload:.0%})")
+        server.serve_forever()
+        return
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        run_burst(args.port, args.requests, args.concurrency)
+    finally:
+        server.shutdown()
+    print(f"Server: {server.counts}")
+
+
+if __name__ == '__main__':
+    main()
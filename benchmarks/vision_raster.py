@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Vision Rasterization Benchmark
+Payload size and render+encode time per raster setting over the
+.reference/Before PDFs; with --extract, also the share of fields each setting
+extracts identically to the legacy 200 DPI colour PNG pipeline
+
+Usage: python benchmarks/vision_raster.py [--extract] [pdf ...]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pdf_images import RasterSettings, image_blocks  # noqa: E402
+
+REFERENCE_DIR = Path(__file__).resolve().parent.parent / '.reference' / 'Before'
+
+SETTINGS = (
+    ("legacy 200dpi colour PNG", RasterSettings(dpi=200, grayscale=False, image_format='png',
+                                                max_long_edge=None)),
+    ("auto dpi colour PNG", RasterSettings(grayscale=False, image_format='png')),
+    ("auto dpi gray PNG", RasterSettings(image_format='png')),
+    ("auto dpi gray JPEG q85", RasterSettings(image_format='jpeg', quality=85)),
+    ("auto dpi gray JPEG q70", RasterSettings(image_format='jpeg', quality=70)),
+    ("auto dpi gray WebP q85", RasterSettings(image_format='webp', quality=85)),
+    ("auto (smallest)", RasterSettings()),
+)
+
+
+def flatten(data, prefix=''):
+    """booking JSON → {dotted.field: normalized value}"""
+    fields = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            fields.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, list):
+        for idx, value in enumerate(data):
+            fields.update(flatten(value, f"{prefix}{idx}."))
+    else:
+        fields[prefix.rstrip('.')] = ' '.join(str(data).lower().split())
+    return fields
+
+
+def accuracy(expected, actual):
+    """Share of the reference extraction's fields reproduced exactly"""
+    expected, actual = flatten(expected), flatten(actual)
+    if not expected:
+        return 0.0
+    return sum(1 for key, value in expected.items() if actual.get(key) == value) / len(expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vision rasterization settings")
+    parser.add_argument('pdfs', nargs='*', help=f'PDFs to measure (default: {REFERENCE_DIR})')
+    parser.add_argument('--extract', action='store_true',
+                        help='Also extract with Claude per setting and score against the legacy setting')
+    args = parser.parse_args()
+
+    pdf_paths = [Path(p) for p in args.pdfs] or sorted(REFERENCE_DIR.glob('*.pdf'))
+    if not pdf_paths:
+        print(f"No PDFs found in {REFERENCE_DIR}")
+        sys.exit(1)
+
+    if args.extract:
+        from claude_transform import CloudbedsTransformer
+
+    header = f"{'PDF':<28} {'Setting':<26} {'Payload KB':>10} {'Encode s':>9}"
+    print(header + (f" {'Accuracy':>9}" if args.extract else ''))
+    print("-" * (len(header) + (10 if args.extract else 0)))
+    for pdf_path in pdf_paths:
+        reference = None
+        for label, settings in SETTINGS:
+            stats = {}
+            blocks = image_blocks(pdf_path, settings, stats)
+            payload = sum(len(block['source']['data']) for block in blocks)
+            line = f"{pdf_path.name[:28]:<28} {label:<26} {payload / 1024:>10,.0f} {stats['seconds']:>9.2f}"
+            if args.extract:
+                transformer = CloudbedsTransformer(use_cache=False, use_text_layer=False,
+                                                   use_rules=False, raster=settings,
+                                                   pdf_mode='images')
+                booking_data = transformer.extract_booking_data(pdf_path)
+                if reference is None:
+                    reference = booking_data
+                line += f" {accuracy(reference, booking_data):>9.0%}"
+            print(line)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Booking Schema
+JSON schema for extracted booking data, sent as the structured-output format
+so Claude's reply is always parseable, plus validation that coerces a reply
+into the booking dict the renderer expects and reports which fields failed
+so only those need to be asked for again
+"""
+
+from datetime import datetime
+
+from cloudbeds_parser import EMAIL_PATTERN, ESSENTIAL_FIELDS, parse_amount
+
+STRUCTURED_OUTPUTS_BETA = "structured-outputs-2025-11-13"
+
+# Every booking document carries these; other essential fields (an agent
+# voucher's guest phone, say) can be genuinely absent
+REQUIRED_FIELDS = ('res_id', 'guest_name', 'check_in', 'check_out', 'rooms')
+
+ROOM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "room_name": {"type": "string", "description": "Room/suite name"},
+        "adults": {"type": "integer", "description": "Number of adults"},
+        "children": {"type": "integer", "description": "Number of children"},
+        "rate_per_night": {"type": "number", "description": "Per night rate (number only)"},
+        "total_rate": {"type": "number", "description": "Total for this room (number only)"},
+    },
+    "required": ["room_name", "adults", "children", "rate_per_night", "total_rate"],
+    "additionalProperties": False,
+}
+
+BASE_PROPERTIES = {
+    "booking_type": {"type": "string", "enum": ["direct", "agent"]},
+    "guest_name": {"type": "string", "description": "Full guest name (first name + surname)"},
+    "email": {"type": "string", "description": "Guest email address"},
+    "phone": {"type": "string", "description": "Guest phone number with country code"},
+    "mobile": {"type": "string", "description": "Guest mobile number (same as phone if not different)"},
+    "primary_contact": {"type": "string", "description": "Primary contact person name"},
+    "nationality": {"type": "string", "description": "Guest nationality or 'Not specified'"},
+    "res_id": {"type": "string", "description": "Reservation ID number"},
+    "check_in": {"type": "string", "description": "Check-in date in DD/MM/YYYY format"},
+    "check_out": {"type": "string", "description": "Check-out date in DD/MM/YYYY format"},
+    "nights": {"type": "integer", "description": "Number of nights"},
+    "rooms": {"type": "array", "items": ROOM_SCHEMA, "description": "One entry per room booked"},
+    "total_amount": {"type": "number", "description": "Grand total for all rooms (number only)"},
+    "deposit_amount": {"type": "number", "description": "Deposit required (number only)"},
+    "amount_paid": {"type": "number", "description": "Amount already paid (number only)"},
+    "balance_due": {"type": "number", "description": "Balance remaining (number only)"},
+    "reserved_date": {"type": "string", "description": "Date the booking was made"},
+    "booking_via": {"type": "string", "description": "Booking source (Direct, Booking.com, ...)"},
+    "heard_about": {"type": "string", "description": "How the guest heard about the hotel"},
+}
+
+# The text prompt asks for flat agent fields, the vision prompt for agent_info
+FLAT_AGENT_PROPERTIES = {
+    "agent_name": {"type": "string", "description": "Agent company name only"},
+    "agent_contact_person": {"type": "string", "description": "Tour consultant / contact person"},
+    "agent_contact": {"type": "string", "description": "Agent phone number"},
+    "agent_email": {"type": "string", "description": "Agent email address"},
+    "tour_reference": {"type": "string", "description": "Tour reference number"},
+    "voucher_number": {"type": "string", "description": "Voucher number"},
+}
+
+AGENT_INFO_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "agent_name": {"type": "string"},
+        "agent_contact": {"type": "string"},
+        "agent_email": {"type": "string"},
+        "tour_reference": {"type": "string"},
+        "voucher_number": {"type": "string"},
+    },
+    "required": ["agent_name", "agent_contact", "agent_email", "tour_reference", "voucher_number"],
+    "additionalProperties": False,
+}
+
+
+def object_schema(properties):
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+TEXT_SCHEMA = object_schema({**BASE_PROPERTIES, **FLAT_AGENT_PROPERTIES})
+VISION_SCHEMA = object_schema({**BASE_PROPERTIES, "agent_info": AGENT_INFO_SCHEMA})
+
+
+def fields_schema(schema, fields):
+    """Schema restricted to the given top-level fields (targeted re-asks)"""
+    return object_schema({field: schema["properties"][field] for field in fields
+                          if field in schema["properties"]})
+
+
+def output_format(schema):
+    """Messages API output_format for JSON-schema constrained replies"""
+    return {"type": "json_schema", "schema": schema}
+
+
+def describe_field(schema, field):
+    """Description used when asking for a single field in a prompt"""
+    spec = schema["properties"].get(field, {})
+    if field == "rooms":
+        return ('List of rooms: [{"room_name", "adults", "children", "rate_per_night", '
+                '"total_rate"}] with numbers only')
+    return spec.get("description", field.replace('_', ' '))
+
+
+def to_number(value, integer=False):
+    """Number from a reply value ('1,200.00', 'USD 370', 2) or None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = value
+    else:
+        number = parse_amount(str(value))
+        if number is None:
+            return None
+    return int(round(number)) if integer else number
+
+
+def parse_stay_date(value):
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.strptime(value.strip(), '%d/%m/%Y')
+    except ValueError:
+        return None
+
+
+def validate_rooms(rooms):
+    """(rooms, error or None)"""
+    if not isinstance(rooms, list) or not rooms:
+        return [], "no rooms"
+    cleaned = []
+    for room in rooms:
+        if not isinstance(room, dict) or not str(room.get('room_name', '')).strip():
+            return [], "room without a name"
+        cleaned_room = {'room_name': str(room['room_name']).strip()}
+        for key, integer in (('adults', True), ('children', True),
+                             ('rate_per_night', False), ('total_rate', False)):
+            number = to_number(room.get(key, 0), integer)
+            if number is None:
+                return [], f"{key} is not a number"
+            cleaned_room[key] = number
+        cleaned.append(cleaned_room)
+    return cleaned, None
+
+
+def validate_booking(data, schema=TEXT_SCHEMA):
+    """Coerce a reply into booking data; returns (booking_data, {field: problem})
+
+    Type mismatches in any field and missing essential fields are reported;
+    other missing fields get the prompt's defaults ("" / 0).
+    """
+    if not isinstance(data, dict):
+        data = {}
+    booking_data = {}
+    errors = {}
+
+    for field, spec in schema["properties"].items():
+        value = data.get(field)
+        kind = spec.get("type")
+
+        if field == "rooms":
+            booking_data[field], error = validate_rooms(value)
+        elif kind in ("number", "integer"):
+            number = to_number(value, kind == "integer") if value not in (None, "") else 0
+            error = None if number is not None else "not a number"
+            booking_data[field] = number if number is not None else 0
+        elif kind == "object":
+            nested, _ = validate_booking(value, spec)
+            booking_data[field], error = nested, None
+        else:
+            booking_data[field] = "" if value is None else str(value).strip()
+            error = None
+            if "enum" in spec and booking_data[field] not in spec["enum"]:
+                booking_data[field], error = spec["enum"][0], f"not one of {spec['enum']}"
+
+        if error is None and field in ESSENTIAL_FIELDS and booking_data[field] in ("", 0, []):
+            error = "missing"
+        if error is not None:
+            errors[field] = error
+
+    if "email" in booking_data and booking_data["email"] and not EMAIL_PATTERN.search(booking_data["email"]):
+        errors["email"] = "not an email address"
+    # Agent bookings often don't carry the guest's email yet
+    if booking_data.get("booking_type") == "agent" and errors.get("email") == "missing":
+        del errors["email"]
+
+    for field in ("check_in", "check_out"):
+        if field in booking_data and booking_data[field] and parse_stay_date(booking_data[field]) is None:
+            errors[field] = "not DD/MM/YYYY"
+
+    check_in = parse_stay_date(booking_data.get("check_in"))
+    check_out = parse_stay_date(booking_data.get("check_out"))
+    if check_in and check_out:
+        if check_out <= check_in:
+            errors["check_out"] = "not after check-in"
+        elif "nights" in booking_data:
+            booking_data["nights"] = (check_out - check_in).days
+
+    return booking_data, errors
+
+
+def reask_fields(errors):
+    """Failing fields worth asking for again: bad values, or required fields left empty
+
+    An empty non-required field most likely isn't in the document, so asking
+    again would only repeat the answer.
+    """
+    return {field: problem for field, problem in errors.items()
+            if problem != "missing" or field in REQUIRED_FIELDS}
+
+
+def absent_fields(errors):
+    """Empty essential fields that aren't worth a re-ask (see reask_fields)"""
+    failing = reask_fields(errors)
+    return [field for field in errors if field not in failing]
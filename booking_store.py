@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Server-Side Booking Store
+Keeps the booking JSON being reviewed (and the files generated from it) in
+SQLite with an in-memory LRU in front, keyed by an opaque id, so the Flask
+session cookie only has to carry that id instead of the whole booking
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_BOOKING_DB = Path('cache') / 'bookings.db'
+DEFAULT_TTL_HOURS = 24
+DEFAULT_LRU_SIZE = 256
+
+
+class BookingStore:
+    """Booking records {booking_data, html_output, pdf_output} by opaque id
+
+    The LRU is per process: with several worker processes behind a load
+    balancer set BOOKING_LRU_SIZE=0 so every lookup reads SQLite.
+    """
+
+    def __init__(self, path=None, ttl_hours=None, lru_size=None):
+        self.path = Path(path or os.getenv('BOOKING_DB_PATH', DEFAULT_BOOKING_DB))
+        self.ttl = float(ttl_hours if ttl_hours is not None
+                         else os.getenv('BOOKING_TTL_HOURS', DEFAULT_TTL_HOURS)) * 3600
+        self.lru_size = int(lru_size if lru_size is not None
+                            else os.getenv('BOOKING_LRU_SIZE', DEFAULT_LRU_SIZE))
+        self.lru = OrderedDict()  # booking_id -> (updated_at, record)
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS bookings (
+                    id TEXT PRIMARY KEY,
+                    booking_json TEXT NOT NULL,
+                    html_output TEXT,
+                    pdf_output TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_updated ON bookings (updated_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _remember(self, booking_id, updated_at, record):
+        with self.lock:
+            self.lru[booking_id] = (updated_at, record)
+            self.lru.move_to_end(booking_id)
+            while len(self.lru) > self.lru_size:
+                self.lru.popitem(last=False)
+
+    def _forget(self, booking_id):
+        with self.lock:
+            self.lru.pop(booking_id, None)
+
+    def create(self, booking_data):
+        """Store a newly extracted booking; returns its id"""
+        booking_id = secrets.token_urlsafe(16)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT INTO bookings (id, booking_json, updated_at) VALUES (?, ?, ?)",
+                         (booking_id, json.dumps(booking_data), now))
+            conn.execute("DELETE FROM bookings WHERE updated_at < ?", (now - self.ttl,))
+        self._remember(booking_id, now, {'booking_data': booking_data,
+                                         'html_output': None, 'pdf_output': None})
+        return booking_id
+
+    def get(self, booking_id):
+        """Booking record, or None if unknown or expired"""
+        if not booking_id:
+            return None
+        now = time.time()
+        with self.lock:
+            cached = self.lru.get(booking_id)
+            if cached is not None:
+                self.lru.move_to_end(booking_id)
+        if cached is not None and now - cached[0] <= self.ttl:
+            return dict(cached[1])
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT booking_json, html_output, pdf_output, updated_at FROM bookings WHERE id = ?",
+                (booking_id,)
+            ).fetchone()
+        if row is None or now - row[3] > self.ttl:
+            self._forget(booking_id)
+            return None
+        record = {'booking_data': json.loads(row[0]), 'html_output': row[1], 'pdf_output': row[2]}
+        self._remember(booking_id, row[3], record)
+        return dict(record)
+
+    def update(self, booking_id, **fields):
+        """Replace booking_data / html_output / pdf_output; returns False if unknown"""
+        record = self.get(booking_id)
+        if record is None:
+            return False
+        record.update(fields)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE bookings SET booking_json = ?, html_output = ?, pdf_output = ?, updated_at = ? "
+                "WHERE id = ?",
+                (json.dumps(record['booking_data']), record['html_output'], record['pdf_output'],
+                 now, booking_id)
+            )
+        self._remember(booking_id, now, record)
+        return True
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Bulk Booking Confirmation Transformer (Message Batches API)
+Submits extraction and/or Claude generation requests for a whole season of
+bookings as Message Batches (half price, no rate limits, results within 24h),
+persists the batch ids and custom_id → booking mapping after every step so an
+interrupted run resumes where it stopped, validates replies like the other
+modes, and writes results via save_outputs / save_pdf
+
+Usage:
+  python bulk_transform.py --input-dir season/            # extract via batch, render locally
+  python bulk_transform.py --bookings "exports/*.json" --use-llm
+  python bulk_transform.py                                # resume the run in progress
+  python bulk_transform.py --input-dir season/ --local    # local stand-in (no batch endpoint)
+  python bulk_transform.py --input-dir season/ --no-pdf   # HTML only
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+from batch_transform import collect_inputs
+from booking_schema import TEXT_SCHEMA, VISION_SCHEMA
+from claude_transform import PDF_MODES, CloudbedsTransformer, parse_json_response, strip_html_fences
+from extraction_cache import hash_file
+from logo_asset import inline_logo
+from metrics import record_usage
+from request_scheduler import BATCH
+
+DEFAULT_STATE_PATH = Path('cache') / 'batches' / 'bulk_state.json'
+LOCAL_BATCH_DIR = Path('cache') / 'batches' / 'local'
+DEFAULT_POLL_SECONDS = 60
+CUSTOM_ID_INVALID = re.compile(r'[^A-Za-z0-9_-]')
+
+
+def make_custom_id(prefix, name, taken):
+    """Batch custom_id (^[A-Za-z0-9_-]{1,64}$), unique within the run"""
+    base = CUSTOM_ID_INVALID.sub('_', f"{prefix}-{name}")[:60]
+    custom_id, n = base, 1
+    while custom_id in taken:
+        n += 1
+        custom_id = f"{base[:56]}-{n}"
+    return custom_id
+
+
+def write_json_atomic(path, data):
+    """Write JSON via temp file + rename so a crash never leaves half a state file"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_bookings(pattern):
+    """Booking JSON files (one booking object or a list of them per file)"""
+    bookings = []
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        for idx, booking in enumerate(data if isinstance(data, list) else [data]):
+            bookings.append((f"{path}#{idx}" if isinstance(data, list) else str(path), booking))
+    return bookings
+
+
+class LocalBatches:
+    """Stand-in for client.messages.batches, persisted under cache/batches/local
+
+    Requests are answered one by one by `responder(params) -> text` the
+    first time the batch is retrieved, so the bulk flow (including resume)
+    can be exercised without the batch endpoint.
+    """
+
+    def __init__(self, responder, root=LOCAL_BATCH_DIR):
+        self.responder = responder
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, batch_id):
+        return self.root / f"{batch_id}.json"
+
+    def _load(self, batch_id):
+        with open(self._path(batch_id), encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def _batch(record):
+        counts = {'processing': 0, 'succeeded': 0, 'errored': 0, 'canceled': 0, 'expired': 0}
+        if record['processing_status'] == 'ended':
+            for result in record['results']:
+                counts[result['type']] += 1
+        else:
+            counts['processing'] = len(record['requests'])
+        return SimpleNamespace(id=record['id'], processing_status=record['processing_status'],
+                               request_counts=SimpleNamespace(**counts))
+
+    def create(self, requests):
+        record = {'id': f"msgbatch_local_{uuid.uuid4().hex[:16]}",
+                  'processing_status': 'in_progress', 'requests': list(requests), 'results': []}
+        write_json_atomic(self._path(record['id']), record)
+        return self._batch(record)
+
+    def retrieve(self, batch_id):
+        record = self._load(batch_id)
+        if record['processing_status'] == 'in_progress':
+            for request in record['requests']:
+                try:
+                    result = {'type': 'succeeded', 'text': self.responder(request['params'])}
+                except Exception as e:
+                    result = {'type': 'errored', 'error': f"{type(e).__name__}: {e}"}
+                result['custom_id'] = request['custom_id']
+                record['results'].append(result)
+            record['processing_status'] = 'ended'
+            write_json_atomic(self._path(batch_id), record)
+        return self._batch(record)
+
+    def results(self, batch_id):
+        for result in self._load(batch_id)['results']:
+            message = None
+            if result['type'] == 'succeeded':
+                message = SimpleNamespace(content=[SimpleNamespace(type='text', text=result['text'])])
+            yield SimpleNamespace(custom_id=result['custom_id'], result=SimpleNamespace(
+                type=result['type'], message=message, error=result.get('error')))
+
+
+class LocalBatchClient:
+    """Minimal client exposing .messages.batches backed by LocalBatches"""
+
+    def __init__(self, responder, root=LOCAL_BATCH_DIR):
+        self.messages = SimpleNamespace(batches=LocalBatches(responder, root))
+
+
+class BulkTransformer:
+    """Resumable extract → generate run over the Message Batches API"""
+
+    def __init__(self, transformer, client=None, state_path=DEFAULT_STATE_PATH,
+                 poll_seconds=DEFAULT_POLL_SECONDS):
+        if client is None:
+            transformer.require_client()
+            client = transformer.client
+        self.transformer = transformer
+        self.batches = client.messages.batches
+        self.state_path = Path(state_path)
+        self.poll_seconds = poll_seconds
+        self.state = self.load_state()
+
+    def load_state(self):
+        """Resume from the state file if a run is in progress"""
+        if self.state_path.exists():
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        return None
+
+    def save_state(self):
+        write_json_atomic(self.state_path, self.state)
+
+    def log(self, message):
+        print(message)
+
+    # Planning
+
+    def plan(self, pdf_paths=(), bookings=()):
+        """Start a new run: resolve what can be done locally, queue the rest"""
+        self.state = {'stage': 'extract', 'batches': {}, 'custom_ids': {}, 'items': {}}
+        items = self.state['items']
+
+        for idx, pdf_path in enumerate(pdf_paths, 1):
+            item = {'file': str(pdf_path), 'res_id': '', 'booking': None, 'output': None, 'pdf': None,
+                    'error': ''}
+            item_id = make_custom_id('extract', f"{idx:04d}-{Path(pdf_path).stem}", items)
+            items[item_id] = item
+            try:
+                self.plan_extraction(item)
+            except Exception as e:
+                item['error'] = f"{type(e).__name__}: {e}"
+
+        for source, booking in bookings:
+            item_id = make_custom_id('booking', booking.get('res_id') or Path(source).stem, items)
+            items[item_id] = {'file': source, 'res_id': str(booking.get('res_id', '')),
+                              'booking': booking, 'output': None, 'pdf': None, 'error': ''}
+
+        self.save_state()
+
+    def plan_extraction(self, item):
+        """Use the cache / rule-based parser where possible; otherwise mark for the batch"""
+        transformer = self.transformer
+        key, cached = transformer.cached_extraction(hash_file(item['file']), 'pdf')
+        item['cache_key'] = key
+        if cached is not None:
+            self.set_booking(item, cached)
+            return
+
+        text_content = transformer.usable_text_layer(item['file'])
+        if text_content is not None and transformer.use_rules:
+            booking_data, missing = transformer.rule_based_extraction(text_content)
+            if booking_data is not None and not missing:
+                transformer.store_extraction(key, booking_data)
+                self.set_booking(item, booking_data)
+                return
+            if booking_data is not None:
+                item['partial'], item['missing'] = booking_data, missing
+
+    def set_booking(self, item, booking_data):
+        item['booking'] = booking_data
+        item['res_id'] = str(booking_data.get('res_id', ''))
+
+    def extraction_params(self, item):
+        """Messages API parameters for an item still needing extraction
+
+        Batches go through the plain Messages endpoint, so replies are not
+        schema-constrained (structured=False) and are parsed leniently.
+        """
+        transformer = self.transformer
+        text_content = transformer.usable_text_layer(item['file'])
+        if text_content is None:
+            item['schema'] = 'vision'
+            return transformer.vision_request(transformer.pdf_content(item['file']), structured=False)
+        item['schema'] = 'text'
+        if item.get('partial') is not None:
+            return transformer.fields_request(text_content, item['missing'], structured=False)
+        return transformer.text_request(text_content, structured=False)
+
+    def validated_booking(self, item, values):
+        """Batch reply → booking data, validated like every other mode
+
+        Fields that fail validation are asked for again with a regular
+        (synchronous) request against the same text or PDF; if that fails
+        too, the coerced data is kept and the fields are reported.
+        """
+        transformer = self.transformer
+        schema = VISION_SCHEMA if item.get('schema') == 'vision' else TEXT_SCHEMA
+        booking_data, failing = transformer.check_reply(values, schema)
+        if not failing:
+            return booking_data
+        try:
+            if schema is TEXT_SCHEMA:
+                source = transformer.usable_text_layer(item['file'])
+            else:
+                source = transformer.pdf_content(item['file'])
+            values = dict(values, **transformer.extract_fields(source, failing))
+        except Exception as e:
+            self.log(f"⚠️ {Path(item['file']).name}: re-ask for {', '.join(failing)} failed ({e})")
+            return booking_data
+        return transformer.check_reply(values, schema, reasked=True)[0]
+
+    # Batch plumbing
+
+    def submit(self, stage, requests):
+        """Create the batch for a stage (once) and persist its id immediately"""
+        batch_id = self.state['batches'].get(stage)
+        if batch_id:
+            self.log(f"Resuming {stage} batch {batch_id}")
+            return batch_id
+        batch = self.batches.create(requests=[
+            {'custom_id': custom_id, 'params': params} for custom_id, params in requests
+        ])
+        self.state['batches'][stage] = batch.id
+        self.save_state()
+        self.log(f"Submitted {stage} batch {batch.id} ({len(requests)} requests)")
+        return batch.id
+
+    def wait(self, batch_id):
+        """Poll until the batch has ended"""
+        while True:
+            batch = self.batches.retrieve(batch_id)
+            counts = batch.request_counts
+            if batch.processing_status == 'ended':
+                self.log(f"✓ Batch {batch_id} ended: {counts.succeeded} succeeded, "
+                         f"{counts.errored} errored, {counts.expired} expired, {counts.canceled} canceled")
+                return batch
+            self.log(f"  {batch_id}: {counts.processing} processing, {counts.succeeded} done - "
+                     f"checking again in {self.poll_seconds}s")
+            time.sleep(self.poll_seconds)
+
+    def results(self, batch_id):
+        """(item, response text or None, error) for each result in the batch"""
+        for entry in self.batches.results(batch_id):
+            item_id = self.state['custom_ids'].get(entry.custom_id)
+            if item_id is None:
+                continue
+            item = self.state['items'][item_id]
+            if entry.result.type == 'succeeded':
+                self.transformer.log_usage(entry.custom_id, entry.result.message)
+                # The --local stand-in's messages carry no usage
+                record_usage(f"batch_{self.state['stage']}", getattr(entry.result.message, 'usage', None))
+                yield item, entry.result.message.content[0].text, ''
+            else:
+                error = getattr(entry.result, 'error', None)
+                yield item, None, f"{entry.result.type}: {error}" if error else entry.result.type
+
+    # Stages
+
+    def run_extraction(self):
+        pending = [(item_id, item) for item_id, item in self.state['items'].items()
+                   if item['booking'] is None and not item['error']]
+        if not pending:
+            return
+
+        if not self.state['batches'].get('extract'):
+            requests = []
+            for item_id, item in pending:
+                try:
+                    requests.append((item_id, self.extraction_params(item)))
+                    self.state['custom_ids'][item_id] = item_id
+                except Exception as e:
+                    item['error'] = f"{type(e).__name__}: {e}"
+            if not requests:
+                return
+        else:
+            requests = None
+        batch_id = self.submit('extract', requests)
+        self.wait(batch_id)
+
+        for item, response_text, error in self.results(batch_id):
+            if item['booking'] is not None:
+                continue
+            if error:
+                item['error'] = error
+                continue
+            try:
+                values = parse_json_response(response_text)
+            except ValueError as e:
+                item['error'] = f"Unparseable extraction: {e}"
+                continue
+            if item.get('partial') is not None:
+                values = dict(item['partial'], **{f: values[f] for f in item['missing'] if f in values})
+            booking_data = self.validated_booking(item, values)
+            self.transformer.store_extraction(item.get('cache_key'), booking_data)
+            self.set_booking(item, booking_data)
+        self.save_state()
+
+    def save(self, item, html_content):
+        """Write the confirmation HTML and, when enabled, its PDF"""
+        html_path = self.transformer.save_outputs(item['booking'], html_content)
+        pdf_path = self.transformer.save_pdf(html_path, html_content)
+        item['output'] = str(html_path)
+        item['pdf'] = str(pdf_path) if pdf_path else None
+
+    def run_generation(self):
+        pending = [(item_id, item) for item_id, item in self.state['items'].items()
+                   if item['booking'] is not None and item['output'] is None and not item['error']]
+        if not pending:
+            return
+
+        if not self.transformer.use_llm:
+            for _, item in pending:
+                try:
+                    self.save(item, self.transformer.generate_html(item['booking']))
+                except Exception as e:
+                    item['error'] = f"{type(e).__name__}: {e}"
+            self.save_state()
+            return
+
+        requests = None
+        if not self.state['batches'].get('generate'):
+            requests = []
+            for item_id, item in pending:
+                custom_id = make_custom_id('res', item['res_id'] or item_id, self.state['custom_ids'])
+                self.state['custom_ids'][custom_id] = item_id
+                requests.append((custom_id, self.transformer.generation_request(item['booking'])))
+        batch_id = self.submit('generate', requests)
+        self.wait(batch_id)
+
+        for item, response_text, error in self.results(batch_id):
+            if item['output'] is not None:
+                continue
+            if error:
+                item['error'] = error
+                continue
+            self.save(item, inline_logo(strip_html_fences(response_text)))
+            self.save_state()
+        self.save_state()
+
+    def run(self):
+        """Run (or resume) the stages; returns the per-item results"""
+        if self.state['stage'] == 'extract':
+            self.run_extraction()
+            self.state['stage'] = 'generate'
+            self.save_state()
+        if self.state['stage'] == 'generate':
+            self.run_generation()
+            self.state['stage'] = 'done'
+            self.save_state()
+        return list(self.state['items'].values())
+
+
+def print_bulk_summary(items):
+    """One line per booking plus totals; returns the failed count"""
+    print()
+    for item in items:
+        name = Path(item['file'].split('#')[0]).name
+        if item['output']:
+            pdf = f" + {Path(item['pdf']).name}" if item.get('pdf') else ''
+            print(f"✓ {name} ({item['res_id']}) → {item['output']}{pdf}")
+        else:
+            print(f"❌ {name}: {item['error'] or 'not completed'}")
+    failed = sum(1 for item in items if not item['output'])
+    print(f"\n{len(items) - failed} succeeded, {failed} failed")
+    return failed
+
+
+def main(argv=None):
+    """Command-line interface"""
+    parser = argparse.ArgumentParser(
+        description="Bulk-transform bookings through the Claude Message Batches API"
+    )
+    parser.add_argument('--input-dir', help='Folder of Cloudbeds PDFs to extract')
+    parser.add_argument('--pattern', default='*.pdf', help='Filename pattern used with --input-dir')
+    parser.add_argument('--bookings', help='Glob of booking JSON files to regenerate (no extraction)')
+    parser.add_argument('--use-llm', action='store_true',
+                        help='Generate HTML with Claude (as a second batch) instead of the local templates')
+    parser.add_argument('--state', default=str(DEFAULT_STATE_PATH),
+                        help=f'Run state file used to resume (default: {DEFAULT_STATE_PATH})')
+    parser.add_argument('--fresh', action='store_true',
+                        help='Discard an unfinished run in the state file and start over')
+    parser.add_argument('--poll', type=int, default=DEFAULT_POLL_SECONDS,
+                        help=f'Seconds between batch status checks (default: {DEFAULT_POLL_SECONDS})')
+    parser.add_argument('--local', action='store_true',
+                        help='Use the local batch stand-in (answers via the regular Messages API)')
+    parser.add_argument('--pdf-mode', choices=PDF_MODES,
+                        help='How scanned PDFs are sent: the PDF itself (document) or rasterized pages (images)')
+    parser.add_argument('--no-pdf', action='store_true', help='HTML only, even if WeasyPrint is installed')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore the extraction cache')
+    parser.add_argument('--debug', action='store_true', help='Enable debug output')
+    args = parser.parse_args(argv)
+
+    try:
+        transformer = CloudbedsTransformer(debug=args.debug, use_llm=args.use_llm,
+                                           use_cache=not args.no_cache, pdf_mode=args.pdf_mode,
+                                           priority=BATCH, make_pdf=False if args.no_pdf else None)
+        client = None
+        if args.local:
+            transformer.require_client()
+            client = LocalBatchClient(
+                lambda params: transformer.create_message(params).content[0].text)
+        bulk = BulkTransformer(transformer, client, args.state, args.poll)
+
+        if bulk.state is not None and bulk.state['stage'] != 'done' and not args.fresh:
+            print(f"Resuming run from {args.state} (stage: {bulk.state['stage']})")
+        elif args.input_dir or args.bookings:
+            pdf_paths = collect_inputs(input_dir=args.input_dir, pattern=args.pattern) if args.input_dir else []
+            bookings = load_bookings(args.bookings) if args.bookings else []
+            if not pdf_paths and not bookings:
+                print("Error: No PDFs or booking files found")
+                sys.exit(1)
+            print(f"Planning {len(pdf_paths)} PDFs and {len(bookings)} bookings...")
+            bulk.plan(pdf_paths, bookings)
+        else:
+            print("Error: Nothing to resume - pass --input-dir and/or --bookings")
+            sys.exit(1)
+
+        failed = print_bulk_summary(bulk.run())
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        if args.debug:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,67 +8,43 @@ import os
 import sys
 import argparse
 import base64
+import glob
+import time
 from pathlib import Path
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from anthropic import Anthropic
-from pdf2image import convert_from_path
-from io import BytesIO
+from anthropic import Anthropic, BadRequestError
 import json
+from booking_schema import (STRUCTURED_OUTPUTS_BETA, TEXT_SCHEMA, VISION_SCHEMA, absent_fields, describe_field,
+                            fields_schema, output_format, reask_fields, validate_booking)
+from confirmation_renderer import ConfirmationRenderer
+from extraction_cache import ExtractionCache, hash_document, hash_text
+from pdf_images import RasterSettings, image_blocks
+from pdf_text import extract_pdf_text, text_layer_quality
+from text_preprocess import PreparedText, describe as describe_preprocessing, prepare_text, settings_key
+from batch_transform import DEFAULT_CONCURRENCY, collect_inputs, print_summary, run_batch
+from request_scheduler import BATCH, INTERACTIVE, get_scheduler
+from metrics import record_usage, span
+from pdf_renderer import get_pdf_pool, pdf_available
+from logo_asset import inline_logo
+from cloudbeds_parser import (FIELD_DESCRIPTIONS, looks_like_cloudbeds, parse_cloudbeds,
+                              unresolved_fields)
 
 # Load environment variables
 load_dotenv()
 
-class CloudbedsTransformer:
-    """Transform Cloudbeds PDFs using Claude API vision and generation"""
-
-    def __init__(self, api_key=None, debug=False):
-        """Initialize transformer with Claude API"""
-        self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
-        if not self.api_key:
-            raise ValueError("ANTHROPIC_API_KEY not found in environment or .env file")
-
-        self.client = Anthropic(api_key=self.api_key)
-        self.debug = debug
-        self.output_dir = Path('output')
-        self.output_dir.mkdir(exist_ok=True)
+DEFAULT_MODEL = "claude-sonnet-4-5-20250929"
 
-    def pdf_to_images(self, pdf_path):
-        """Convert PDF to images for Claude vision"""
-        if self.debug:
-            print(f"Converting PDF to images: {pdf_path}")
-
-        images = convert_from_path(pdf_path, dpi=200)
-        return images
-
-    def image_to_base64(self, image):
-        """Convert PIL image to base64 string"""
-        buffered = BytesIO()
-        image.save(buffered, format="PNG")
-        return base64.b64encode(buffered.getvalue()).decode('utf-8')
+# PDFs sent as native document blocks (see docs/claude_pdf-support.md);
+# larger files go through the rasterized image path
+PDF_MODES = ('document', 'images')
+MAX_DOCUMENT_BYTES = 24 * 1024 * 1024  # 32 MB request limit after base64
 
-    def extract_booking_data(self, pdf_path):
-        """Extract booking data from PDF using Claude vision"""
-        if self.debug:
-            print("Extracting booking data with Claude vision...")
+# Bump when the extraction prompts or output schema change so cached
+# extractions made with the old prompt are not reused
+PROMPT_VERSION = "4.2"
 
-        # Convert PDF to images
-        images = self.pdf_to_images(pdf_path)
-
-        # Prepare image content for Claude
-        image_content = []
-        for idx, img in enumerate(images):
-            image_content.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": "image/png",
-                    "data": self.image_to_base64(img)
-                }
-            })
-
-        # Create extraction prompt
-        extraction_prompt = """You are analyzing a Cloudbeds booking confirmation PDF.
+VISION_EXTRACTION_PROMPT = """You are analyzing a Cloudbeds booking confirmation PDF.
 Extract ALL booking information and return it as a JSON object with these exact fields:
 
 {
@@ -129,47 +105,7 @@ IMPORTANT DETECTION RULES:
    - All monetary values should be numbers without currency symbols
    - Infer booking_via from email domain or explicit mentions"""
 
-        # Send to Claude API
-        message = self.client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=2048,
-            messages=[{
-                "role": "user",
-                "content": image_content + [{
-                    "type": "text",
-                    "text": extraction_prompt
-                }]
-            }]
-        )
-
-        # Parse response
-        response_text = message.content[0].text
-
-        if self.debug:
-            print(f"Claude response:\n{response_text}")
-
-        # Extract JSON from response
-        try:
-            # Remove markdown code blocks if present
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-
-            booking_data = json.loads(response_text)
-            return booking_data
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON response: {e}")
-            print(f"Response was: {response_text}")
-            raise
-
-    def extract_from_text(self, text_content):
-        """Extract booking data from plain text using Claude API"""
-        if self.debug:
-            print("Extracting booking data from text with Claude API...")
-
-        # Create extraction prompt for text
-        extraction_prompt = """You are analyzing a booking confirmation document.
+TEXT_EXTRACTION_PROMPT = """You are analyzing a booking confirmation document.
 Extract ALL booking information and return it as a JSON object with these exact fields:
 
 {
@@ -256,71 +192,12 @@ CRITICAL EXTRACTION RULES:
 10. **Return Format**:
     - Return ONLY the JSON object
     - No explanations or additional text
-    - Ensure valid JSON syntax
-
-Here is the booking text to analyze:
-
-""" + text_content
-
-        # Send to Claude API
-        message = self.client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=4096,
-            messages=[{
-                "role": "user",
-                "content": extraction_prompt
-            }]
-        )
-
-        response_text = message.content[0].text
-
-        if self.debug:
-            print(f"Claude response: {response_text[:500]}...")
-
-        # Extract JSON from response
-        try:
-            # Remove markdown code blocks if present
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-
-            booking_data = json.loads(response_text)
-            return booking_data
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON response: {e}")
-            print(f"Response was: {response_text}")
-            raise
-
-    def generate_confirmation(self, booking_data):
-        """Generate confirmation HTML and return file paths (for web interface)"""
-        if self.debug:
-            print("Generating confirmation from booking data...")
-
-        # Generate HTML
-        html_content = self.generate_html(booking_data)
-
-        # Save HTML
-        html_path = self.save_outputs(booking_data, html_content)
-
-        # For now, we don't auto-generate PDF (user can print from browser)
-        # Could add WeasyPrint or similar for automated PDF generation
-        pdf_path = None
-
-        return html_path, pdf_path
-
-    def generate_html(self, booking_data):
-        """Generate branded HTML using Claude with design constraints"""
-        if self.debug:
-            print("Generating branded HTML with Claude...")
+    - Ensure valid JSON syntax"""
 
-        # Determine booking type and room count
-        booking_type = booking_data.get('booking_type', 'direct')
-        rooms = booking_data.get('rooms', [])
-        room_count = len(rooms)
+TEXT_INPUT_PREFIX = "Here is the booking text to analyze:\n\n"
+VISION_INSTRUCTION = "Extract the booking data from this Cloudbeds confirmation and return the JSON object."
 
-        # Load template reference (if exists) or use embedded design rules
-        design_rules = """
+DESIGN_RULES = """
 CRITICAL DESIGN CONSTRAINTS (must follow exactly):
 
 1. BRANDING (MUST USE EXACT DETAILS):
@@ -444,6 +321,362 @@ CRITICAL DESIGN CONSTRAINTS (must follow exactly):
    - Any layout other than three-column grid
 """
 
+GENERATION_REQUIREMENTS = """REQUIREMENTS:
+1. Return ONLY the complete HTML (<!DOCTYPE html> to </html>)
+2. No markdown code blocks or explanations
+3. All CSS must be inline
+4. Font imports: Import ONLY Playfair Display from Google Fonts
+   Example: <link href="https://fonts.googleapis.com/css2?family=Playfair+Display:wght@400;700&display=swap" rel="stylesheet">
+   DO NOT import Source Sans Pro or any other body text fonts
+5. Logo path: "planters-logo.png" (NOT ../../planters-logo.png)
+6. Hotel branding MUST be: "The Planters House" (NOT Planters Country Hotel)
+7. Contact details MUST be: +94 77 683 6955, reservations@theplantershouse.com, www.theplantershouse.com
+8. Must fit on single A4 page when printed at 95% scale
+9. Apply correct payment/billing status color based on balance_due
+10. Format dates nicely (e.g., "Monday, 25 November 2025")
+11. Calculate balance due date as 14 days before check-in
+12. For agent bookings: use sage billing section, include agent fields
+13. For multi-room bookings: use compact layout, show dates once in three-column grid
+14. Include all design constraints above
+15. Footer contact line format: "reservations@theplantershouse.com | +94 77 683 6955 | www.theplantershouse.com"
+16. Body text MUST use system sans-serif stack (not web fonts)
+17. Date display MUST use three-column grid with sage header (not yellow boxes or horizontal layout)
+18. Body text color: #6b6b6b on white backgrounds, #333333 on cream #f6f1e9 backgrounds only"""
+
+GENERATION_SYSTEM_PROMPT = f"""You generate complete, self-contained HTML files for hotel booking confirmations.
+{DESIGN_RULES}
+{GENERATION_REQUIREMENTS}"""
+
+
+def cached_system(prompt):
+    """System prompt as a single block marked for prompt caching
+
+    The static prompts are identical on every call, so they go first (system
+    is cached before messages) and everything per-booking follows in the
+    user turn.
+    """
+    return [{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}]
+
+
+def usage_summary(usage):
+    """One-line token usage including prompt cache reads/writes"""
+    return (f"input {getattr(usage, 'input_tokens', 0)}, "
+            f"cache read {getattr(usage, 'cache_read_input_tokens', 0) or 0}, "
+            f"cache write {getattr(usage, 'cache_creation_input_tokens', 0) or 0}, "
+            f"output {getattr(usage, 'output_tokens', 0)}")
+
+
+def encode_file_base64(path, chunk_size=3 * 256 * 1024):
+    """Base64 of a file read in chunks (multiples of 3 bytes, so chunks concatenate cleanly)"""
+    parts = []
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            parts.append(base64.b64encode(chunk).decode('ascii'))
+    return ''.join(parts)
+
+
+def pdf_label(pdf):
+    """A PDF path, or a short description of in-memory PDF bytes, for messages"""
+    if isinstance(pdf, (bytes, bytearray)):
+        return f"<{len(pdf) / 1024:.0f} KB in-memory PDF>"
+    return str(pdf)
+
+
+def pdf_size(pdf):
+    return len(pdf) if isinstance(pdf, (bytes, bytearray)) else os.path.getsize(pdf)
+
+
+def parse_json_response(response_text):
+    """Parse Claude's JSON reply, tolerating markdown code fences"""
+    try:
+        # Remove markdown code blocks if present
+        if "```json" in response_text:
+            response_text = response_text.split("```json")[1].split("```")[0].strip()
+        elif "```" in response_text:
+            response_text = response_text.split("```")[1].split("```")[0].strip()
+
+        return json.loads(response_text)
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON response: {e}")
+        print(f"Response was: {response_text}")
+        raise
+
+
+def reply_values(response_text):
+    """Booking values from a reply; {} if it isn't a JSON object (every field then fails validation)"""
+    try:
+        with span('parse_json'):
+            values = parse_json_response(response_text)
+    except ValueError:
+        return {}
+    return values if isinstance(values, dict) else {}
+
+
+def field_values(message, fields):
+    """The requested fields from a field re-ask reply"""
+    values = reply_values(message.content[0].text)
+    return {field: values[field] for field in fields if field in values}
+
+
+def strip_html_fences(html_content):
+    """Clean up if Claude wrapped the HTML in markdown"""
+    if "```html" in html_content:
+        html_content = html_content.split("```html")[1].split("```")[0].strip()
+    elif "```" in html_content:
+        html_content = html_content.split("```")[1].split("```")[0].strip()
+    return html_content
+
+
+def strip_streamed_fences(chunks, hold=8):
+    """strip_html_fences for a stream: drop a leading ```html line and a trailing ```"""
+    head, tail, started = '', '', False
+    for chunk in chunks:
+        if not started:
+            head += chunk
+            if head.lstrip().startswith('`') and '\n' not in head:
+                continue  # Possible fence line still arriving
+            if head.lstrip().startswith('```'):
+                head = head.split('\n', 1)[1]
+            chunk, head, started = head, '', True
+        # Hold back the last few characters in case they are the closing fence
+        chunk = tail + chunk
+        chunk, tail = chunk[:-hold], chunk[-hold:]
+        if chunk:
+            yield chunk
+    tail = (tail or head).rstrip()
+    if tail.endswith('```'):
+        tail = tail[:-3].rstrip()
+    if tail:
+        yield tail
+
+
+class CloudbedsTransformer:
+    """Transform Cloudbeds PDFs using Claude API vision and generation"""
+
+    def __init__(self, api_key=None, debug=False, use_llm=False, use_cache=True,
+                 use_text_layer=True, use_rules=True, raster=None, pdf_mode=None,
+                 structured=None, client=None, priority=INTERACTIVE, scheduler=None, make_pdf=None):
+        """Initialize transformer with Claude API
+
+        The API key is only required for extraction and for Claude HTML
+        generation (use_llm=True); local rendering works offline. Pass a
+        client to share one connection pool (see client_pool.py). Model calls
+        go through the process-wide request scheduler; batch work should pass
+        priority=BATCH so interactive requests go first. make_pdf (default
+        GENERATE_PDF, 'auto' = when WeasyPrint is installed) also saves a PDF.
+        """
+        self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
+        if client is None and self.api_key:
+            # Retries are the scheduler's job (it shares one budget across callers)
+            client = Anthropic(api_key=self.api_key, max_retries=0)
+        self.client = client
+        self.scheduler = scheduler or get_scheduler()
+        self.priority = priority
+        self.debug = debug
+        self.use_llm = use_llm
+        self.model = os.getenv('CLAUDE_MODEL', DEFAULT_MODEL)
+        self.cache = ExtractionCache() if use_cache else None
+        self.use_text_layer = use_text_layer
+        self.use_rules = use_rules
+        self.raster = raster or RasterSettings.from_env()
+        self.structured = (structured if structured is not None
+                           else os.getenv('STRUCTURED_OUTPUTS', 'true').lower() == 'true')
+        self.preprocess_text = os.getenv('TEXT_PREPROCESS', 'true').lower() == 'true'
+        self.pdf_mode = pdf_mode or os.getenv('PDF_INPUT_MODE', 'document').lower()
+        if self.pdf_mode not in PDF_MODES:
+            raise ValueError(f"PDF_INPUT_MODE must be one of {', '.join(PDF_MODES)}")
+        self.renderer = ConfirmationRenderer(
+            hot_reload=os.getenv('TEMPLATE_HOT_RELOAD', 'false').lower() == 'true'
+        )
+        if make_pdf is None:
+            setting = os.getenv('GENERATE_PDF', 'auto').lower()
+            make_pdf = pdf_available() if setting == 'auto' else setting == 'true'
+        self.make_pdf = make_pdf
+        self.output_dir = Path('output')
+        self.output_dir.mkdir(exist_ok=True)
+
+    def require_client(self):
+        """Fail clearly when a Claude API call is needed but no key is set"""
+        if self.client is None:
+            raise ValueError("ANTHROPIC_API_KEY not found in environment or .env file")
+
+    def send_message(self, params):
+        """messages.create, via the beta endpoint when a structured output format is set"""
+        if "output_format" in params:
+            return self.client.beta.messages.create(betas=[STRUCTURED_OUTPUTS_BETA], **params)
+        return self.client.messages.create(**params)
+
+    def create_message(self, params, call='api'):
+        """Send a request through the rate-limit scheduler (budget, backoff, retries)
+
+        Timed (including queueing and retries) and its token usage counted
+        under the given call name.
+        """
+        self.require_client()
+        with span('api_call', call=call):
+            message = self.scheduler.call(self.send_message, params, self.priority)
+        record_usage(call, getattr(message, 'usage', None))
+        return message
+
+    def log_usage(self, stage, message):
+        """Debug output of token usage, including prompt cache hits"""
+        usage = getattr(message, 'usage', None)
+        if self.debug and usage is not None:
+            print(f"{stage} tokens: {usage_summary(usage)}")
+
+    def prompt_settings(self):
+        """Settings other than the document that shape the extraction prompt"""
+        return settings_key() if self.preprocess_text else 'raw text'
+
+    def cached_extraction(self, content_hash, kind):
+        """Look up a previous extraction of the same document"""
+        if self.cache is None:
+            return None, None
+        key = self.cache.make_key(f"{kind}:{content_hash}", self.model,
+                                  f"{PROMPT_VERSION}:{self.prompt_settings()}")
+        booking_data = self.cache.get(key)
+        if booking_data is not None and self.debug:
+            print(f"✓ Extraction cache hit ({kind} {content_hash[:12]})")
+        return key, booking_data
+
+    def store_extraction(self, key, booking_data):
+        """Remember an extraction for future re-uploads"""
+        if self.cache is not None and key is not None:
+            self.cache.put(key, booking_data)
+
+    def pdf_to_image_content(self, pdf_path):
+        """Rasterize a PDF into Claude image content blocks (CPU-bound)"""
+        if self.debug:
+            print(f"Converting PDF to images ({self.raster.describe()}): {pdf_label(pdf_path)}")
+
+        stats = {}
+        image_content = image_blocks(pdf_path, self.raster, stats)
+
+        if self.debug:
+            print(f"  {stats['pages']} pages, {stats['bytes'] / 1024:.0f} KB in {stats['seconds']:.2f}s")
+        return image_content
+
+    def pdf_to_document_content(self, pdf_path):
+        """The original PDF bytes as a Claude document block (no poppler / PIL)"""
+        if self.debug:
+            print(f"Sending PDF as a document block: {pdf_label(pdf_path)}")
+        with span('base64_encode') as fields:
+            if isinstance(pdf_path, (bytes, bytearray)):
+                data = base64.b64encode(pdf_path).decode('ascii')
+            else:
+                data = encode_file_base64(pdf_path)
+            fields.update(bytes=len(data))
+        return [{
+            "type": "document",
+            "source": {
+                "type": "base64",
+                "media_type": "application/pdf",
+                "data": data
+            }
+        }]
+
+    def pdf_content(self, pdf_path, pdf_mode=None):
+        """Content blocks for vision extraction in the given (or default) mode"""
+        pdf_mode = pdf_mode or self.pdf_mode
+        if pdf_mode == 'document' and pdf_size(pdf_path) <= MAX_DOCUMENT_BYTES:
+            return self.pdf_to_document_content(pdf_path)
+        return self.pdf_to_image_content(pdf_path)
+
+    def usable_text_layer(self, pdf_path):
+        """The PDF's text layer if the fast path applies, else None"""
+        if not self.use_text_layer:
+            return None
+        text_content = extract_pdf_text(pdf_path)
+        usable, reason = text_layer_quality(text_content)
+        if not usable:
+            if self.debug:
+                print(f"PDF text layer not usable ({reason}), falling back to vision")
+            return None
+        if self.debug:
+            print(f"Using PDF text layer ({len(text_content)} characters)")
+        return text_content
+
+    def with_schema(self, params, schema, structured):
+        """Constrain the reply to a JSON schema (structured outputs)"""
+        if self.structured if structured is None else structured:
+            params["output_format"] = output_format(schema)
+        return params
+
+    def vision_request(self, content_blocks, structured=None):
+        """Messages API parameters for vision extraction (document or image blocks)"""
+        return self.with_schema({
+            "model": self.model,
+            "max_tokens": 2048,
+            "system": cached_system(VISION_EXTRACTION_PROMPT),
+            "messages": [{
+                "role": "user",
+                "content": content_blocks + [{
+                    "type": "text",
+                    "text": VISION_INSTRUCTION
+                }]
+            }]
+        }, VISION_SCHEMA, structured)
+
+    def prompt_text(self, text_content):
+        """Booking text as sent to Claude: boilerplate stripped, within TEXT_TOKEN_BUDGET"""
+        if not self.preprocess_text or isinstance(text_content, PreparedText):
+            return text_content
+        with span('text_preprocess') as fields:
+            prepared = prepare_text(text_content, stats=fields)
+        if self.debug:
+            print(f"Text preprocessing: {describe_preprocessing(fields)}")
+        return prepared
+
+    def text_request(self, text_content, structured=None):
+        """Messages API parameters for text extraction"""
+        return self.with_schema({
+            "model": self.model,
+            "max_tokens": 4096,
+            "system": cached_system(TEXT_EXTRACTION_PROMPT),
+            "messages": [{
+                "role": "user",
+                "content": TEXT_INPUT_PREFIX + self.prompt_text(text_content)
+            }]
+        }, TEXT_SCHEMA, structured)
+
+    def fields_request(self, source, fields, structured=None):
+        """Messages API parameters for a targeted re-ask of a few fields
+
+        source is the booking text, or the document / image blocks of a PDF.
+        """
+        schema = TEXT_SCHEMA if isinstance(source, str) else VISION_SCHEMA
+        field_list = "\n".join(f'  "{field}": "{describe_field(schema, field)}"' for field in fields)
+        prompt = f"""Extract ONLY these fields from the booking confirmation and return a JSON object:
+
+{{
+{field_list}
+}}
+
+Use "" for text or 0 for numbers you cannot find. Return ONLY the JSON object."""
+        # Shares the cached extraction prompt; the field list goes in the user turn
+        if isinstance(source, str):
+            system = TEXT_EXTRACTION_PROMPT
+            content = prompt + "\n\n" + TEXT_INPUT_PREFIX + self.prompt_text(source)
+        else:
+            system = VISION_EXTRACTION_PROMPT
+            content = source + [{"type": "text", "text": prompt}]
+        return self.with_schema({
+            "model": self.model,
+            "max_tokens": 1024,
+            "system": cached_system(system),
+            "messages": [{
+                "role": "user",
+                "content": content
+            }]
+        }, fields_schema(schema, fields), structured)
+
+    def generation_request(self, booking_data):
+        """Messages API parameters for Claude HTML generation"""
+        # Determine booking type and room count
+        booking_type = booking_data.get('booking_type', 'direct')
+        rooms = booking_data.get('rooms', [])
+        room_count = len(rooms)
+
         # Add specific instructions based on booking scenario
         scenario_instructions = ""
         if booking_type == "agent":
@@ -471,61 +704,259 @@ MULTI-ROOM BOOKING INSTRUCTIONS:
 
 {json.dumps(booking_data, indent=2)}
 
-{design_rules}
-
 {scenario_instructions}
 
-REQUIREMENTS:
-1. Return ONLY the complete HTML (<!DOCTYPE html> to </html>)
-2. No markdown code blocks or explanations
-3. All CSS must be inline
-4. Font imports: Import ONLY Playfair Display from Google Fonts
-   Example: <link href="https://fonts.googleapis.com/css2?family=Playfair+Display:wght@400;700&display=swap" rel="stylesheet">
-   DO NOT import Source Sans Pro or any other body text fonts
-5. Logo path: "planters-logo.png" (NOT ../../planters-logo.png)
-6. Hotel branding MUST be: "The Planters House" (NOT Planters Country Hotel)
-7. Contact details MUST be: +94 77 683 6955, reservations@theplantershouse.com, www.theplantershouse.com
-8. Must fit on single A4 page when printed at 95% scale
-9. Apply correct payment/billing status color based on balance_due
-10. Format dates nicely (e.g., "Monday, 25 November 2025")
-11. Calculate balance due date as 14 days before check-in
-12. For agent bookings: use sage billing section, include agent fields
-13. For multi-room bookings: use compact layout, show dates once in three-column grid
-14. Include all design constraints above
-15. Footer contact line format: "reservations@theplantershouse.com | +94 77 683 6955 | www.theplantershouse.com"
-16. Body text MUST use system sans-serif stack (not web fonts)
-17. Date display MUST use three-column grid with sage header (not yellow boxes or horizontal layout)
-18. Body text color: #6b6b6b on white backgrounds, #333333 on cream #f6f1e9 backgrounds only
-
 Generate the complete HTML now:"""
 
-        # Send to Claude API
-        message = self.client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=8192,
-            messages=[{
+        return {
+            "model": self.model,
+            "max_tokens": 8192,
+            "system": cached_system(GENERATION_SYSTEM_PROMPT),
+            "messages": [{
                 "role": "user",
                 "content": generation_prompt
             }]
-        )
+        }
+
+    def extract_booking_data(self, pdf_path, pdf_mode=None):
+        """Extract booking data from PDF (text layer if usable, else Claude vision)
+
+        pdf_path may also be the PDF's bytes (e.g. an email attachment), which
+        are used in memory without a temporary file. pdf_mode overrides the
+        transformer's default for this call: 'document' sends the PDF itself,
+        'images' rasterized pages.
+        """
+        cache_key, cached = self.cached_extraction(hash_document(pdf_path), 'pdf')
+        if cached is not None:
+            return cached
+
+        # Born-digital PDFs: skip poppler + image tokens, use the text path
+        text_content = self.usable_text_layer(pdf_path)
+        if text_content is not None:
+            booking_data = self.extract_from_text(text_content)
+            self.store_extraction(cache_key, booking_data)
+            return booking_data
+
+        if self.debug:
+            print("Extracting booking data with Claude vision...")
+
+        self.require_client()
+
+        # Send the PDF (or its rasterized pages) to Claude API
+        content_blocks = self.pdf_content(pdf_path, pdf_mode)
+        try:
+            message = self.create_message(self.vision_request(content_blocks), 'vision_extraction')
+        except BadRequestError as e:
+            if content_blocks[0]["type"] != "document":
+                raise
+            # e.g. too many pages or an encrypted PDF - fall back to images
+            if self.debug:
+                print(f"Document block rejected ({e}), retrying with page images")
+            content_blocks = self.pdf_to_image_content(pdf_path)
+            message = self.create_message(self.vision_request(content_blocks), 'vision_extraction')
+        self.log_usage("Vision extraction", message)
+
+        # Parse response
+        response_text = message.content[0].text
+
+        if self.debug:
+            print(f"Claude response:\n{response_text}")
+
+        booking_data = self.validated(reply_values(response_text), content_blocks, VISION_SCHEMA)
+        self.store_extraction(cache_key, booking_data)
+        return booking_data
+
+    def rule_based_extraction(self, text_content):
+        """Parse Cloudbeds-layout text locally
+
+        Returns (booking_data, unresolved fields), or (None, None) when the
+        text isn't in the Cloudbeds layout or too little of it could be
+        parsed to be worth patching up.
+        """
+        if not looks_like_cloudbeds(text_content):
+            return None, None
+
+        booking_data, confidence = parse_cloudbeds(text_content)
+        missing = unresolved_fields(confidence)
+
+        if self.debug:
+            low = {field: score for field, score in confidence.items() if score < 1.0}
+            print(f"Rule-based parse: {len(confidence) - len(low)}/{len(confidence)} fields certain, "
+                  f"lower confidence: {low}")
+
+        if len(missing) > len(FIELD_DESCRIPTIONS) // 2:
+            return None, None
+
+        if missing and self.debug:
+            print(f"Escalating to Claude for: {', '.join(missing)}")
+        return booking_data, missing
+
+    def extract_with_rules(self, text_content):
+        """Parse Cloudbeds-layout text locally, asking Claude only for unresolved fields"""
+        booking_data, missing = self.rule_based_extraction(text_content)
+        if booking_data is not None and missing:
+            booking_data.update(self.extract_fields(text_content, missing))
+        return booking_data
+
+    def extract_fields(self, source, fields):
+        """Ask Claude for just the named fields (targeted re-ask)"""
+        message = self.create_message(self.fields_request(source, fields), 'field_reask')
+        self.log_usage("Field re-ask", message)
+        return field_values(message, fields)
+
+    def check_reply(self, values, schema, reasked=False):
+        """Validate a reply: (booking_data, fields to re-ask), warning about the rest
+
+        Shared by the sync and async validated(). After the re-ask
+        (reasked=True) nothing is asked again; what still fails is reported.
+        """
+        booking_data, errors = validate_booking(values, schema)
+        failing = reask_fields(errors)
+        if failing and reasked:
+            print(f"⚠️ Warning: Fields still invalid after re-ask: {failing}")
+        elif failing:
+            if self.debug:
+                print(f"Re-asking Claude for invalid fields: {failing}")
+            return booking_data, list(failing)
+        absent = absent_fields(errors)
+        if absent:
+            print(f"⚠️ Warning: Not found in the document: {', '.join(absent)}")
+        return booking_data, []
+
+    def validated(self, values, source, schema):
+        """Validate a reply against the booking schema, re-asking only for failing fields"""
+        booking_data, failing = self.check_reply(values, schema)
+        if failing:
+            values = dict(values, **self.extract_fields(source, failing))
+            booking_data, _ = self.check_reply(values, schema, reasked=True)
+        return booking_data
+
+    def text_extraction_request(self, text_content):
+        """(prepared text, request) for a text extraction; re-asks reuse the prepared text"""
+        prompt_text = self.prompt_text(text_content)
+        return prompt_text, self.text_request(prompt_text)
+
+    def extract_from_text(self, text_content):
+        """Extract booking data from plain text (Cloudbeds rules first, then Claude API)"""
+        cache_key, cached = self.cached_extraction(hash_text(text_content), 'text')
+        if cached is not None:
+            return cached
+
+        if self.use_rules:
+            booking_data = self.extract_with_rules(text_content)
+            if booking_data is not None:
+                self.store_extraction(cache_key, booking_data)
+                return booking_data
+
+        if self.debug:
+            print("Extracting booking data from text with Claude API...")
+
+        # Send to Claude API
+        prompt_text, params = self.text_extraction_request(text_content)
+        message = self.create_message(params, 'text_extraction')
+        self.log_usage("Text extraction", message)
+
+        response_text = message.content[0].text
+
+        if self.debug:
+            print(f"Claude response: {response_text[:500]}...")
+
+        booking_data = self.validated(reply_values(response_text), prompt_text, TEXT_SCHEMA)
+        self.store_extraction(cache_key, booking_data)
+        return booking_data
+
+    def generate_confirmation(self, booking_data):
+        """Generate confirmation HTML and return file paths (for web interface)"""
+        if self.debug:
+            print("Generating confirmation from booking data...")
+
+        # Generate HTML
+        html_content = self.generate_html(booking_data)
+
+        # Save HTML
+        html_path = self.save_outputs(booking_data, html_content)
+        pdf_path = self.save_pdf(html_path, html_content)
+
+        return html_path, pdf_path
+
+    def generate_html(self, booking_data):
+        """Generate branded HTML from the local templates (Claude if use_llm)"""
+        if self.use_llm:
+            return self.generate_html_with_claude(booking_data)
+
+        if self.debug:
+            print(f"Rendering branded HTML from {self.renderer.template_name(booking_data)}...")
 
-        html_content = message.content[0].text
+        return self.renderer.render(booking_data)
 
-        # Clean up if Claude wrapped in markdown
-        if "```html" in html_content:
-            html_content = html_content.split("```html")[1].split("```")[0].strip()
-        elif "```" in html_content:
-            html_content = html_content.split("```")[1].split("```")[0].strip()
+    def generate_html_with_claude(self, booking_data):
+        """Generate branded HTML using Claude with design constraints"""
+        if self.debug:
+            print("Generating branded HTML with Claude...")
 
-        return html_content
+        self.require_client()
+
+        # Send to Claude API
+        message = self.create_message(self.generation_request(booking_data), 'html_generation')
+        self.log_usage("HTML generation", message)
+        return inline_logo(strip_html_fences(message.content[0].text))
+
+    def stream_html(self, booking_data):
+        """Yield the branded HTML in chunks as Claude generates it
+
+        Local rendering is instant, so it is yielded as a single chunk.
+        """
+        if not self.use_llm:
+            yield self.renderer.render(booking_data)
+            return
+
+        def on_message(message):
+            record_usage('html_generation', message.usage)
+            self.log_usage("HTML generation", message)
+
+        self.require_client()
+        with span('api_call', call='html_generation_stream'):
+            yield from self.scheduler.stream(
+                lambda params: self.client.messages.stream(**params),
+                self.generation_request(booking_data), self.priority, on_message=on_message
+            )
+
+    def stream_confirmation(self, booking_data):
+        """Generate and save the confirmation, yielding HTML chunks as they arrive
+
+        Chunks are written to a .part file next to the output as they arrive;
+        the output file only appears (atomically renamed) once generation
+        has finished, so a half-written confirmation is never served.
+        """
+        html_path = self.output_path(booking_data)
+        part_path = html_path.with_name(html_path.name + '.part')
+        try:
+            with open(part_path, 'w', encoding='utf-8') as f:
+                for chunk in strip_streamed_fences(self.stream_html(booking_data)):
+                    f.write(chunk)
+                    f.flush()
+                    yield chunk
+            if self.use_llm:
+                # Claude references the original logo; point it at the inlined one
+                part_path.write_text(inline_logo(part_path.read_text(encoding='utf-8')), encoding='utf-8')
+            os.replace(part_path, html_path)
+        finally:
+            if part_path.exists():
+                part_path.unlink()
+
+        if self.debug:
+            print(f"Saved HTML to: {html_path}")
+
+    def output_path(self, booking_data):
+        """Where the confirmation HTML for a booking is saved"""
+        return self.output_dir / f"{booking_data.get('res_id', 'unknown')}_confirmation.html"
 
     def save_outputs(self, booking_data, html_content):
         """Save HTML and optionally convert to PDF"""
-        res_id = booking_data.get('res_id', 'unknown')
-
         # Save HTML
-        html_path = self.output_dir / f"{res_id}_confirmation.html"
-        with open(html_path, 'w', encoding='utf-8') as f:
+        html_path = self.output_path(booking_data)
+        with span('file_write') as fields, open(html_path, 'w', encoding='utf-8') as f:
+            fields.update(bytes=len(html_content))
             f.write(html_content)
 
         if self.debug:
@@ -533,8 +964,32 @@ Generate the complete HTML now:"""
 
         return html_path
 
-    def transform(self, pdf_path):
+    def save_pdf(self, html_path, html_content=None):
+        """Render the saved confirmation to a PDF next to it; None if disabled or it fails
+
+        A failed PDF never fails the confirmation - the HTML can still be
+        printed from the browser.
+        """
+        if not self.make_pdf:
+            return None
+        if html_content is None:
+            html_content = Path(html_path).read_text(encoding='utf-8')
+        pdf_path = Path(html_path).with_suffix('.pdf')
+        try:
+            get_pdf_pool().render(html_content, pdf_path)
+        except Exception as e:
+            print(f"⚠️ PDF rendering failed ({e}); print the HTML from Chrome instead")
+            return None
+        if self.debug:
+            print(f"Saved PDF to: {pdf_path}")
+        return pdf_path
+
+    def transform(self, pdf_path, stream=False):
         """Main transformation workflow"""
+        with span('transform'):
+            return self.run_transform(pdf_path, stream)
+
+    def run_transform(self, pdf_path, stream=False):
         print(f"Transforming: {pdf_path}")
 
         # Step 1: Extract data
@@ -558,39 +1013,187 @@ Generate the complete HTML now:"""
             for idx, room in enumerate(rooms, 1):
                 print(f"    Room {idx}: {room.get('room_name', 'Unknown')}")
 
-        # Step 2: Generate HTML
-        html_content = self.generate_html(booking_data)
         template_type = f"{booking_type}/{room_count}-room"
-        print(f"✓ Generated branded HTML ({template_type})")
-
-        # Step 3: Save outputs
-        html_path = self.save_outputs(booking_data, html_content)
+        if stream:
+            # Step 2+3: Generate and save as the response streams in
+            received = 0
+            for chunk in self.stream_confirmation(booking_data):
+                received += len(chunk)
+                print(f"\r  Generating... {received:,} characters", end='', flush=True)
+            print()
+            html_path = self.output_path(booking_data)
+            print(f"✓ Generated branded HTML ({template_type})")
+        else:
+            # Step 2: Generate HTML
+            html_content = self.generate_html(booking_data)
+            print(f"✓ Generated branded HTML ({template_type})")
+
+            # Step 3: Save outputs
+            html_path = self.save_outputs(booking_data, html_content)
         print(f"✓ Saved to: {html_path}")
 
+        pdf_output = self.save_pdf(html_path)
+        if pdf_output:
+            print(f"✓ Saved PDF: {pdf_output}")
+
         print("\n🎉 Transformation complete!")
-        print(f"   Open {html_path} in Chrome and print to PDF (Ctrl+P)")
-        print(f"   Settings: A4, Minimum margins, 95% scale in Adobe")
+        if not pdf_output:
+            print(f"   Open {html_path} in Chrome and print to PDF (Ctrl+P)")
+            print(f"   Settings: A4, Minimum margins, 95% scale in Adobe")
 
         return html_path
 
 
-def main():
+def transformer_from_args(args, priority=INTERACTIVE):
+    """Build a transformer from parsed CLI options"""
+    return CloudbedsTransformer(
+        debug=args.debug,
+        use_llm=args.use_llm,
+        use_cache=not args.no_cache,
+        use_text_layer=not args.force_vision,
+        use_rules=not args.no_rules,
+        pdf_mode=args.pdf_mode,
+        priority=priority
+    )
+
+
+def run_batch_cli(args):
+    """Batch mode for --input-dir / glob input; returns the exit code"""
+    if args.input_dir and not Path(args.input_dir).is_dir():
+        print(f"Error: Folder not found: {args.input_dir}")
+        return 1
+
+    pdf_paths = collect_inputs(args.input, args.input_dir, args.pattern)
+    if not pdf_paths:
+        print(f"Error: No PDF files found in {args.input_dir or args.input}")
+        return 1
+
+    if args.use_async:
+        return run_async_batch_cli(args, pdf_paths)
+
+    try:
+        transformer = transformer_from_args(args, priority=BATCH)
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        return 1
+
+    print(f"Transforming {len(pdf_paths)} PDFs with {args.concurrency} workers...\n")
+    start = time.perf_counter()
+    results = run_batch(transformer, pdf_paths, args.concurrency)
+    failed = print_summary(results, time.perf_counter() - start)
+    return 1 if failed else 0
+
+
+def run_async_batch_cli(args, pdf_paths):
+    """Batch mode on the async client (--async); returns the exit code"""
+    import asyncio
+    from async_transform import AsyncCloudbedsTransformer
+
+    total = len(pdf_paths)
+    done = []
+
+    def report(result):
+        done.append(result)
+        if result['ok']:
+            print(f"[{len(done)}/{total}] ✓ {result['file'].name} → {result['output']} "
+                  f"({result['seconds']:.1f}s)")
+        else:
+            print(f"[{len(done)}/{total}] ❌ {result['file'].name}: {result['error']}")
+
+    async def run():
+        async with AsyncCloudbedsTransformer(
+            debug=args.debug,
+            use_llm=args.use_llm,
+            use_cache=not args.no_cache,
+            use_text_layer=not args.force_vision,
+            use_rules=not args.no_rules,
+            pdf_mode=args.pdf_mode,
+            priority=BATCH
+        ) as transformer:
+            return await transformer.transform_many(pdf_paths, args.concurrency, on_result=report)
+
+    print(f"Transforming {total} PDFs with {args.concurrency} in flight (async)...\n")
+    start = time.perf_counter()
+    try:
+        results = asyncio.run(run())
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        return 1
+    failed = print_summary(results, time.perf_counter() - start)
+    return 1 if failed else 0
+
+
+def main(argv=None):
     """Command-line interface"""
     parser = argparse.ArgumentParser(
         description="Transform Cloudbeds PDFs to branded confirmations using Claude AI"
     )
-    parser.add_argument(
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument(
         '--input', '-i',
-        required=True,
-        help='Path to Cloudbeds PDF file'
+        help='Path to Cloudbeds PDF file (or a quoted glob such as "inbox/*.pdf")'
+    )
+    inputs.add_argument(
+        '--input-dir',
+        help='Process every PDF in this folder'
+    )
+    parser.add_argument(
+        '--pattern',
+        default='*.pdf',
+        help='Filename pattern used with --input-dir (default: *.pdf)'
+    )
+    parser.add_argument(
+        '--concurrency', '-j',
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f'Files processed in parallel in batch mode (default: {DEFAULT_CONCURRENCY})'
+    )
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='Batch mode on the async API client (one process, no thread per booking)'
     )
     parser.add_argument(
         '--debug',
         action='store_true',
         help='Enable debug output'
     )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Ignore the extraction cache and always call Claude'
+    )
+    parser.add_argument(
+        '--no-rules',
+        action='store_true',
+        help='Skip the rule-based Cloudbeds parser and always ask Claude'
+    )
+    parser.add_argument(
+        '--force-vision',
+        action='store_true',
+        help='Always send PDF pages as images, even if a text layer exists'
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Stream Claude HTML generation to disk as it arrives (with --use-llm)'
+    )
+    parser.add_argument(
+        '--pdf-mode',
+        choices=PDF_MODES,
+        help='How scanned PDFs are sent: the PDF itself (document) or rasterized pages (images)'
+    )
+    parser.add_argument(
+        '--use-llm',
+        action='store_true',
+        help='Generate HTML with Claude instead of the local templates'
+    )
+
+    args = parser.parse_args(argv)
 
-    args = parser.parse_args()
+    if args.input_dir or glob.has_magic(args.input):
+        sys.exit(run_batch_cli(args))
 
     # Validate input file
     pdf_path = Path(args.input)
@@ -604,8 +1207,8 @@ def main():
 
     # Transform
     try:
-        transformer = CloudbedsTransformer(debug=args.debug)
-        transformer.transform(pdf_path)
+        transformer = transformer_from_args(args)
+        transformer.transform(pdf_path, stream=args.stream)
     except Exception as e:
         print(f"\n❌ Error: {e}")
         if args.debug:
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Shared Anthropic Client
+One process-wide Anthropic client (and transformer per option set) on a
+keep-alive httpx connection pool, so concurrent web requests and jobs reuse
+warm TLS connections instead of opening a new pool per request, with
+counters showing how often connections are actually reused
+"""
+
+import os
+import threading
+
+import httpx
+from anthropic import Anthropic, DefaultHttpxClient
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 120.0        # Generation responses can take a minute+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_KEEPALIVE_SECONDS = 60.0
+DEFAULT_MAX_RETRIES = 0       # Retries are the request scheduler's job
+
+_lock = threading.Lock()
+_client = None
+_transformers = {}
+
+
+class ConnectionStats:
+    """Thread-safe counts of requests vs. new connections / TLS handshakes"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def trace(self, event_name, info):
+        """httpcore trace callback: fires for each step of a request"""
+        if event_name == 'connection.connect_tcp.complete':
+            self.count('connections')
+        elif event_name == 'connection.start_tls.complete':
+            self.count('tls_handshakes')
+
+    def on_request(self, request):
+        """httpx request hook: count it and attach the tracer"""
+        self.count('requests')
+        request.extensions['trace'] = self.trace
+
+    def snapshot(self):
+        with self.lock:
+            requests, connections, handshakes = self.requests, self.connections, self.tls_handshakes
+        reused = max(0, requests - connections)
+        return {
+            'requests': requests,
+            'new_connections': connections,
+            'tls_handshakes': handshakes,
+            'reused_connections': reused,
+            'reuse_rate': round(reused / requests, 3) if requests else None,
+        }
+
+
+stats = ConnectionStats()
+
+
+def pool_settings():
+    """Pool size / timeouts from ANTHROPIC_POOL_SIZE, ANTHROPIC_TIMEOUT, ..."""
+    return {
+        'pool_size': int(os.getenv('ANTHROPIC_POOL_SIZE', DEFAULT_POOL_SIZE)),
+        'timeout': float(os.getenv('ANTHROPIC_TIMEOUT', DEFAULT_TIMEOUT)),
+        'connect_timeout': float(os.getenv('ANTHROPIC_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)),
+        'keepalive': float(os.getenv('ANTHROPIC_KEEPALIVE_SECONDS', DEFAULT_KEEPALIVE_SECONDS)),
+        'max_retries': int(os.getenv('ANTHROPIC_MAX_RETRIES', DEFAULT_MAX_RETRIES)),
+    }
+
+
+def build_client(api_key, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, keepalive=DEFAULT_KEEPALIVE_SECONDS,
+                 max_retries=DEFAULT_MAX_RETRIES):
+    """Anthropic client on an instrumented keep-alive connection pool
+
+    httpx clients are thread-safe, so one instance serves every thread.
+    """
+    timeouts = httpx.Timeout(timeout, connect=connect_timeout)
+    http_client = DefaultHttpxClient(
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                            keepalive_expiry=keepalive),
+        timeout=timeouts,
+        event_hooks={'request': [stats.on_request]},
+    )
+    return Anthropic(api_key=api_key, http_client=http_client, timeout=timeouts,
+                     max_retries=max_retries)
+
+
+def get_client():
+    """The process-wide client, or None if no API key is configured"""
+    global _client
+    if _client is None:
+        api_key = os.getenv('ANTHROPIC_API_KEY')
+        if not api_key:
+            return None
+        with _lock:
+            if _client is None:
+                _client = build_client(api_key, **pool_settings())
+    return _client
+
+
+def shared_transformer(**options):
+    """Process-wide CloudbedsTransformer for these options, on the shared client
+
+    Transformers hold no per-request state, so one per option set is
+    reused across threads (and the output folder is created once).
+    """
+    from claude_transform import CloudbedsTransformer
+
+    key = tuple(sorted(options.items()))
+    transformer = _transformers.get(key)
+    if transformer is None:
+        client = get_client()
+        with _lock:
+            transformer = _transformers.get(key)
+            if transformer is None:
+                transformer = CloudbedsTransformer(client=client, **options)
+                _transformers[key] = transformer
+    return transformer
+
+
+def connection_stats():
+    """Connection reuse counters for the shared client"""
+    return stats.snapshot()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Rule-Based Cloudbeds Parser
+Reads the fixed Cloudbeds confirmation layout (labelled fields, room lines,
+totals block) into the booking JSON schema with a confidence per field, so
+most extractions need no API call at all
+"""
+
+import re
+from datetime import datetime
+
+# Rooms at The Planters House (config.yaml `rooms` + the bunk room)
+KNOWN_ROOMS = (
+    'The Garden Suite',
+    'The Sunbird Suite',
+    'The Oriole Room',
+    'The Bunk Room',
+)
+
+# Fields the confirmation can't be produced without; anything unresolved here
+# is escalated to Claude
+ESSENTIAL_FIELDS = ('res_id', 'guest_name', 'email', 'phone', 'check_in', 'check_out',
+                    'rooms', 'total_amount')
+
+# Short descriptions for targeted re-asks of unresolved fields
+FIELD_DESCRIPTIONS = {
+    'res_id': 'Reservation ID number',
+    'guest_name': 'Full guest name',
+    'email': 'Guest email address',
+    'phone': 'Guest phone number with country code',
+    'check_in': 'Check-in date in DD/MM/YYYY format',
+    'check_out': 'Check-out date in DD/MM/YYYY format',
+    'rooms': ('List of rooms: [{"room_name", "adults", "children", "rate_per_night", '
+              '"total_rate"}] with numbers only'),
+    'total_amount': 'Grand total for all rooms (number only, no currency)',
+}
+
+CONFIDENT = 0.6  # Below this a field counts as unresolved
+FALLBACK_NAME_SCORE = 0.5   # Name read from a bare "Guest:" / "Name:" label: confirm it
+
+# A bare label only counts as the whole label ("Name:", or "Name" alone on its
+# line), so "Guest Status: ..." or "Name of agent: ..." don't match it
+WHOLE_LABEL = r'(?=[ \t]*(?:[:\-]|$))'
+
+# Label alternatives per field, most specific first
+LABELS = {
+    'res_id': (r'Reservation\s*(?:ID|Number|No\.?|#)', r'(?:Confirmation|Booking)\s*(?:ID|Number|No\.?|#)'),
+    'guest_name': (r'Guest\s*Name', r'(?:Main\s*|Primary\s*)?Guest' + WHOLE_LABEL, r'(?:Full\s*)?Name' + WHOLE_LABEL),
+    'email': (r'(?:Guest\s*)?E-?mail(?:\s*Address)?',),
+    'phone': (r'(?:Guest\s*)?(?:Phone|Telephone|Tel\.?)(?:\s*Number)?',),
+    'mobile': (r'(?:Mobile|Cell)(?:\s*(?:Phone|Number))?',),
+    'nationality': (r'Nationality', r'Country'),
+    'check_in': (r'Check[\s-]*In(?:\s*Date)?', r'Arrival(?:\s*Date)?'),
+    'check_out': (r'Check[\s-]*Out(?:\s*Date)?', r'Departure(?:\s*Date)?'),
+    'nights': (r'(?:Number\s*of\s*)?Nights', r'Length\s*of\s*Stay'),
+    'reserved_date': (r'Reserved(?:\s*On)?', r'(?:Reservation|Booking)\s*Date', r'Date\s*Booked'),
+    'booking_via': (r'Travel\s*Agent',),
+    'heard_about': (r'How\s*did\s*you\s*hear\s*about\s*us\??',),
+    'total_amount': (r'Grand\s*Total', r'(?:Reservation\s*)?Total(?:\s*Amount)?(?!\s*Paid)'),
+    'deposit_amount': (r'Deposit(?:\s*(?:Required|Amount|Due))?',),
+    'amount_paid': (r'(?:Amount|Total)\s*Paid', r'Paid'),
+    'balance_due': (r'Balance(?:\s*Due)?', r'Amount\s*Due'),
+    'voucher_number': (r'Voucher\s*(?:No\.?|Number|#)?',),
+    'tour_reference': (r'Tour\s*(?:Ref(?:erence)?|Number|No\.?)',),
+}
+
+# "Label: value" or "Label" then the value on the next line
+FIELD_PATTERNS = {
+    field: [re.compile(r'(?im)^[ \t]*' + label + r'(?![A-Za-z])[ \t]*[:\-]?[ \t]*(?:\n[ \t]*)?(\S[^\n]*)')
+            for label in labels]
+    for field, labels in LABELS.items()
+}
+
+# Online travel agencies come through the "Travel Agent" field but are
+# still direct-style bookings (guest pays the hotel)
+OTA_NAMES = ('booking.com', 'expedia', 'agoda', 'airbnb', 'hotels.com', 'trip.com', 'website')
+
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+PHONE_PATTERN = re.compile(r'\+?\d[\d\s().-]{6,}\d')
+AMOUNT_PATTERN = re.compile(r'(?:USD|LKR|Rs\.?|US\$|\$|€|£)?\s*(-?\d[\d,]*(?:\.\d{1,2})?)')
+EMPTY_VALUES = {'', '-', 'n/a', 'na', 'none', 'null', 'direct', '--'}
+
+ROOM_BLOCK_END = re.compile(r'(?im)^[ \t]*(?:grand\s*total|total|sub-?total|deposit|balance|payments?)(?![A-Za-z])')
+
+DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d %b %Y', '%d %B %Y', '%b %d, %Y',
+                '%B %d, %Y', '%a, %d %b %Y', '%A, %d %B %Y', '%A, %B %d, %Y', '%a, %b %d, %Y',
+                '%d-%b-%Y', '%d.%m.%Y')
+
+
+def looks_like_cloudbeds(text):
+    """Cheap check that text follows the labelled Cloudbeds layout"""
+    hits = sum(1 for field in ('res_id', 'check_in', 'check_out', 'total_amount')
+               if find_field(text, field))
+    return hits >= 3
+
+
+def find_ranked_values(text, field):
+    """(value, label rank) for every labelled value, most specific label (rank 0) first"""
+    for rank, pattern in enumerate(FIELD_PATTERNS[field]):
+        for match in pattern.finditer(text):
+            value = match.group(1).strip()
+            if value.lower() not in EMPTY_VALUES:
+                yield value, rank
+
+
+def find_values(text, field):
+    """Every labelled value for a field, most specific label first"""
+    return (value for value, _ in find_ranked_values(text, field))
+
+
+def find_field(text, field):
+    """First labelled value for a field, or None"""
+    return next(find_values(text, field), None)
+
+
+def parse_amount(value):
+    """First amount in a string as a number, or None"""
+    if not value:
+        return None
+    match = AMOUNT_PATTERN.search(value)
+    if not match:
+        return None
+    number = float(match.group(1).replace(',', ''))
+    return int(number) if number.is_integer() else number
+
+
+def date_candidates(value):
+    """Possible readings of a date string (two for ambiguous numeric dates)"""
+    value = value.strip()
+    numeric = re.match(r'^(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})', value)
+    if numeric:
+        first, second, year = (int(g) for g in numeric.groups())
+        found = []
+        for day, month in ((first, second), (second, first)):  # day-first preferred
+            try:
+                found.append(datetime(year, month, day))
+            except ValueError:
+                pass
+        return list(dict.fromkeys(found))
+    value = re.split(r'\s*\(|\s+at\s+', value)[0].strip(' ,')
+    for fmt in DATE_FORMATS:
+        try:
+            return [datetime.strptime(value, fmt)]
+        except ValueError:
+            continue
+    return []
+
+
+def parse_dates(text, nights=None):
+    """Find and normalize both stay dates to DD/MM/YYYY
+
+    Numeric dates are ambiguous (Cloudbeds prints MM/DD/YYYY for US-locale
+    accounts), so both readings are tried and the one that agrees with the
+    nights count wins; day-first breaks remaining ties at lower confidence.
+    Returns (check_in, check_out, confidence).
+    """
+    ins = next((c for c in map(date_candidates, find_values(text, 'check_in')) if c), [])
+    outs = next((c for c in map(date_candidates, find_values(text, 'check_out')) if c), [])
+
+    scored = []
+    for start in ins:
+        for end in outs:
+            if end <= start:
+                continue
+            if not nights:
+                score = 0.8
+            else:
+                score = 1.0 if (end - start).days == nights else 0.5
+            scored.append((score, start, end))
+    if not scored:
+        return None, None, 0.0
+
+    best = max(score for score, _, _ in scored)
+    top = [(start, end) for score, start, end in scored if score == best]
+    start, end = top[0]
+    if len(top) > 1:
+        best = min(best, 0.7)
+    return start.strftime('%d/%m/%Y'), end.strftime('%d/%m/%Y'), best
+
+
+def guest_count(block, label):
+    """'Adults: 2' or '2 Adults' in a room block, or None"""
+    match = (re.search(r'(?i)' + label + r'\s*[:\-]?\s*(\d+)', block)
+             or re.search(r'(?i)(\d+)\s*' + label, block))
+    return int(match.group(1)) if match else None
+
+
+def parse_rooms(text):
+    """Room lines for known room names, with guests and amounts"""
+    positions = []
+    for name in KNOWN_ROOMS:
+        for match in re.finditer(re.escape(name), text, re.IGNORECASE):
+            positions.append((match.start(), match.end(), name))
+    positions.sort()
+
+    rooms = []
+    for idx, (start, end, name) in enumerate(positions):
+        if idx + 1 < len(positions):
+            block_end = positions[idx + 1][0]
+        else:
+            # Last room: stop at the totals block rather than reading into it
+            totals = ROOM_BLOCK_END.search(text, end)
+            block_end = min(totals.start() if totals else len(text), end + 300)
+        block = text[end:block_end]
+        adults = guest_count(block, r'adults?')
+        children = guest_count(block, r'(?:children|child|kids?)')
+        amounts = [parse_amount(m.group(0)) for m in re.finditer(
+            r'(?:USD|LKR|Rs\.?|US\$|\$)\s*\d[\d,]*(?:\.\d{1,2})?|\d[\d,]*\.\d{2}', block)]
+        amounts = [a for a in amounts if a is not None]
+        rooms.append({
+            'room_name': name,
+            'adults': adults or 0,
+            'children': children or 0,
+            'rate_per_night': amounts[0] if amounts else 0,
+            'total_rate': amounts[-1] if amounts else 0,
+            '_complete': adults is not None and bool(amounts),
+        })
+
+    # A room name can also appear in headers or policy text; keep the most
+    # complete occurrence of each
+    best = {}
+    for room in rooms:
+        current = best.get(room['room_name'])
+        if current is None or (room['_complete'] and not current['_complete']):
+            best[room['room_name']] = room
+    return [room for room in rooms if best[room['room_name']] is room]
+
+
+def parse_cloudbeds(text):
+    """Parse Cloudbeds confirmation text
+
+    Returns (booking_data, confidence) where confidence maps each field to
+    0.0 (unresolved) .. 1.0 (read from its label and validated).
+    """
+    data, confidence = {}, {}
+
+    def put(field, value, score):
+        data[field] = value
+        confidence[field] = score if value not in (None, '', []) else 0.0
+
+    res_id = find_field(text, 'res_id')
+    res_id_match = re.search(r'[A-Z0-9-]{5,}', res_id or '')
+    put('res_id', res_id_match.group(0) if res_id_match else '', 1.0)
+
+    name, rank = next(find_ranked_values(text, 'guest_name'), (None, None))
+    if not name or EMAIL_PATTERN.search(name):
+        put('guest_name', name or '', 0.0)
+    else:
+        put('guest_name', name, 0.9 if rank == 0 else FALLBACK_NAME_SCORE)
+
+    email = EMAIL_PATTERN.search(find_field(text, 'email') or '')
+    if email:
+        put('email', email.group(0), 1.0)
+    else:
+        any_email = [e for e in EMAIL_PATTERN.findall(text)
+                     if 'theplantershouse' not in e.lower()]
+        put('email', any_email[0] if any_email else '', 0.7)
+
+    phone = PHONE_PATTERN.search(find_field(text, 'phone') or '')
+    put('phone', phone.group(0).strip() if phone else '', 1.0)
+    mobile = PHONE_PATTERN.search(find_field(text, 'mobile') or '')
+    put('mobile', mobile.group(0).strip() if mobile else data['phone'], 1.0 if mobile else 0.8)
+    put('primary_contact', data['guest_name'], confidence['guest_name'])
+    put('nationality', find_field(text, 'nationality') or 'Not specified', 0.8)
+
+    nights = parse_amount(find_field(text, 'nights'))
+    nights = int(nights) if nights else None
+    check_in, check_out, date_score = parse_dates(text, nights)
+    put('check_in', check_in or '', date_score)
+    put('check_out', check_out or '', date_score)
+    if not nights and check_in and check_out:
+        nights = (datetime.strptime(check_out, '%d/%m/%Y') - datetime.strptime(check_in, '%d/%m/%Y')).days
+        put('nights', nights, 0.9)
+    else:
+        put('nights', nights or 0, 1.0)
+
+    rooms = parse_rooms(text)
+    complete = all([room.pop('_complete') for room in rooms])
+    put('rooms', rooms, 0.9 if rooms and complete else (0.5 if rooms else 0.0))
+
+    total = parse_amount(find_field(text, 'total_amount'))
+    if total is None and rooms:
+        total = sum(room['total_rate'] for room in rooms)
+        put('total_amount', total, 0.6 if total else 0.0)
+    else:
+        put('total_amount', total or 0, 1.0)
+
+    paid = parse_amount(find_field(text, 'amount_paid'))
+    put('amount_paid', paid or 0, 1.0 if paid is not None else 0.7)
+    deposit = parse_amount(find_field(text, 'deposit_amount'))
+    # Same default the extraction prompt uses: 50% of total
+    put('deposit_amount', deposit if deposit is not None else round((data['total_amount'] or 0) / 2, 2),
+        1.0 if deposit is not None else 0.7)
+    balance = parse_amount(find_field(text, 'balance_due'))
+    put('balance_due', balance if balance is not None else (data['total_amount'] or 0) - data['amount_paid'],
+        1.0 if balance is not None else 0.7)
+
+    put('reserved_date', find_field(text, 'reserved_date') or '', 0.9)
+    agent = find_field(text, 'booking_via')
+    put('booking_via', agent or 'Direct', 1.0)
+    put('heard_about', find_field(text, 'heard_about') or '', 0.9)
+
+    voucher = find_field(text, 'voucher_number')
+    tour_ref = find_field(text, 'tour_reference')
+    is_ota = bool(agent) and any(ota in agent.lower() for ota in OTA_NAMES)
+    is_agent = bool(voucher or tour_ref or (agent and not is_ota))
+    put('booking_type', 'agent' if is_agent else 'direct', 0.9)
+    data['agent_info'] = {
+        'agent_name': agent or '',
+        'agent_contact': '',
+        'agent_email': '',
+        'tour_reference': tour_ref or '',
+        'voucher_number': voucher or '',
+    } if is_agent else {}
+
+    return data, confidence
+
+
+def unresolved_fields(confidence, fields=ESSENTIAL_FIELDS, threshold=CONFIDENT):
+    """Essential fields the parser couldn't resolve with enough confidence"""
+    return [field for field in fields if confidence.get(field, 0.0) < threshold]
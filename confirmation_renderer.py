@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Local Confirmation Renderer
+Fills the placeholder templates in templates/guest and templates/agent with
+booking data - no API call, millisecond rendering, identical output for
+identical input
+"""
+
+import re
+from datetime import datetime, timedelta
+from html import escape
+from pathlib import Path
+from logo_asset import logo_src as default_logo_src
+from metrics import span
+from template_engine import TemplateLoader
+
+TEMPLATE_DIR = Path(__file__).parent / 'templates'
+
+# One template per scenario: direct/agent × single/multi-room
+TEMPLATES = {
+    ('direct', False): 'guest/single_room.html',
+    ('direct', True): 'guest/multiroom.html',
+    ('agent', False): 'agent/single_room.html',
+    ('agent', True): 'agent/multiroom.html',
+}
+
+BALANCE_DUE_DAYS = 14  # Balance due 14 days before check-in
+DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d %b %Y', '%d-%b-%Y', '%d %B %Y')
+
+INCLUSIONS_NOTE = "✓ Breakfast for all guests included • WiFi, taxes &amp; service included"
+GUEST_RESPONSIBILITY = ("Any extras not covered by the agent voucher (beverages, additional meals, "
+                        "activities) are payable directly by the guest at check-out")
+
+ROOM_SECTION = """<div class="room-section">
+            <div class="room-header">
+                <h2 class="room-title">{name}</h2>
+                <span class="room-rate">USD {rate}</span>
+            </div>
+            <div class="room-details">
+                <div class="detail-box">
+                    <div class="detail-label">Adults</div>
+                    <div class="detail-value">{adults}</div>
+                </div>
+                <div class="detail-box">
+                    <div class="detail-label">Children</div>
+                    <div class="detail-value">{children}</div>
+                </div>
+                <div class="detail-box">
+                    <div class="detail-label">Rate/Night</div>
+                    <div class="detail-value">USD {per_night}</div>
+                </div>
+            </div>
+        </div>"""
+
+PRICE_ROW = """<div class="price-row">
+                    <span class="price-label">{label}</span>
+                    <span class="price-value">{value}</span>
+                </div>"""
+
+MOBILE_ROW = """<div class="info-row">
+                    <span class="info-label">Mobile</span>
+                    <span class="info-value">{mobile}</span>
+                </div>"""
+
+
+def parse_date(value):
+    """Parse a booking date string, returning None if the format is unknown"""
+    if not value:
+        return None
+    text = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def format_date(value):
+    """Format a booking date as e.g. 'Monday, 25 November 2025'"""
+    parsed = parse_date(value)
+    if parsed is None:
+        return escape(str(value or ''))
+    return f"{parsed.strftime('%A')}, {parsed.day} {parsed.strftime('%B %Y')}"
+
+
+def to_number(value):
+    """Coerce an extracted amount ('USD 1,234.50', 296.1, None) to float"""
+    if value is None or value == '':
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    cleaned = re.sub(r'[^0-9.\-]', '', str(value))
+    try:
+        return float(cleaned) if cleaned not in ('', '-', '.') else 0.0
+    except ValueError:
+        return 0.0
+
+
+def format_money(value):
+    """Format an amount with thousands separators and 2 decimals"""
+    return f"{to_number(value):,.2f}"
+
+
+def text(value, default=''):
+    """HTML-escape a scalar booking field"""
+    if value is None or value == '':
+        return escape(default)
+    return escape(str(value))
+
+
+class ConfirmationRenderer:
+    """Render branded confirmations locally from the placeholder templates"""
+
+    def __init__(self, template_dir=None, logo_src=None, hot_reload=False):
+        """logo_src defaults to the optimized, inlined logo (see logo_asset.py)"""
+        self.template_dir = Path(template_dir) if template_dir else TEMPLATE_DIR
+        self.logo_src = logo_src if logo_src is not None else default_logo_src()
+        self.loader = TemplateLoader(self.template_dir, hot_reload=hot_reload)
+
+    def template_name(self, booking_data):
+        """Pick the template for a booking's scenario"""
+        booking_type = 'agent' if booking_data.get('booking_type') == 'agent' else 'direct'
+        multi_room = len(booking_data.get('rooms') or []) > 1
+        return TEMPLATES[(booking_type, multi_room)]
+
+    def render(self, booking_data):
+        """Render the confirmation HTML for a booking"""
+        with span('render'):
+            template = self.loader.get(self.template_name(booking_data))
+            return template.render(self.build_context(booking_data))
+
+    def build_context(self, booking_data):
+        """Map booking JSON onto template placeholder values (HTML-safe)"""
+        rooms = booking_data.get('rooms') or [{}]
+        nights = self.nights(booking_data)
+        total = to_number(booking_data.get('total_amount'))
+        if not total:
+            total = sum(to_number(room.get('total_rate')) for room in rooms)
+
+        context = {
+            'LOGO_SRC': escape(self.logo_src),
+            'CONFIRMATION_NUMBER': text(booking_data.get('res_id'), 'N/A'),
+            'GUEST_NAME': text(booking_data.get('guest_name')),
+            'GUEST_EMAIL': text(booking_data.get('email')),
+            'GUEST_PHONE': text(booking_data.get('phone')),
+            'NATIONALITY': text(booking_data.get('nationality'), 'Not specified'),
+            'BOOKING_VIA': text(booking_data.get('booking_via'), 'Direct'),
+            'HEARD_ABOUT': text(booking_data.get('heard_about'), 'TBC'),
+            'RESERVED_DATE': text(booking_data.get('reserved_date')),
+            'CHECK_IN_DATE': format_date(booking_data.get('check_in')),
+            'CHECK_OUT_DATE': format_date(booking_data.get('check_out')),
+            'NIGHTS': str(nights),
+            'PRICING_ROWS': self.pricing_rows(rooms, nights),
+            'TOTAL_RATE': format_money(total),
+            'INCLUSIONS_NOTE': INCLUSIONS_NOTE,
+            'MOBILE_ROW': '',
+        }
+
+        mobile = booking_data.get('mobile')
+        if mobile and mobile != booking_data.get('phone'):
+            context['MOBILE_ROW'] = MOBILE_ROW.format(mobile=text(mobile))
+
+        for idx, room in enumerate(rooms[:3], 1):
+            context.update(self.room_context(idx, room, nights))
+        context['ROOM_2_SECTION'] = self.room_section(rooms[1], nights) if len(rooms) > 1 else ''
+        # Rooms beyond the third share the last slot rather than being dropped
+        context['ROOM_3_SECTION'] = '\n        '.join(
+            self.room_section(room, nights) for room in rooms[2:])
+
+        if booking_data.get('booking_type') == 'agent':
+            context.update(self.agent_context(booking_data, total))
+        else:
+            context.update(self.payment_context(booking_data, total))
+
+        return context
+
+    def nights(self, booking_data):
+        """Nights from the extracted value, falling back to the date difference"""
+        nights = int(to_number(booking_data.get('nights')))
+        if nights:
+            return nights
+        check_in = parse_date(booking_data.get('check_in'))
+        check_out = parse_date(booking_data.get('check_out'))
+        if check_in and check_out and check_out > check_in:
+            return (check_out - check_in).days
+        return 1
+
+    def room_values(self, room, nights):
+        """Display values for one room"""
+        total = to_number(room.get('total_rate'))
+        per_night = to_number(room.get('rate_per_night'))
+        if not per_night and total:
+            per_night = total / nights
+        if not total and per_night:
+            total = per_night * nights
+        return {
+            'name': text(room.get('room_name'), 'Room'),
+            'rate': format_money(total),
+            'adults': text(int(to_number(room.get('adults')))),
+            'children': text(int(to_number(room.get('children')))),
+            'per_night': format_money(per_night),
+        }
+
+    def room_context(self, idx, room, nights):
+        """ROOM_n_* placeholders for a room"""
+        values = self.room_values(room, nights)
+        return {
+            f'ROOM_{idx}_NAME': values['name'],
+            f'ROOM_{idx}_RATE': values['rate'],
+            f'ROOM_{idx}_ADULTS': values['adults'],
+            f'ROOM_{idx}_CHILDREN': values['children'],
+            f'ROOM_{idx}_PER_NIGHT': values['per_night'],
+        }
+
+    def room_section(self, room, nights):
+        """Compact room card for rooms 2-3 of a multi-room booking"""
+        return ROOM_SECTION.format(**self.room_values(room, nights))
+
+    def pricing_rows(self, rooms, nights):
+        """Pricing summary rows: one per room plus the standard inclusions"""
+        night_label = f"{nights} night{'s' if nights != 1 else ''}"
+        rows = []
+        for room in rooms:
+            values = self.room_values(room, nights)
+            value = f"USD {values['rate']}" if to_number(values['rate']) else 'Complimentary'
+            rows.append(PRICE_ROW.format(label=f"{values['name']} ({night_label})", value=value))
+        if any(to_number(room.get('children')) for room in rooms):
+            rows.append(PRICE_ROW.format(label="Children's Accommodation", value='Included'))
+        rows.append(PRICE_ROW.format(label='Breakfast, WiFi, Taxes &amp; Service', value='Included'))
+        return '\n                '.join(rows)
+
+    def payment_context(self, booking_data, total):
+        """Payment status block for direct bookings"""
+        deposit = to_number(booking_data.get('deposit_amount')) or total / 2
+        paid = to_number(booking_data.get('amount_paid'))
+        balance = booking_data.get('balance_due')
+        balance = to_number(balance) if balance not in (None, '') else max(total - paid, 0)
+
+        if balance <= 0:
+            status_class = 'paid'
+            note = 'Paid in full - thank you'
+        else:
+            status_class = 'partial' if paid > 0 else ''
+            note = 'Deposit received' if paid >= deposit else 'Deposit due upon confirmation'
+            check_in = parse_date(booking_data.get('check_in'))
+            if check_in:
+                due = check_in - timedelta(days=BALANCE_DUE_DAYS)
+                note += f"<br>Balance due by {due.day} {due.strftime('%B %Y')}"
+
+        return {
+            'PAYMENT_STATUS_CLASS': status_class,
+            'DEPOSIT_AMOUNT': format_money(deposit),
+            'AMOUNT_PAID': format_money(paid),
+            'BALANCE_DUE': format_money(balance),
+            'PAYMENT_NOTE': note,
+        }
+
+    def agent_context(self, booking_data, total):
+        """Agent details and billing block for agent bookings"""
+        # Vision extraction nests agent fields, text extraction flattens them
+        agent = dict(booking_data.get('agent_info') or {})
+        for key in ('agent_name', 'agent_email', 'tour_reference', 'voucher_number'):
+            if not agent.get(key) and booking_data.get(key):
+                agent[key] = booking_data[key]
+        contact = (booking_data.get('agent_contact_person') or agent.get('agent_contact')
+                   or booking_data.get('agent_contact'))
+
+        agent_name = text(agent.get('agent_name'), 'N/A')
+        voucher = text(agent.get('voucher_number'), 'N/A')
+        return {
+            'AGENT_NAME': agent_name,
+            'AGENT_CONTACT': text(contact, 'N/A'),
+            'AGENT_EMAIL': text(agent.get('agent_email'), 'N/A'),
+            'TOUR_REFERENCE': text(agent.get('tour_reference'), 'N/A'),
+            'VOUCHER_NUMBER': voucher,
+            'GUEST_RESPONSIBILITY': GUEST_RESPONSIBILITY,
+            'BILLING_TITLE': 'BILLING STATUS',
+            'BILLING_LABEL_1': 'Billed To',
+            'BILLING_VALUE_1': agent_name,
+            'BILLING_LABEL_2': 'Voucher',
+            'BILLING_VALUE_2': voucher,
+            'BILLING_LABEL_3': 'Accommodation',
+            'BILLING_VALUE_3': f"USD {format_money(total)}",
+            'BILLING_LABEL_4': 'Extras',
+            'BILLING_VALUE_4': 'Payable by guest',
+            'INVOICE_NOTE': f"Invoice to be sent to {agent_name} quoting voucher {voucher}",
+        }
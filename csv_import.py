@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Cloudbeds CSV Import
+Regenerates confirmations straight from a Cloudbeds reservations export, with
+no model calls: rows are streamed with the csv module, mapped to the booking
+JSON schema using config.yaml's data_sources.csv_import settings, grouped by
+Reservation ID (one row per room) and rendered from the local templates.
+
+Rows of a reservation don't have to be adjacent; they are held in a buffer of
+at most --buffer-rows rows, and the oldest reservation is finished whenever
+it is full, so row memory stays constant however large the export is (only
+the ids of finished reservations are kept, to catch rows that arrive late)
+
+Usage:
+  python csv_import.py exports/reservations.csv
+  python csv_import.py "exports/*.csv" --no-pdf
+  python csv_import.py exports/season.csv --dry-run      # validate only
+"""
+
+import argparse
+import csv
+import glob
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+
+from app_config import config_section
+from booking_schema import REQUIRED_FIELDS, TEXT_SCHEMA, validate_booking
+from cloudbeds_parser import date_candidates
+
+DEFAULT_COLUMNS = ['Reservation ID', 'Guest Name', 'Guest Email', 'Check In', 'Check Out', 'Room',
+                   'Total Amount', 'Amount Paid', 'Balance Due']
+DEFAULT_BUFFER_ROWS = 1000
+
+# Export header -> booking field, matched case- and spacing-insensitively.
+# The first block is config.yaml's expected_columns; the rest are optional
+# columns Cloudbeds adds depending on the report settings. When several
+# columns map to one field, the one listed first here wins
+COLUMN_FIELDS = {
+    'reservation id': 'res_id',
+    'guest name': 'guest_name',
+    'guest email': 'email',
+    'check in': 'check_in',
+    'check out': 'check_out',
+    'room': 'room_name',
+    'total amount': 'total_amount',
+    'amount paid': 'amount_paid',
+    'balance due': 'balance_due',
+
+    'reservation number': 'res_id',
+    'name': 'guest_name',
+    'email': 'email',
+    'arrival': 'check_in',
+    'departure': 'check_out',
+    'room name': 'room_name',
+    'room type': 'room_name',
+    'accommodation': 'room_name',
+    'grand total': 'total_amount',
+    'total': 'total_amount',
+    'paid': 'amount_paid',
+    'balance': 'balance_due',
+    'deposit': 'deposit_amount',
+    'phone': 'phone',
+    'guest phone': 'phone',
+    'mobile': 'mobile',
+    'country': 'nationality',
+    'nationality': 'nationality',
+    'nights': 'nights',
+    'adults': 'adults',
+    'children': 'children',
+    'kids': 'children',
+    'room total': 'room_total',
+    'room rate': 'room_total',
+    'accommodation total': 'room_total',
+    'source': 'booking_via',
+    'reservation source': 'booking_via',
+    'reservation date': 'reserved_date',
+    'booking date': 'reserved_date',
+    'travel agent': 'agent_name',
+    'agent': 'agent_name',
+    'voucher number': 'voucher_number',
+    'tour reference': 'tour_reference',
+}
+ROOM_FIELDS = ('room_name', 'adults', 'children', 'room_total')
+TIME_SUFFIX = re.compile(r'[ T]\d{1,2}:\d{2}(?::\d{2})?(?:\s*[AaPp][Mm])?$')
+
+
+def normalize_header(name):
+    return ' '.join(re.sub(r'[_\-]+', ' ', name.lstrip('\ufeff')).lower().split())
+
+
+def import_settings():
+    """config.yaml data_sources.csv_import, with the shipped defaults"""
+    section = config_section('data_sources', 'csv_import')
+    return {
+        'enabled': section.get('enabled', True),
+        'delimiter': section.get('delimiter', ','),
+        'encoding': section.get('encoding', 'utf-8'),
+        'expected_columns': section.get('expected_columns') or DEFAULT_COLUMNS,
+        'buffer_rows': int(os.getenv('CSV_BUFFER_ROWS', DEFAULT_BUFFER_ROWS)),
+    }
+
+
+def stay_dates(check_in, check_out, nights=None):
+    """Both stay dates as DD/MM/YYYY, reading ambiguous numeric dates consistently
+
+    Exports from US-locale accounts use MM/DD/YYYY; the reading where
+    check-out follows check-in (by the nights count, if there is one) wins,
+    day-first otherwise. Unparseable values are returned unchanged.
+    """
+    ins = date_candidates(TIME_SUFFIX.sub('', check_in or ''))
+    outs = date_candidates(TIME_SUFFIX.sub('', check_out or ''))
+    pairs = [(start, end) for start in ins for end in outs if end > start]
+    if nights:
+        pairs = [pair for pair in pairs if (pair[1] - pair[0]).days == nights] or pairs
+    if not pairs:
+        return check_in, check_out
+    start, end = pairs[0]
+    return start.strftime('%d/%m/%Y'), end.strftime('%d/%m/%Y')
+
+
+def to_float(value):
+    cleaned = re.sub(r'[^0-9.\-]', '', value or '')
+    try:
+        return float(cleaned)
+    except ValueError:
+        return 0.0
+
+
+def build_booking(rows):
+    """Booking JSON for one reservation's rows; returns (booking_data, errors)"""
+    first = rows[0]
+    data = {field: value for field, value in first.items() if field not in ROOM_FIELDS}
+    nights = int(to_float(first.get('nights'))) or None
+    data['check_in'], data['check_out'] = stay_dates(first.get('check_in'), first.get('check_out'), nights)
+    if data.get('agent_name'):
+        data['booking_type'] = 'agent'
+    data.setdefault('booking_via', 'Direct')
+    if not data.get('mobile'):
+        data['mobile'] = data.get('phone', '')
+
+    # Reservation totals are repeated on every room row; per-room totals,
+    # when the export has them, are not
+    total = max((to_float(row.get('total_amount')) for row in rows), default=0.0)
+    room_totals = [to_float(row.get('room_total')) for row in rows]
+    if not any(room_totals):
+        room_totals = [round(total / len(rows), 2)] * len(rows)
+    data['rooms'] = [{
+        'room_name': row.get('room_name') or 'Room',
+        'adults': row.get('adults') or 0,
+        'children': row.get('children') or 0,
+        'total_rate': room_total,
+        'rate_per_night': 0,
+    } for row, room_total in zip(rows, room_totals)]
+    data['total_amount'] = total or sum(room_totals)
+    if not data.get('balance_due'):
+        # Validation would read a missing balance as 0, i.e. paid in full
+        data['balance_due'] = max(data['total_amount'] - to_float(data.get('amount_paid')), 0)
+
+    booking_data, errors = validate_booking(data, TEXT_SCHEMA)
+    if booking_data['nights']:
+        for room in booking_data['rooms']:
+            room['rate_per_night'] = round(room['total_rate'] / booking_data['nights'], 2)
+    return booking_data, {field: problem for field, problem in errors.items() if field in REQUIRED_FIELDS}
+
+
+class CsvImporter:
+    """Stream reservations (grouped rows) out of Cloudbeds CSV exports"""
+
+    def __init__(self, settings=None, buffer_rows=None):
+        self.settings = settings or import_settings()
+        self.buffer_rows = max(1, buffer_rows or self.settings['buffer_rows'])
+        self.finished = set()     # Reservation ids already emitted (ids only, not rows)
+        self.counts = {'rows': 0, 'reservations': 0, 'skipped': 0, 'late_rows': 0}
+
+    def column_map(self, header, path):
+        """Column index -> booking field for this file's header"""
+        ranks = {name: rank for rank, name in enumerate(COLUMN_FIELDS)}
+        best = {}   # field -> (rank, column index)
+        for idx, name in enumerate(header):
+            name = normalize_header(name)
+            field = COLUMN_FIELDS.get(name)
+            if field and (field not in best or ranks[name] < best[field][0]):
+                best[field] = (ranks[name], idx)
+        columns = {idx: field for field, (_, idx) in best.items()}
+        if 'res_id' not in best:
+            raise ValueError(f"{path}: no 'Reservation ID' column")
+        present = {normalize_header(name) for name in header}
+        missing = [name for name in self.settings['expected_columns'] if normalize_header(name) not in present]
+        if missing:
+            print(f"⚠️ {path}: missing expected column(s) {', '.join(missing)}")
+        return columns
+
+    def rows(self, path):
+        """Mapped row dicts, read one at a time"""
+        with open(path, newline='', encoding=self.settings['encoding'], errors='replace') as f:
+            reader = csv.reader(f, delimiter=self.settings['delimiter'])
+            header = next(reader, None)
+            if header is None:
+                return
+            columns = self.column_map(header, path)
+            for values in reader:
+                row = {field: values[idx].strip() for idx, field in columns.items()
+                       if idx < len(values) and values[idx].strip()}
+                if row:
+                    self.counts['rows'] += 1
+                    yield row
+
+    def reservations(self, paths):
+        """(res_id, rows) per reservation, holding at most buffer_rows rows"""
+        buffer = OrderedDict()
+        held = 0
+        for path in paths:
+            for row in self.rows(path):
+                res_id = row.get('res_id')
+                if not res_id:
+                    self.counts['skipped'] += 1
+                    continue
+                if res_id in self.finished:
+                    self.counts['late_rows'] += 1
+                    print(f"⚠️ Reservation {res_id}: row more than {self.buffer_rows} rows after the "
+                          f"rest was ignored (sort the export or raise --buffer-rows)")
+                    continue
+                buffer.setdefault(res_id, []).append(row)
+                held += 1
+                while held > self.buffer_rows:
+                    oldest, rows = buffer.popitem(last=False)
+                    held -= len(rows)
+                    yield self.finish(oldest, rows)
+        while buffer:
+            res_id, rows = buffer.popitem(last=False)
+            yield self.finish(res_id, rows)
+
+    def finish(self, res_id, rows):
+        self.finished.add(res_id)
+        self.counts['reservations'] += 1
+        return res_id, rows
+
+    def bookings(self, paths):
+        """(res_id, booking_data) for every valid reservation; invalid ones are reported"""
+        for res_id, rows in self.reservations(paths):
+            booking_data, errors = build_booking(rows)
+            if errors:
+                self.counts['skipped'] += 1
+                problems = ', '.join(f"{field} {problem}" for field, problem in errors.items())
+                print(f"❌ Reservation {res_id}: {problems}")
+                continue
+            yield res_id, booking_data
+
+
+def import_csv(transformer, paths, importer=None, dry_run=False, progress_every=500):
+    """Render (and save) a confirmation for every reservation; returns the importer counts"""
+    importer = importer or CsvImporter()
+    importer.counts['saved'] = 0
+    for res_id, booking_data in importer.bookings(paths):
+        if dry_run:
+            continue
+        html_content = transformer.generate_html(booking_data)
+        html_path = transformer.save_outputs(booking_data, html_content)
+        transformer.save_pdf(html_path, html_content)
+        importer.counts['saved'] += 1
+        if progress_every and importer.counts['saved'] % progress_every == 0:
+            print(f"  {importer.counts['saved']} confirmations saved...")
+    return importer.counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate confirmations from a Cloudbeds CSV export")
+    parser.add_argument('inputs', nargs='+', help='CSV file(s) or glob pattern(s)')
+    parser.add_argument('--buffer-rows', type=int,
+                        help=f'Rows held while grouping reservations (default: {DEFAULT_BUFFER_ROWS})')
+    parser.add_argument('--no-pdf', action='store_true', help='HTML only, even if WeasyPrint is installed')
+    parser.add_argument('--dry-run', action='store_true', help='Validate the export without saving anything')
+    parser.add_argument('--debug', action='store_true', help='Enable debug output')
+    args = parser.parse_args(argv)
+
+    settings = import_settings()
+    if not settings['enabled']:
+        print("❌ CSV import is disabled in config.yaml (data_sources.csv_import.enabled)")
+        return 1
+
+    paths = []
+    for pattern in args.inputs:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing:
+        print(f"Error: File not found: {', '.join(missing)}")
+        return 1
+
+    from claude_transform import CloudbedsTransformer
+    from request_scheduler import BATCH
+
+    transformer = CloudbedsTransformer(debug=args.debug, priority=BATCH,
+                                       make_pdf=False if args.no_pdf else None)
+    importer = CsvImporter(settings, args.buffer_rows)
+    start = time.perf_counter()
+    try:
+        counts = import_csv(transformer, paths, importer, args.dry_run)
+    except (ValueError, csv.Error, UnicodeError) as e:
+        print(f"\n❌ Error: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    print(f"\n✓ {counts['reservations']} reservations from {counts['rows']} rows in {elapsed:.1f}s"
+          f" ({counts['reservations'] / elapsed if elapsed else 0:.0f}/s)")
+    if not args.dry_run:
+        print(f"  {counts['saved']} confirmations saved to {transformer.output_dir}/")
+    if counts['skipped'] or counts['late_rows']:
+        print(f"⚠️ {counts['skipped']} skipped, {counts['late_rows']} late row(s) ignored")
+    return 1 if counts['skipped'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
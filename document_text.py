@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Word / Text Document Extraction
+Turns uploaded .docx, .doc and .txt files into text for the extraction
+prompt, on a small process pool so big multi-table vouchers don't hold the
+GIL in web workers. DOCX is read by streaming word/document.xml (no
+python-docx object model), in document order, with each merged table cell
+emitted once; legacy .doc goes through antiword / catdoc / LibreOffice when
+one is installed, and a best-effort scan of the binary otherwise
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from xml.etree.ElementTree import iterparse
+
+DEFAULT_WORKERS = 2
+CONVERTER_TIMEOUT = 60      # seconds for antiword / catdoc / soffice
+EXTRACT_TIMEOUT = 120
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+ZIP_MAGIC = b'PK\x03\x04'
+
+UTF16_RUN = re.compile(rb'(?:[\x09\x0d\x20-\x7e\xa0-\xff]\x00){8,}')
+ANSI_RUN = re.compile(rb'[\x09\x0d\x20-\x7e\xa0-\xff]{8,}')
+RTF_CONTROL = re.compile(r"\\(?:'[0-9a-f]{2}|[a-z]+-?\d* ?|[^a-z])|[{}]", re.IGNORECASE)
+RTF_SKIP_GROUP = re.compile(r'\{\\\*[^{}]*(?:\{[^{}]*\}[^{}]*)*\}|\{\\(?:fonttbl|colortbl|stylesheet|info)'
+                            r'[^{}]*(?:\{[^{}]*\}[^{}]*)*\}')
+HTML_TAG = re.compile(r'<[^>]+>')
+BLANK_LINES = re.compile(r'\n\s*\n+')
+
+
+def docx_text(source):
+    """Text of a .docx (path or file object): paragraphs, and table rows as 'a | b | c'
+
+    Vertically merged cells (vMerge continuations) are skipped and
+    horizontally merged ones are a single element, so merged text appears
+    once instead of once per grid cell as with python-docx.
+    """
+    lines = []
+    paragraphs = []   # Open paragraphs (text boxes nest them): list of text pieces
+    cells = []        # Open table cells: {'parts': [...], 'merged': bool}
+    rows = []         # Open table rows: list of cell texts
+
+    def emit(text):
+        if cells:
+            cells[-1]['parts'].append(text)
+        elif text:
+            lines.append(text)
+
+    with zipfile.ZipFile(source) as archive, archive.open('word/document.xml') as document:
+        for event, elem in iterparse(document, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if tag == W + 'p':
+                    paragraphs.append([])
+                elif tag == W + 'tc':
+                    cells.append({'parts': [], 'merged': False})
+                elif tag == W + 'tr':
+                    rows.append([])
+                continue
+
+            if tag == W + 't':
+                if paragraphs:
+                    paragraphs[-1].append(elem.text or '')
+            elif tag == W + 'tab':
+                if paragraphs:
+                    paragraphs[-1].append('\t')
+            elif tag in (W + 'br', W + 'cr'):
+                if paragraphs:
+                    paragraphs[-1].append('\n')
+            elif tag == W + 'vMerge':
+                # <w:vMerge/> or val="continue" repeats the cell above; "restart" starts a merge
+                if cells and elem.get(W + 'val', 'continue') == 'continue':
+                    cells[-1]['merged'] = True
+            elif tag == W + 'p':
+                emit(''.join(paragraphs.pop()).strip())
+                elem.clear()
+            elif tag == W + 'tc':
+                cell = cells.pop()
+                text = ' '.join(part for part in cell['parts'] if part)
+                if text and not cell['merged'] and rows:
+                    rows[-1].append(text)
+            elif tag == W + 'tr':
+                emit(' | '.join(rows.pop()))
+                elem.clear()
+    return '\n'.join(lines)
+
+
+def rtf_text(data):
+    """Plain text of an RTF document (Word saves these with a .doc extension too)"""
+    text = data.decode('latin-1')
+    text = RTF_SKIP_GROUP.sub('', text)
+    text = re.sub(r'\\(?:par|line|row)\b ?', '\n', text)
+    text = re.sub(r'\\(?:tab|cell)\b ?', ' | ', text)
+    text = re.sub(r"\\'([0-9a-f]{2})", lambda m: bytes([int(m.group(1), 16)]).decode('cp1252', 'replace'),
+                  text, flags=re.IGNORECASE)
+    return clean_lines(RTF_CONTROL.sub('', text))
+
+
+def scan_text(data):
+    """Best-effort text from a binary Word 97-2003 file: the longest printable runs
+
+    Word stores text as cp1252 or UTF-16LE; whichever encoding yields more
+    text wins. Field codes and style names can leak through.
+    """
+    utf16 = [run.decode('utf-16-le') for run in UTF16_RUN.findall(data)]
+    ansi = [run.decode('cp1252', 'replace') for run in ANSI_RUN.findall(data)]
+    runs = utf16 if sum(map(len, utf16)) >= sum(map(len, ansi)) else ansi
+    return clean_lines('\n'.join(run.replace('\r', '\n') for run in runs))
+
+
+def clean_lines(text):
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    return BLANK_LINES.sub('\n', '\n'.join(line for line in lines if line)).strip()
+
+
+def convert_doc(path):
+    """Text of a binary .doc via an installed converter, or None if none worked"""
+    for command in (['antiword', '-w', '0', path], ['catdoc', '-w', path]):
+        if shutil.which(command[0]):
+            result = subprocess.run(command, capture_output=True, timeout=CONVERTER_TIMEOUT)
+            if result.returncode == 0 and result.stdout.strip():
+                return result.stdout.decode('utf-8', 'replace')
+
+    soffice = shutil.which('soffice') or shutil.which('libreoffice')
+    if soffice:
+        with tempfile.TemporaryDirectory() as out_dir:
+            subprocess.run([soffice, '--headless', '--convert-to', 'txt:Text', '--outdir', out_dir, path],
+                           capture_output=True, timeout=CONVERTER_TIMEOUT)
+            txt_path = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + '.txt')
+            if os.path.exists(txt_path):
+                with open(txt_path, encoding='utf-8', errors='replace') as f:
+                    return f.read()
+    return None
+
+
+def doc_text(path):
+    """Text of a .doc, whatever it really is (Word 97-2003, RTF, HTML or a renamed .docx)"""
+    with open(path, 'rb') as f:
+        head = f.read(8)
+    if head.startswith(ZIP_MAGIC):
+        return docx_text(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    if head.startswith(OLE_MAGIC):
+        converted = convert_doc(path)
+        return clean_lines(converted) if converted is not None else scan_text(data)
+    if data.lstrip().startswith(b'{\\rtf'):
+        return rtf_text(data)
+    text = data.decode('utf-8', 'replace')
+    if '<html' in text[:2048].lower():
+        text = HTML_TAG.sub(' ', re.sub(r'(?is)<(script|style).*?</\1>', '', text))
+    return clean_lines(text)
+
+
+def text_file(path):
+    """A .txt upload: UTF-8 (with or without BOM), else Windows-1252"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return data.decode('cp1252', 'replace')
+
+
+def document_text(path):
+    """Text of a .docx, .doc or .txt file (runs in a pool worker)"""
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension == '.docx':
+        return docx_text(path) if zipfile.is_zipfile(path) else doc_text(path)
+    if extension == '.doc':
+        return doc_text(path)
+    if extension == '.txt':
+        return text_file(path)
+    raise ValueError(f"Unsupported document type: {extension or path}")
+
+
+_lock = threading.Lock()
+_pool = None
+
+
+def get_pool():
+    """The process-wide extraction pool (None if DOCUMENT_WORKERS=0: run inline)"""
+    global _pool
+    workers = int(os.getenv('DOCUMENT_WORKERS', DEFAULT_WORKERS))
+    if workers <= 0:
+        return None
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+
+def extract_text(path, timeout=EXTRACT_TIMEOUT):
+    """document_text(path) on the process pool; raises what the extraction raised"""
+    global _pool
+    pool = get_pool()
+    if pool is None:
+        return document_text(str(path))
+    try:
+        return pool.submit(document_text, str(path)).result(timeout=timeout)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        with _lock:
+            if _pool is pool:
+                _pool = None
+        raise
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Extraction Cache
+Persists extracted booking JSON in SQLite keyed by a SHA-256 of the document
+(raw file bytes or normalized text) plus model id and prompt version, so a
+re-uploaded booking returns instantly without an API call
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = Path('cache') / 'extractions.db'
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_ENTRIES = 5000
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's raw bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_document(source):
+    """SHA-256 of a document given as a path or as its bytes (e.g. an email attachment)"""
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    return hash_file(source)
+
+
+def hash_text(text):
+    """SHA-256 of text with whitespace normalized (re-pastes hit the same entry)"""
+    normalized = ' '.join(text.split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class ExtractionCache:
+    """SQLite-backed booking JSON cache with TTL and size-based eviction"""
+
+    def __init__(self, path=None, ttl_days=None, max_entries=None):
+        self.path = Path(path or os.getenv('EXTRACTION_CACHE_PATH', DEFAULT_CACHE_PATH))
+        self.ttl = float(ttl_days if ttl_days is not None
+                         else os.getenv('EXTRACTION_CACHE_TTL_DAYS', DEFAULT_TTL_DAYS)) * 86400
+        self.max_entries = int(max_entries if max_entries is not None
+                               else os.getenv('EXTRACTION_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extractions (
+                    key TEXT PRIMARY KEY,
+                    booking_json TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON extractions (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across Flask threads
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(content_hash, model, prompt_version):
+        """Cache key for a document under a given model and prompt version"""
+        return hashlib.sha256(f"{content_hash}:{model}:{prompt_version}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return cached booking data, or None if missing or expired"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT booking_json, created_at FROM extractions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                conn.execute("DELETE FROM extractions WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE extractions SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key, booking_data):
+        """Store booking data and evict expired / least recently used entries"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, booking_json, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(booking_data), now, now)
+            )
+            conn.execute("DELETE FROM extractions WHERE created_at < ?", (now - self.ttl,))
+            conn.execute("""
+                DELETE FROM extractions WHERE key IN (
+                    SELECT key FROM extractions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def clear(self):
+        """Remove every cached extraction"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM extractions")
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Inbox Folder Watcher
+Long-running daemon that transforms PDFs as they land in the inbox: file
+events come from watchdog (inotify on Linux) with a slow directory poll as
+fallback, files are only picked up once their size has stopped changing,
+identical documents are skipped by content hash, and every item is recorded
+in a SQLite ledger so a restart resumes without reprocessing anything.
+Successes are archived by date; failures go to quarantine with the error
+
+Usage:
+  python folder_watcher.py                          # watch inbox/
+  python folder_watcher.py --inbox scans/ --concurrency 8
+  python folder_watcher.py --once                   # process what's there, then exit
+  python folder_watcher.py --status                 # ledger counts
+"""
+
+import argparse
+import os
+import queue
+import shutil
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Optional - fall back to polling the inbox
+    FileSystemEventHandler = object
+    Observer = None
+
+from batch_transform import DEFAULT_CONCURRENCY, DEFAULT_INBOX, process_one
+from extraction_cache import hash_file
+
+DEFAULT_LEDGER = Path('cache') / 'watch_ledger.db'
+DEFAULT_ARCHIVE = 'archive'
+DEFAULT_QUARANTINE = 'quarantine'
+SETTLE_SECONDS = 2.0        # Unchanged size/mtime for this long = fully written
+POLL_SECONDS = 10.0         # Directory scan interval without watchdog
+IDLE_WAKEUP_SECONDS = 30.0  # Blocking wait when nothing is pending
+IGNORED_SUFFIXES = ('.part', '.tmp', '.crdownload', '.download', '.partial')
+
+QUEUED, PROCESSING, DONE, FAILED = 'queued', 'processing', 'done', 'failed'
+
+
+class WorkLedger:
+    """One row per distinct document (content hash) and what became of it"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.getenv('WATCH_LEDGER_PATH', DEFAULT_LEDGER))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    content_hash TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    res_id TEXT NOT NULL DEFAULT '',
+                    output TEXT NOT NULL DEFAULT '',
+                    moved_to TEXT NOT NULL DEFAULT '',
+                    error TEXT NOT NULL DEFAULT '',
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_status ON items (status)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def status(self, content_hash):
+        with self._connect() as conn:
+            row = conn.execute("SELECT status FROM items WHERE content_hash = ?", (content_hash,)).fetchone()
+        return row[0] if row else None
+
+    def claim(self, content_hash, filename):
+        """Mark a document as processing; False if it is done or already in progress"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT status FROM items WHERE content_hash = ?", (content_hash,)).fetchone()
+            if row is not None and row[0] in (DONE, PROCESSING):
+                return False
+            if row is None:
+                conn.execute("INSERT INTO items (content_hash, filename, status, attempts, created_at, updated_at) "
+                             "VALUES (?, ?, ?, 1, ?, ?)", (content_hash, filename, PROCESSING, now, now))
+            else:
+                conn.execute("UPDATE items SET filename = ?, status = ?, attempts = attempts + 1, error = '', "
+                             "updated_at = ? WHERE content_hash = ?", (filename, PROCESSING, now, content_hash))
+        return True
+
+    def finish(self, content_hash, status, res_id='', output='', moved_to='', error=''):
+        with self._connect() as conn:
+            conn.execute("UPDATE items SET status = ?, res_id = ?, output = ?, moved_to = ?, error = ?, "
+                         "updated_at = ? WHERE content_hash = ?",
+                         (status, res_id, output, moved_to, error, time.time(), content_hash))
+
+    def requeue_interrupted(self):
+        """Items left 'processing' by a crash go back to queued; returns how many"""
+        with self._connect() as conn:
+            return conn.execute("UPDATE items SET status = ?, updated_at = ? WHERE status = ?",
+                                (QUEUED, time.time(), PROCESSING)).rowcount
+
+    def counts(self):
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall())
+
+
+class InboxEvents(FileSystemEventHandler):
+    """watchdog handler: pass every created / modified / moved-in path on"""
+
+    def __init__(self, notice):
+        self.notice = notice
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.notice(Path(event.src_path))
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.notice(Path(event.src_path))
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.notice(Path(event.dest_path))
+
+
+def unique_destination(folder, name):
+    """folder/name, or folder/stem-2.pdf, ... if that is taken"""
+    folder.mkdir(parents=True, exist_ok=True)
+    target = folder / name
+    counter = 2
+    while target.exists():
+        target = folder / f"{Path(name).stem}-{counter}{Path(name).suffix}"
+        counter += 1
+    return target
+
+
+class FolderWatcher:
+    """Watch an inbox and transform each settled, not-yet-seen PDF once"""
+
+    def __init__(self, transformer, inbox=DEFAULT_INBOX, archive_dir=DEFAULT_ARCHIVE,
+                 quarantine_dir=DEFAULT_QUARANTINE, ledger=None, concurrency=DEFAULT_CONCURRENCY,
+                 settle_seconds=SETTLE_SECONDS, poll_seconds=None):
+        """poll_seconds=None uses watchdog events when installed, else polls every POLL_SECONDS"""
+        self.transformer = transformer
+        self.inbox = Path(inbox)
+        self.archive_dir = Path(archive_dir)
+        self.quarantine_dir = Path(quarantine_dir)
+        self.ledger = ledger or WorkLedger()
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds if poll_seconds or Observer is not None else POLL_SECONDS
+        self.executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='watch')
+        self.events = queue.Queue()
+        self.pending = {}       # path -> (size, mtime_ns, unchanged since)
+        self.in_flight = set()
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.observer = None
+        self.counts = {'done': 0, 'failed': 0, 'duplicate': 0}
+
+    def notice(self, path):
+        """Queue a path from an event or scan if it looks like a finished PDF"""
+        name = path.name
+        if (path.suffix.lower() == '.pdf' and not name.startswith(('.', '~'))
+                and not name.lower().endswith(IGNORED_SUFFIXES)):
+            self.events.put(path)
+
+    def scan(self):
+        with os.scandir(self.inbox) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    self.notice(Path(entry.path))
+
+    def poll(self):
+        while not self.stopping.wait(self.poll_seconds):
+            try:
+                self.scan()
+            except OSError as e:
+                print(f"⚠️ Could not scan {self.inbox}: {e}")
+
+    def start(self):
+        for folder in (self.inbox, self.archive_dir, self.quarantine_dir):
+            folder.mkdir(parents=True, exist_ok=True)
+        interrupted = self.ledger.requeue_interrupted()
+        if interrupted:
+            print(f"Resuming {interrupted} item(s) interrupted by the last shutdown")
+
+        if self.poll_seconds is None:
+            self.observer = Observer()
+            self.observer.schedule(InboxEvents(self.notice), str(self.inbox), recursive=False)
+            self.observer.start()
+            print(f"👀 Watching {self.inbox}/ (file system events)")
+        else:
+            threading.Thread(target=self.poll, name='watch-poll', daemon=True).start()
+            print(f"👀 Watching {self.inbox}/ (polling every {self.poll_seconds:g}s)")
+        self.scan()  # Whatever arrived while we were down
+
+    def stop(self):
+        self.stopping.set()
+
+    def settled(self):
+        """Pending paths whose size and mtime haven't changed for settle_seconds"""
+        now = time.monotonic()
+        ready = []
+        for path, (size, mtime, since) in list(self.pending.items()):
+            try:
+                stat = path.stat()
+            except OSError:
+                del self.pending[path]  # Moved away or deleted before it settled
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                self.pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif now - since >= self.settle_seconds and stat.st_size > 0:
+                del self.pending[path]
+                ready.append(path)
+        return ready
+
+    def track(self, path):
+        with self.lock:
+            if path in self.in_flight:
+                return
+        if path not in self.pending:
+            try:
+                stat = path.stat()
+            except OSError:
+                return
+            self.pending[path] = (stat.st_size, stat.st_mtime_ns, time.monotonic())
+
+    def submit(self, path):
+        with self.lock:
+            if path in self.in_flight:
+                return
+            self.in_flight.add(path)
+        future = self.executor.submit(self.process, path)
+        future.add_done_callback(lambda _: self.finished(path))
+
+    def finished(self, path):
+        with self.lock:
+            self.in_flight.discard(path)
+
+    def count(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def busy(self):
+        with self.lock:
+            return bool(self.pending or self.in_flight or not self.events.empty())
+
+    def run(self, once=False):
+        """Main loop; once=True returns when the inbox has been drained"""
+        self.start()
+        try:
+            while not self.stopping.is_set():
+                timeout = self.settle_seconds / 2 if self.pending or once else IDLE_WAKEUP_SECONDS
+                try:
+                    self.track(self.events.get(timeout=timeout))
+                    while True:  # Drain bursts (e.g. a folder copied in) in one pass
+                        self.track(self.events.get_nowait())
+                except queue.Empty:
+                    pass
+                for path in self.settled():
+                    self.submit(path)
+                if once and not self.busy():
+                    break
+        finally:
+            if self.observer is not None:
+                self.observer.stop()
+                self.observer.join()
+            self.stopping.set()
+            self.executor.shutdown(wait=True)
+        return self.counts
+
+    def move(self, path, folder):
+        target = unique_destination(folder, path.name)
+        shutil.move(str(path), str(target))
+        return target
+
+    def process(self, path):
+        """Transform one settled PDF and file it away; never raises"""
+        try:
+            content_hash = hash_file(path)
+        except OSError:
+            return  # Gone (picked up twice, or removed)
+
+        if not self.ledger.claim(content_hash, path.name):
+            target = self.move(path, self.archive_dir / 'duplicates')
+            self.count('duplicate')
+            print(f"↺ {path.name}: duplicate of an earlier document, archived as {target}")
+            return
+
+        result = process_one(self.transformer, path)
+        try:
+            if result['ok']:
+                target = self.move(path, self.archive_dir / date.today().isoformat())
+                self.ledger.finish(content_hash, DONE, result['res_id'], str(result['output']), str(target))
+                self.count('done')
+                print(f"✓ {path.name} → {result['output']} ({result['seconds']:.1f}s)")
+            else:
+                target = self.move(path, self.quarantine_dir)
+                target.with_name(target.name + '.error.txt').write_text(result['error'] + '\n', encoding='utf-8')
+                self.ledger.finish(content_hash, FAILED, moved_to=str(target), error=result['error'])
+                self.count('failed')
+                print(f"❌ {path.name}: {result['error']} (moved to {target})")
+        except OSError as e:
+            self.ledger.finish(content_hash, FAILED, error=f"Could not move file: {e}")
+            print(f"❌ {path.name}: could not move file ({e})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a folder and transform PDFs as they arrive")
+    parser.add_argument('--inbox', default=DEFAULT_INBOX, help=f'Folder to watch (default: {DEFAULT_INBOX})')
+    parser.add_argument('--archive', default=DEFAULT_ARCHIVE, help='Where processed PDFs are moved')
+    parser.add_argument('--quarantine', default=DEFAULT_QUARANTINE, help='Where failed PDFs are moved')
+    parser.add_argument('--ledger', help=f'SQLite work ledger (default: {DEFAULT_LEDGER})')
+    parser.add_argument('--concurrency', '-j', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'PDFs processed at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help='Seconds a file must stay unchanged before it is picked up')
+    parser.add_argument('--poll', type=float, help='Poll every N seconds instead of using file events')
+    parser.add_argument('--once', action='store_true', help='Process the current inbox and exit')
+    parser.add_argument('--status', action='store_true', help='Show ledger counts and exit')
+    parser.add_argument('--use-llm', action='store_true', help='Generate HTML with Claude')
+    parser.add_argument('--debug', action='store_true', help='Enable debug output')
+    args = parser.parse_args(argv)
+
+    ledger = WorkLedger(args.ledger)
+    if args.status:
+        counts = ledger.counts()
+        for status in (QUEUED, PROCESSING, DONE, FAILED):
+            print(f"{status:<11} {counts.get(status, 0):>6}")
+        return 0
+
+    from claude_transform import CloudbedsTransformer
+    from request_scheduler import BATCH
+
+    try:
+        transformer = CloudbedsTransformer(debug=args.debug, use_llm=args.use_llm, priority=BATCH)
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        return 1
+
+    watcher = FolderWatcher(transformer, args.inbox, args.archive, args.quarantine, ledger,
+                            args.concurrency, args.settle, args.poll)
+    signal.signal(signal.SIGTERM, lambda *_: watcher.stop())
+    try:
+        counts = watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        watcher.stop()
+        counts = watcher.counts
+    print(f"\nProcessed {counts['done']}, failed {counts['failed']}, duplicates {counts['duplicate']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
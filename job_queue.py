@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Background Job Queue
+Runs slow extraction / generation work on a thread pool so web requests
+return a job id immediately; job state lives in a pluggable store (SQLite
+by default, so status survives across worker processes) and is polled via
+/jobs/<id>
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_JOB_DB = Path('cache') / 'jobs.db'
+DEFAULT_WORKERS = 4
+JOB_TTL_SECONDS = 24 * 3600
+STALE_SECONDS = 15 * 60     # Unfinished with no update for this long: its process died
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class MemoryJobStore:
+    """Job records in a dict (single process, lost on restart)"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def create(self, job_id, kind):
+        now = time.time()
+        with self.lock:
+            self.jobs[job_id] = {'id': job_id, 'kind': kind, 'status': QUEUED, 'progress': {},
+                                 'result': None, 'error': '', 'created_at': now, 'updated_at': now}
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.update(fields, updated_at=time.time())
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def purge(self, older_than):
+        with self.lock:
+            for job_id in [j for j, job in self.jobs.items() if job['updated_at'] < older_than]:
+                del self.jobs[job_id]
+
+
+class SQLiteJobStore:
+    """Job records in SQLite (shared by every worker process on the host)"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.getenv('JOB_DB_PATH', DEFAULT_JOB_DB))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress_json TEXT NOT NULL DEFAULT '{}',
+                    result_json TEXT,
+                    error TEXT NOT NULL DEFAULT '',
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id, kind):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT INTO jobs (id, kind, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                         (job_id, kind, QUEUED, now, now))
+
+    def update(self, job_id, **fields):
+        columns = {'status': fields.get('status'), 'error': fields.get('error')}
+        if 'progress' in fields:
+            columns['progress_json'] = json.dumps(fields['progress'])
+        if 'result' in fields:
+            columns['result_json'] = json.dumps(fields['result'])
+        columns = {name: value for name, value in columns.items() if value is not None}
+        assignments = ', '.join(f"{name} = ?" for name in columns)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ?",
+                         list(columns.values()) + [time.time(), job_id])
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, progress_json, result_json, error, created_at, updated_at "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'kind': row[1], 'status': row[2], 'progress': json.loads(row[3]),
+                'result': json.loads(row[4]) if row[4] else None, 'error': row[5],
+                'created_at': row[6], 'updated_at': row[7]}
+
+    def purge(self, older_than):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE updated_at < ?", (older_than,))
+
+
+def store_from_env():
+    """JOB_STORE=sqlite (default) or memory"""
+    if os.getenv('JOB_STORE', 'sqlite').lower() == 'memory':
+        return MemoryJobStore()
+    return SQLiteJobStore()
+
+
+class JobQueue:
+    """Submit callables to a thread pool and track them in a job store
+
+    The callable receives a report(**progress) function as its first
+    argument and returns a JSON-serializable result.
+    """
+
+    def __init__(self, store=None, max_workers=None):
+        self.store = store or store_from_env()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv('JOB_WORKERS', DEFAULT_WORKERS)),
+            thread_name_prefix='job'
+        )
+
+    def submit(self, kind, fn, *args):
+        """Queue fn(report, *args); returns the job id"""
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, kind)
+        self.executor.submit(self._run, job_id, fn, args)
+        self.store.purge(time.time() - JOB_TTL_SECONDS)
+        return job_id
+
+    def _run(self, job_id, fn, args):
+        self.store.update(job_id, status=RUNNING)
+
+        def report(**progress):
+            self.store.update(job_id, progress=progress)
+
+        try:
+            result = fn(report, *args)
+        except Exception as e:
+            traceback.print_exc()
+            self.store.update(job_id, status=FAILED, error=str(e))
+        else:
+            self.store.update(job_id, status=DONE, result=result)
+
+    def get(self, job_id):
+        """Job record, or None; unfinished jobs whose process died read as failed"""
+        job = self.store.get(job_id)
+        if (job is not None and job['status'] in (QUEUED, RUNNING)
+                and time.time() - job['updated_at'] > STALE_SECONDS):
+            job.update(status=FAILED, error="Job was interrupted (server restarted?)")
+        return job
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Optimized Logo Asset
+planters-logo.png is a 5904x7129 PNG (1.8 MB) shown 65px wide. It is
+resized once to twice the display width (sharp on high-DPI screens and in
+print), encoded as the smaller of a full-colour or 256-colour PNG, cached
+under cache/assets keyed by the source file's hash, and injected into
+confirmations as a data URI so every output is self-contained
+"""
+
+import base64
+import os
+import threading
+from pathlib import Path
+
+from extraction_cache import hash_file
+
+BASE_DIR = Path(__file__).resolve().parent
+LOGO_PATH = BASE_DIR / 'planters-logo.png'
+ORIGINAL_LOGO_SRC = 'planters-logo.png'
+ASSET_CACHE_DIR = BASE_DIR / 'cache' / 'assets'
+DISPLAY_WIDTH = 65          # config.yaml design.logo_size
+PIXEL_DENSITY = 2
+
+_lock = threading.Lock()
+_sources = {}   # (path, mtime_ns, size, width, inline) -> logo src
+
+
+def encode_logo(image):
+    """Smallest lossless-looking PNG: optimized RGBA vs. 256-colour palette"""
+    from io import BytesIO
+    from PIL import Image
+
+    candidates = []
+    for variant in (image, image.quantize(colors=256, method=Image.FASTOCTREE)):
+        buffered = BytesIO()
+        variant.save(buffered, format='PNG', optimize=True)
+        candidates.append(buffered.getvalue())
+    return min(candidates, key=len)
+
+
+def optimized_logo(source=LOGO_PATH, width=DISPLAY_WIDTH * PIXEL_DENSITY):
+    """Path of the resized logo, built on first use and reused while the source is unchanged"""
+    from PIL import Image
+
+    source = Path(source)
+    target = ASSET_CACHE_DIR / f"{source.stem}-{hash_file(source)[:16]}-{width}w.png"
+    if target.exists():
+        return target
+
+    with Image.open(source) as image:
+        image = image.convert('RGBA')
+        height = max(1, round(image.height * width / image.width))
+        data = encode_logo(image.resize((width, height), resample=Image.LANCZOS))
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    part_path = target.with_name(f"{target.name}.{os.getpid()}.part")
+    part_path.write_bytes(data)
+    os.replace(part_path, target)
+    return target
+
+
+def logo_src(inline=None, source=LOGO_PATH, width=DISPLAY_WIDTH * PIXEL_DENSITY):
+    """img src for the logo: data URI (LOGO_INLINE=true, default) or the cached file
+
+    Falls back to the original planters-logo.png if the logo can't be
+    processed (e.g. Pillow missing), so rendering never fails over it.
+    """
+    if inline is None:
+        inline = os.getenv('LOGO_INLINE', 'true').lower() == 'true'
+    source = Path(source)
+    try:
+        stat = source.stat()
+    except OSError:
+        return ORIGINAL_LOGO_SRC
+    key = (str(source), stat.st_mtime_ns, stat.st_size, width, inline)
+
+    src = _sources.get(key)
+    if src is None:
+        with _lock:
+            src = _sources.get(key)
+            if src is None:
+                try:
+                    path = optimized_logo(source, width)
+                except Exception as e:
+                    print(f"⚠️ Could not optimize {source.name} ({e}); using the original")
+                    src = ORIGINAL_LOGO_SRC
+                else:
+                    if inline:
+                        src = "data:image/png;base64," + base64.b64encode(path.read_bytes()).decode('ascii')
+                    else:
+                        src = path.relative_to(BASE_DIR).as_posix()
+                _sources[key] = src
+    return src
+
+
+def inline_logo(html_content):
+    """Point references to the original logo (e.g. in Claude-generated HTML) at the optimized one"""
+    if ORIGINAL_LOGO_SRC not in html_content:
+        return html_content
+    src = logo_src()
+    if src == ORIGINAL_LOGO_SRC:
+        return html_content
+    for quote in ('"', "'"):
+        html_content = html_content.replace(f"{quote}{ORIGINAL_LOGO_SRC}{quote}", f"{quote}{src}{quote}")
+    return html_content
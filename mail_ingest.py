@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+IMAP Mail Ingestion Worker
+Pulls booking PDFs (Cloudbeds confirmations, agent vouchers) from a mailbox
+and transforms them. Sync is incremental by UID: only messages above the
+last UID seen are searched, their Content-Type headers are fetched in
+batches to skip mail without attachments, and the remaining bodies are
+fetched a batch per round trip and handed to the extraction pipeline as
+in-memory bytes (no temp files). Each UID's outcome is kept in a SQLite
+state store, so a restart picks up exactly where the last run stopped and
+the mailbox itself is opened read-only
+
+Usage:
+  python mail_ingest.py                      # catch up once (IMAP_* settings from .env)
+  python mail_ingest.py --watch              # keep polling for new mail
+  python mail_ingest.py --dry-run            # list the PDFs that would be processed
+  python mail_ingest.py --status             # state store counts
+"""
+
+import argparse
+import email
+import imaplib
+import os
+import re
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email import policy
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from batch_transform import DEFAULT_CONCURRENCY, process_one
+
+load_dotenv()
+
+DEFAULT_STATE_PATH = Path('cache') / 'mail_state.db'
+DEFAULT_MAILBOX = 'INBOX'
+DEFAULT_BATCH_SIZE = 100    # UIDs per FETCH round trip
+DEFAULT_POLL_SECONDS = 60
+IMAP_TIMEOUT = 60
+
+PENDING, DONE, FAILED, SKIPPED = 'pending', 'done', 'failed', 'skipped'
+
+UID_PATTERN = re.compile(rb'UID (\d+)')
+ATTACHMENT_TYPE = re.compile(rb'content-type:\s*(multipart|application)/', re.IGNORECASE)
+
+
+def uid_set(uids):
+    """Compact IMAP sequence set: [1, 2, 3, 7, 9, 10] -> '1:3,7,9:10'"""
+    ranges = []
+    for uid in sorted(uids):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ','.join(str(low) if low == high else f"{low}:{high}" for low, high in ranges)
+
+
+def fetched_literals(data):
+    """{uid: literal} from a UID FETCH response carrying one literal per message
+
+    The UID is usually before the literal, but some servers send it after.
+    """
+    results = {}
+    orphan = None
+    for item in data:
+        if isinstance(item, tuple):
+            match = UID_PATTERN.search(item[0])
+            if match:
+                results[int(match.group(1))] = item[1]
+                orphan = None
+            else:
+                orphan = item[1]
+        elif item and orphan is not None:
+            match = UID_PATTERN.search(item)
+            if match:
+                results[int(match.group(1))] = orphan
+            orphan = None
+    return results
+
+
+def may_have_attachments(content_type_header):
+    return bool(ATTACHMENT_TYPE.search(content_type_header or b''))
+
+
+def pdf_attachments(raw_message):
+    """(filename, bytes) for every PDF attached to a raw RFC 822 message"""
+    message = email.message_from_bytes(raw_message, policy=policy.default)
+    for index, part in enumerate(message.walk()):
+        if part.is_multipart():
+            continue
+        filename = part.get_filename() or ''
+        if part.get_content_type() != 'application/pdf' and not filename.lower().endswith('.pdf'):
+            continue
+        data = part.get_payload(decode=True)
+        if data and b'%PDF' in data[:1024]:
+            yield filename or f"attachment-{index}.pdf", data
+
+
+class MailState:
+    """Processed-UID store: one row per message UID seen in each mailbox"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.getenv('MAIL_STATE_PATH', DEFAULT_STATE_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS mailboxes (
+                    mailbox TEXT PRIMARY KEY,
+                    uidvalidity INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    mailbox TEXT NOT NULL,
+                    uid INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    attachments INTEGER NOT NULL DEFAULT 0,
+                    error TEXT NOT NULL DEFAULT '',
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (mailbox, uid)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def check_uidvalidity(self, mailbox, uidvalidity):
+        """Forget a mailbox's UIDs if the server renumbered it; True if it did"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT uidvalidity FROM mailboxes WHERE mailbox = ?", (mailbox,)).fetchone()
+            if row is not None and row[0] == uidvalidity:
+                return False
+            conn.execute("DELETE FROM messages WHERE mailbox = ?", (mailbox,))
+            conn.execute("INSERT OR REPLACE INTO mailboxes (mailbox, uidvalidity) VALUES (?, ?)",
+                         (mailbox, uidvalidity))
+            return row is not None
+
+    def last_uid(self, mailbox):
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(uid) FROM messages WHERE mailbox = ?", (mailbox,)).fetchone()
+        return row[0] or 0
+
+    def unfinished(self, mailbox, retry_failed=False):
+        """UIDs fetched but not finished (interrupted run), plus failures if asked"""
+        statuses = (PENDING, FAILED) if retry_failed else (PENDING,)
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT uid FROM messages WHERE mailbox = ? AND status IN "
+                                f"({','.join('?' * len(statuses))})", (mailbox, *statuses)).fetchall()
+        return [row[0] for row in rows]
+
+    def mark(self, mailbox, uids, status, attachments=0, error=''):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO messages (mailbox, uid, status, attachments, error, "
+                             "updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                             [(mailbox, uid, status, attachments, error, now) for uid in uids])
+
+    def counts(self):
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM messages GROUP BY status").fetchall())
+
+
+class MailIngestor:
+    """Incremental UID sync of one mailbox into the transformation pipeline"""
+
+    def __init__(self, transformer=None, host=None, port=None, user=None, password=None, mailbox=None,
+                 use_ssl=None, state=None, batch_size=None, concurrency=DEFAULT_CONCURRENCY,
+                 retry_failed=False):
+        """transformer=None is a dry run: attachments are listed, not processed or recorded"""
+        self.transformer = transformer
+        self.host = host or os.getenv('IMAP_HOST', 'localhost')
+        if use_ssl is None:
+            use_ssl = os.getenv('IMAP_SSL', 'true').lower() == 'true'
+        self.use_ssl = use_ssl
+        self.port = int(port or os.getenv('IMAP_PORT', 993 if use_ssl else 143))
+        self.user = user or os.getenv('IMAP_USER', '')
+        self.password = password or os.getenv('IMAP_PASSWORD', '')
+        self.mailbox = mailbox or os.getenv('IMAP_MAILBOX', DEFAULT_MAILBOX)
+        self.state = state or MailState()
+        self.batch_size = max(1, batch_size or int(os.getenv('MAIL_BATCH_SIZE', DEFAULT_BATCH_SIZE)))
+        self.concurrency = max(1, concurrency)
+        self.retry_failed = retry_failed
+        self.lock = threading.Lock()
+        self.counts = {'messages': 0, 'pdfs': 0, 'done': 0, 'failed': 0}
+
+    def connect(self):
+        imap_class = imaplib.IMAP4_SSL if self.use_ssl else imaplib.IMAP4
+        imap = imap_class(self.host, self.port, timeout=IMAP_TIMEOUT)
+        imap.login(self.user, self.password)
+        return imap
+
+    def fetch(self, imap, uids, items):
+        typ, data = imap.uid('FETCH', uid_set(uids), items)
+        if typ != 'OK':
+            raise imaplib.IMAP4.error(f"UID FETCH failed: {data}")
+        return fetched_literals(data)
+
+    def mark(self, uids, status, attachments=0, error=''):
+        if self.transformer is not None:
+            self.state.mark(self.mailbox, uids, status, attachments, error)
+
+    def count(self, **increments):
+        with self.lock:
+            for key, value in increments.items():
+                self.counts[key] += value
+
+    def process_message(self, uid, raw_message):
+        """Run every PDF in one message through the pipeline and record the UID's outcome"""
+        attachments = list(pdf_attachments(raw_message))
+        if not attachments:
+            self.mark([uid], SKIPPED)
+            return
+
+        errors = []
+        for filename, data in attachments:
+            if self.transformer is None:
+                print(f"  UID {uid}: {filename} ({len(data) / 1024:.0f} KB)")
+                continue
+            result = process_one(self.transformer, data)
+            if result['ok']:
+                self.count(done=1)
+                print(f"✓ UID {uid} {filename} → {result['output']} ({result['seconds']:.1f}s)")
+            else:
+                self.count(failed=1)
+                errors.append(f"{filename}: {result['error']}")
+                print(f"❌ UID {uid} {filename}: {result['error']}")
+        self.count(pdfs=len(attachments))
+        self.mark([uid], FAILED if errors else DONE, len(attachments), '; '.join(errors))
+
+    def sync(self):
+        """Fetch and process everything new since the last run; returns the counts"""
+        self.counts = dict.fromkeys(self.counts, 0)
+        imap = self.connect()
+        try:
+            typ, _ = imap.select(self.mailbox, readonly=True)
+            if typ != 'OK':
+                raise imaplib.IMAP4.error(f"Cannot open mailbox {self.mailbox}")
+            uidvalidity = int(imap.response('UIDVALIDITY')[1][0] or 0)
+            if self.transformer is not None and self.state.check_uidvalidity(self.mailbox, uidvalidity):
+                print(f"⚠️ {self.mailbox} was renumbered (UIDVALIDITY changed); re-reading it")
+
+            last_uid = self.state.last_uid(self.mailbox)
+            typ, data = imap.uid('SEARCH', None, f'UID {last_uid + 1}:*')
+            # "n:*" always matches the highest UID, even when it is below n
+            new_uids = [uid for uid in map(int, (data[0] or b'').split()) if uid > last_uid]
+            uids = sorted(set(self.state.unfinished(self.mailbox, self.retry_failed)) | set(new_uids))
+            if not uids:
+                print(f"✓ {self.mailbox}: no new mail")
+                return self.counts
+            print(f"📬 {self.mailbox}: {len(uids)} message(s) to check")
+
+            # Bodies are processed on the pool while the next batch downloads;
+            # the semaphore keeps at most a few batches of messages in memory
+            slots = threading.BoundedSemaphore(self.concurrency * 2)
+
+            def run(uid, raw_message):
+                try:
+                    self.process_message(uid, raw_message)
+                except Exception as e:
+                    self.mark([uid], FAILED, error=f"{type(e).__name__}: {e}")
+                    print(f"❌ UID {uid}: {type(e).__name__}: {e}")
+                finally:
+                    slots.release()
+
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='mail') as executor:
+                for start in range(0, len(uids), self.batch_size):
+                    batch = uids[start:start + self.batch_size]
+                    self.mark(batch, PENDING)
+                    headers = self.fetch(imap, batch, '(UID BODY.PEEK[HEADER.FIELDS (CONTENT-TYPE)])')
+                    candidates = [uid for uid in batch if may_have_attachments(headers.get(uid))]
+                    self.mark([uid for uid in batch if uid not in candidates], SKIPPED)
+                    if candidates:
+                        bodies = self.fetch(imap, candidates, '(UID BODY.PEEK[])')
+                        # Expunged between the two fetches
+                        self.mark([uid for uid in candidates if uid not in bodies], SKIPPED)
+                        for uid, raw_message in bodies.items():
+                            slots.acquire()
+                            executor.submit(run, uid, raw_message)
+                    self.count(messages=len(batch))
+                    print(f"  [{start + len(batch)}/{len(uids)}] {len(candidates)} with attachments")
+            return self.counts
+        finally:
+            try:
+                imap.logout()
+            except Exception:
+                pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transform booking PDFs arriving by email (IMAP)")
+    parser.add_argument('--host', help='IMAP server (default: IMAP_HOST)')
+    parser.add_argument('--port', type=int, help='IMAP port (default: IMAP_PORT, 993 / 143)')
+    parser.add_argument('--user', help='IMAP user (default: IMAP_USER; password from IMAP_PASSWORD)')
+    parser.add_argument('--mailbox', help=f'Mailbox to read (default: IMAP_MAILBOX or {DEFAULT_MAILBOX})')
+    parser.add_argument('--no-ssl', action='store_true', help='Plain IMAP (local servers only)')
+    parser.add_argument('--state', help=f'SQLite state store (default: {DEFAULT_STATE_PATH})')
+    parser.add_argument('--batch-size', type=int, help=f'UIDs per fetch (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--concurrency', '-j', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'PDFs processed at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--retry-failed', action='store_true', help='Process previously failed messages again')
+    parser.add_argument('--watch', action='store_true', help='Keep polling for new mail')
+    parser.add_argument('--interval', type=float, default=float(os.getenv('MAIL_POLL_SECONDS', DEFAULT_POLL_SECONDS)),
+                        help=f'Seconds between polls with --watch (default: {DEFAULT_POLL_SECONDS})')
+    parser.add_argument('--dry-run', action='store_true', help='List PDFs found without processing them')
+    parser.add_argument('--status', action='store_true', help='Show state store counts and exit')
+    parser.add_argument('--use-llm', action='store_true', help='Generate HTML with Claude')
+    parser.add_argument('--debug', action='store_true', help='Enable debug output')
+    args = parser.parse_args(argv)
+
+    state = MailState(args.state)
+    if args.status:
+        counts = state.counts()
+        for status in (PENDING, DONE, FAILED, SKIPPED):
+            print(f"{status:<8} {counts.get(status, 0):>7}")
+        return 0
+
+    transformer = None
+    if not args.dry_run:
+        from claude_transform import CloudbedsTransformer
+        from request_scheduler import BATCH
+
+        try:
+            transformer = CloudbedsTransformer(debug=args.debug, use_llm=args.use_llm, priority=BATCH)
+        except Exception as e:
+            print(f"\n❌ Error: {e}")
+            return 1
+
+    ingestor = MailIngestor(transformer, args.host, args.port, args.user, mailbox=args.mailbox,
+                            use_ssl=False if args.no_ssl else None, state=state,
+                            batch_size=args.batch_size, concurrency=args.concurrency,
+                            retry_failed=args.retry_failed)
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                ingestor.sync()
+            except (imaplib.IMAP4.error, OSError) as e:
+                print(f"❌ IMAP error: {e}")
+                if not args.watch:
+                    return 1
+            counts = ingestor.counts
+            print(f"Checked {counts['messages']} message(s), {counts['pdfs']} PDF(s): "
+                  f"{counts['done']} done, {counts['failed']} failed "
+                  f"({time.perf_counter() - start:.1f}s)")
+            if not args.watch or stopping.wait(args.interval):
+                break
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Pipeline Metrics
+Timing spans for each stage (rasterize, encode, API call, JSON parse,
+render, file write) and token counts from message.usage, kept in a
+process-wide registry that renders in the Prometheus text format for
+/metrics, and optionally written as JSON lines (METRICS_LOG=stderr or a path)
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; API calls run to tens of seconds, local stages to milliseconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_TYPES = (('input', 'input_tokens'), ('output', 'output_tokens'),
+               ('cache_read', 'cache_read_input_tokens'),
+               ('cache_write', 'cache_creation_input_tokens'))
+
+
+def label_text(labels):
+    """{a="1",b="2"} (sorted, escaped) or '' for no labels"""
+    if not labels:
+        return ''
+    parts = []
+    for name, value in sorted(labels):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class Histogram:
+    """Cumulative bucket counts + sum + count for one label set"""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.total += seconds
+        self.count += 1
+        for idx, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[idx] += 1
+
+
+class Metrics:
+    """Thread-safe stage timings, errors and token counters"""
+
+    def __init__(self, log_target=None):
+        self.lock = threading.Lock()
+        self.stages = {}    # labels tuple -> Histogram
+        self.errors = {}    # labels tuple -> count
+        self.tokens = {}    # labels tuple -> count
+        self.log_target = log_target if log_target is not None else os.getenv('METRICS_LOG', '')
+        self.log_lock = threading.Lock()
+
+    def log(self, event, **fields):
+        """One JSON line per event when METRICS_LOG is set"""
+        if not self.log_target:
+            return
+        line = json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}, default=str)
+        with self.log_lock:
+            if self.log_target == 'stderr':
+                print(line, file=sys.stderr, flush=True)
+            else:
+                with open(self.log_target, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+
+    def observe(self, stage, seconds, error=False, **labels):
+        key = tuple(sorted({'stage': stage, **labels}.items()))
+        with self.lock:
+            self.stages.setdefault(key, Histogram()).observe(seconds)
+            if error:
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def record_usage(self, call, usage):
+        """Token counts from a Message's usage, per API call type"""
+        if usage is None:
+            return
+        counts = {name: getattr(usage, attr, 0) or 0 for name, attr in TOKEN_TYPES}
+        with self.lock:
+            for name, value in counts.items():
+                key = (('call', call), ('type', name))
+                self.tokens[key] = self.tokens.get(key, 0) + value
+        self.log('usage', call=call, **counts)
+
+    def prometheus(self):
+        """Registry in the Prometheus text exposition format"""
+        with self.lock:
+            stages = {key: (list(h.buckets), h.total, h.count) for key, h in self.stages.items()}
+            errors = dict(self.errors)
+            tokens = dict(self.tokens)
+
+        lines = ['# HELP booking_stage_seconds Time spent per pipeline stage',
+                 '# TYPE booking_stage_seconds histogram']
+        for key, (buckets, total, count) in sorted(stages.items()):
+            for bound, value in zip(BUCKETS, buckets):
+                lines.append(f"booking_stage_seconds_bucket{label_text(key + (('le', bound),))} {value}")
+            lines.append(f"booking_stage_seconds_bucket{label_text(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"booking_stage_seconds_sum{label_text(key)} {total:.6f}")
+            lines.append(f"booking_stage_seconds_count{label_text(key)} {count}")
+
+        lines += ['# HELP booking_stage_errors_total Stages that raised',
+                  '# TYPE booking_stage_errors_total counter']
+        lines += [f"booking_stage_errors_total{label_text(key)} {value}"
+                  for key, value in sorted(errors.items())]
+
+        lines += ['# HELP booking_tokens_total Tokens reported in message.usage',
+                  '# TYPE booking_tokens_total counter']
+        lines += [f"booking_tokens_total{label_text(key)} {value}"
+                  for key, value in sorted(tokens.items())]
+        return '\n'.join(lines) + '\n'
+
+
+def counter_lines(name, help_text, values):
+    """Prometheus lines for a dict of unlabelled counters/gauges ({suffix: value})"""
+    lines = []
+    for suffix, value in values.items():
+        if value is None:
+            continue
+        lines += [f"# HELP {name}_{suffix} {help_text} ({suffix.replace('_', ' ')})",
+                  f"# TYPE {name}_{suffix} gauge",
+                  f"{name}_{suffix} {value}"]
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time a block as one observation of stage
+
+    Yields a dict; anything put in it (pages, bytes, ...) goes to the
+    structured log only, not to metric labels.
+    """
+    fields = {}
+    start = time.perf_counter()
+    error = False
+    try:
+        yield fields
+    except Exception:
+        error = True
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe(stage, seconds, error, **labels)
+        metrics.log('span', stage=stage, seconds=round(seconds, 6), error=error, **labels, **fields)
+
+
+def record_usage(call, usage):
+    metrics.record_usage(call, usage)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Adaptive PDF Rasterization for Claude Vision
+Renders pages only as large as the vision model actually looks at (it
+downsamples anything over ~1568px / 1.15MP), in grayscale, and encodes each
+page with whichever of PNG / JPEG / WebP comes out smallest, instead of
+200 DPI colour PNGs that are mostly thrown away server-side
+"""
+
+import base64
+import os
+import time
+from io import BytesIO
+
+from pdf2image import convert_from_bytes, convert_from_path
+from PIL import Image
+
+from metrics import span
+from pdf_text import reader_input
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # Optional - fall back to A4 for DPI selection
+    PdfReader = None
+
+MAX_LONG_EDGE = 1568        # Longest side Claude vision uses without resizing
+MAX_PIXELS = 1150000        # ~1.15 megapixels per image
+MIN_DPI = 72
+MAX_DPI = 200
+A4_POINTS = (595, 842)
+MIN_LOSSY_QUALITY = 70      # Below this small print in the rate tables starts to smear
+FORMATS = ('png', 'jpeg', 'webp')
+MEDIA_TYPES = {'png': 'image/png', 'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+
+
+class RasterSettings:
+    """How PDF pages are rendered and encoded for vision extraction"""
+
+    def __init__(self, dpi=None, grayscale=True, image_format='auto', quality=85,
+                 max_long_edge=MAX_LONG_EDGE):
+        """dpi=None picks the DPI from the page size; max_long_edge=None skips
+        downsampling; image_format is 'auto' (smallest of png/jpeg/webp),
+        'png', 'jpeg' or 'webp'"""
+        if image_format != 'auto' and image_format not in FORMATS:
+            raise ValueError(f"Unknown image format: {image_format}")
+        self.dpi = dpi
+        self.grayscale = grayscale
+        self.image_format = image_format
+        self.quality = max(MIN_LOSSY_QUALITY, min(int(quality), 100))
+        self.max_long_edge = max_long_edge
+
+    @classmethod
+    def from_env(cls):
+        """Settings from RASTER_DPI / RASTER_GRAYSCALE / RASTER_FORMAT / RASTER_QUALITY"""
+        dpi = os.getenv('RASTER_DPI')
+        return cls(
+            dpi=int(dpi) if dpi and dpi != 'auto' else None,
+            grayscale=os.getenv('RASTER_GRAYSCALE', 'true').lower() == 'true',
+            image_format=os.getenv('RASTER_FORMAT', 'auto').lower(),
+            quality=int(os.getenv('RASTER_QUALITY', 85))
+        )
+
+    def describe(self):
+        dpi = self.dpi or 'auto'
+        colour = 'gray' if self.grayscale else 'colour'
+        return f"{dpi} dpi, {colour}, {self.image_format} q{self.quality}"
+
+
+def page_size_points(pdf_path):
+    """(width, height) in points of the largest page, A4 if unknown"""
+    if PdfReader is None:
+        return A4_POINTS
+    try:
+        boxes = [page.mediabox for page in PdfReader(reader_input(pdf_path)).pages]
+    except Exception:
+        return A4_POINTS
+    if not boxes:
+        return A4_POINTS
+    box = max(boxes, key=lambda b: float(b.width) * float(b.height))
+    return float(box.width), float(box.height)
+
+
+def dpi_for_page(width_pt, height_pt, max_long_edge=MAX_LONG_EDGE):
+    """DPI at which the page's long edge lands on max_long_edge pixels"""
+    dpi = max_long_edge / (max(width_pt, height_pt) / 72.0)
+    return int(max(MIN_DPI, min(dpi, MAX_DPI)))
+
+
+def fit_to_vision(image, max_long_edge=MAX_LONG_EDGE):
+    """Downsample to the vision model's effective resolution (None = leave as rendered)"""
+    if not max_long_edge:
+        return image
+    width, height = image.size
+    scale = min(1.0, max_long_edge / max(width, height), (MAX_PIXELS / (width * height)) ** 0.5)
+    if scale < 1.0:
+        image = image.resize((int(width * scale), int(height * scale)), resample=Image.LANCZOS)
+    return image
+
+
+def rasterize(pdf_path, settings):
+    """Render PDF pages (a path or the PDF's bytes) per settings, already sized for vision"""
+    dpi = settings.dpi or dpi_for_page(*page_size_points(pdf_path),
+                                       settings.max_long_edge or MAX_LONG_EDGE)
+    if isinstance(pdf_path, (bytes, bytearray)):
+        images = convert_from_bytes(pdf_path, dpi=dpi, grayscale=settings.grayscale)
+    else:
+        images = convert_from_path(pdf_path, dpi=dpi, grayscale=settings.grayscale)
+    return [fit_to_vision(image, settings.max_long_edge) for image in images]
+
+
+def encode(image, image_format, quality):
+    """Encode one image; returns bytes"""
+    buffered = BytesIO()
+    if image_format == 'png':
+        image.save(buffered, format='PNG', optimize=True)
+    elif image_format == 'jpeg':
+        image.convert('L' if image.mode in ('L', '1') else 'RGB').save(
+            buffered, format='JPEG', quality=quality, optimize=True)
+    else:
+        image.save(buffered, format='WEBP', quality=quality, method=4)
+    return buffered.getvalue()
+
+
+def encode_image(image, settings):
+    """(media_type, bytes) using the configured or the smallest encoding"""
+    if settings.image_format != 'auto':
+        return MEDIA_TYPES[settings.image_format], encode(image, settings.image_format, settings.quality)
+
+    best = None
+    for image_format in FORMATS:
+        try:
+            data = encode(image, image_format, settings.quality)
+        except (OSError, KeyError):  # Pillow built without WebP support
+            continue
+        if best is None or len(data) < len(best[1]):
+            best = (MEDIA_TYPES[image_format], data)
+    return best
+
+
+def image_blocks(pdf_path, settings, stats=None):
+    """Claude image content blocks for every page of the PDF
+
+    If a dict is passed as stats it receives pages / bytes / seconds.
+    """
+    start = time.perf_counter()
+    blocks = []
+    total_bytes = 0
+    with span('rasterize') as fields:
+        images = rasterize(pdf_path, settings)
+        fields.update(pages=len(images), settings=settings.describe())
+    for image in images:
+        with span('image_encode') as fields:
+            media_type, data = encode_image(image, settings)
+            fields.update(media_type=media_type, bytes=len(data))
+        total_bytes += len(data)
+        with span('base64_encode'):
+            encoded = base64.b64encode(data).decode('utf-8')
+        blocks.append({
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": media_type,
+                "data": encoded
+            }
+        })
+    if stats is not None:
+        stats.update(pages=len(blocks), bytes=total_bytes, seconds=time.perf_counter() - start)
+    return blocks
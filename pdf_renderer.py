@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Offline HTML-to-PDF Rendering
+Turns saved confirmations into A4 PDFs with WeasyPrint at the 95% scale from
+config.yaml's design section, replacing the manual Chrome print step.
+Renderers are kept warm in a pool: each holds its font configuration, the
+parsed page stylesheet and every fetched resource (logo, fonts.css, font
+files), and nothing is fetched from the network
+"""
+
+import os
+import queue
+import threading
+from pathlib import Path
+
+try:
+    from weasyprint import CSS, HTML, default_url_fetcher
+    from weasyprint.text.fonts import FontConfiguration
+except ImportError:  # Optional - without it confirmations are HTML only
+    HTML = None
+
+from app_config import config_section
+from metrics import span
+
+BASE_DIR = Path(__file__).resolve().parent
+FONTS_CSS = BASE_DIR / 'assets' / 'fonts' / 'fonts.css'
+GOOGLE_FONTS = ('https://fonts.googleapis.com/', 'http://fonts.googleapis.com/')
+DEFAULT_SCALE = 0.95        # config.yaml design.font_scale
+DEFAULT_MARGIN = '0.5cm'    # Same as the templates' print styles
+DEFAULT_POOL_SIZE = 2
+
+
+def pdf_available():
+    return HTML is not None
+
+
+def page_settings():
+    """Page size, margin and scale, from config.yaml's design section where set"""
+    design = config_section('design')
+    return {
+        'size': design.get('page_size', 'A4'),
+        'margin': design.get('page_margin', DEFAULT_MARGIN),
+        'scale': float(design.get('font_scale', DEFAULT_SCALE)),
+    }
+
+
+class PdfRenderer:
+    """One warm WeasyPrint renderer (not shared between threads)"""
+
+    def __init__(self, settings=None):
+        if HTML is None:
+            raise RuntimeError("PDF output needs WeasyPrint: pip install weasyprint")
+        self.settings = settings or page_settings()
+        self.font_config = FontConfiguration()
+        self.resources = {}   # url -> fetched resource, kept for the life of the renderer
+        self.stylesheets = [CSS(
+            string=f"@page {{ size: {self.settings['size']}; margin: {self.settings['margin']}; }}",
+            font_config=self.font_config
+        )]
+
+    def fetch(self, url):
+        """Local-only URL fetcher with an in-memory cache"""
+        if url.startswith(GOOGLE_FONTS):
+            url = FONTS_CSS.as_uri()
+        elif url.startswith(('http://', 'https://')):
+            raise ValueError(f"Offline PDF rendering: not fetching {url}")
+
+        resource = self.resources.get(url)
+        if resource is None:
+            fetched = default_url_fetcher(url)
+            if 'file_obj' in fetched:
+                with fetched.pop('file_obj') as f:
+                    fetched['string'] = f.read()
+            resource = {key: fetched[key] for key in
+                        ('string', 'mime_type', 'encoding', 'redirected_url') if key in fetched}
+            self.resources[url] = resource
+        return dict(resource)
+
+    def render(self, html_content, pdf_path):
+        """Write html_content as a PDF; relative URLs resolve against the project folder"""
+        HTML(string=html_content, base_url=str(BASE_DIR) + os.sep, url_fetcher=self.fetch).write_pdf(
+            str(pdf_path), stylesheets=self.stylesheets, zoom=self.settings['scale'],
+            font_config=self.font_config
+        )
+        return pdf_path
+
+
+class PdfRendererPool:
+    """Up to size warm renderers, created on first use and reused"""
+
+    def __init__(self, size=None, settings=None):
+        self.size = max(1, size or int(os.getenv('PDF_RENDERERS', DEFAULT_POOL_SIZE)))
+        self.settings = settings or page_settings()
+        self.idle = queue.LifoQueue()   # Most recently used first: warmest caches
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return PdfRenderer(self.settings)
+            except Exception:
+                with self.lock:
+                    self.created -= 1
+                raise
+        return self.idle.get()
+
+    def render(self, html_content, pdf_path):
+        """Render on a pooled renderer; returns pdf_path"""
+        renderer = self.acquire()
+        try:
+            with span('pdf_render') as fields:
+                renderer.render(html_content, pdf_path)
+                fields.update(bytes=Path(pdf_path).stat().st_size)
+        finally:
+            self.idle.put(renderer)
+        return pdf_path
+
+
+_lock = threading.Lock()
+_pool = None
+
+
+def get_pdf_pool():
+    """The process-wide renderer pool"""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = PdfRendererPool()
+    return _pool
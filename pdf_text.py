@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+PDF Text-Layer Extraction
+Pulls the embedded text layer from born-digital PDFs (pure Python, no
+poppler) so extraction can go through the cheaper text path, with a quality
+check that sends scanned / outlined PDFs back to vision
+"""
+
+import re
+from io import BytesIO
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # Optional - vision path still works without it
+    PdfReader = None
+
+MIN_TEXT_CHARS = 200       # Less than this is a scan or an empty layer
+MIN_WORD_RATIO = 0.6       # Share of tokens that look like real words/numbers
+MAX_GARBAGE_RATIO = 0.02   # (cid:NN) glyph refs / replacement characters
+BOOKING_MARKERS = ('check', 'reservation', 'booking', 'guest', 'total', 'arrival', 'confirmation')
+
+WORD_PATTERN = re.compile(r"^[\w@.,:/#&()'+\-$€£%]+$")
+GARBAGE_PATTERN = re.compile(r'\(cid:\d+\)|�')
+
+
+def reader_input(pdf):
+    """What PdfReader takes for a PDF given as a path or as its bytes"""
+    return BytesIO(pdf) if isinstance(pdf, (bytes, bytearray)) else str(pdf)
+
+
+def extract_pdf_text(pdf_path):
+    """Return the PDF's text layer, or '' if unavailable or unreadable"""
+    if PdfReader is None:
+        return ''
+    try:
+        reader = PdfReader(reader_input(pdf_path))
+        pages = [page.extract_text() or '' for page in reader.pages]
+    except Exception:
+        return ''
+    return '\n\n'.join(page.strip() for page in pages if page.strip())
+
+
+def text_layer_quality(text):
+    """Score a text layer; returns (usable, reason)"""
+    stripped = text.strip()
+    if len(stripped) < MIN_TEXT_CHARS:
+        return False, f"only {len(stripped)} characters"
+
+    garbage = sum(len(m.group(0)) for m in GARBAGE_PATTERN.finditer(stripped))
+    if garbage / len(stripped) > MAX_GARBAGE_RATIO:
+        return False, "unmapped glyphs (cid/replacement characters)"
+
+    tokens = stripped.split()
+    words = sum(1 for token in tokens if WORD_PATTERN.match(token))
+    if words / len(tokens) < MIN_WORD_RATIO:
+        return False, f"only {words / len(tokens):.0%} of tokens look like words"
+
+    lowered = stripped.lower()
+    if not any(marker in lowered for marker in BOOKING_MARKERS):
+        return False, "no booking keywords found"
+
+    return True, "ok"
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Rate-Limit-Aware Request Scheduler
+Every model call goes through one process-wide scheduler that keeps within a
+requests-per-minute / input-tokens-per-minute budget and a concurrency cap,
+lets interactive (web) calls go ahead of batch work, and retries 429 / 529 /
+connection errors with jittered exponential backoff, honouring retry-after
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+try:
+    from anthropic import APIConnectionError
+except ImportError:  # Only needed to classify errors
+    APIConnectionError = ConnectionError
+
+INTERACTIVE, BATCH = 'interactive', 'batch'
+
+DEFAULT_RPM = 50
+DEFAULT_ITPM = 30000        # Input tokens per minute (tier 1)
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+WINDOW_SECONDS = 60.0
+POLL_SECONDS = 0.05
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+IMAGE_TOKENS = 1600          # ~1.15MP image
+DOCUMENT_TOKENS = 3000       # Page text + page image for a short PDF
+
+
+def estimate_tokens(params):
+    """Rough input token count for a Messages API request (~4 chars per token)"""
+    tokens = 0
+
+    def walk(value):
+        nonlocal tokens
+        if isinstance(value, dict):
+            if value.get('type') == 'image':
+                tokens += IMAGE_TOKENS
+                return
+            if value.get('type') == 'document':
+                tokens += DOCUMENT_TOKENS
+                return
+            for item in value.values():
+                walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+        elif isinstance(value, str):
+            tokens += len(value) // 4
+
+    walk(params.get('system'))
+    walk(params.get('messages'))
+    if 'output_format' in params:
+        tokens += len(json.dumps(params['output_format'])) // 4
+    return max(tokens, 1)
+
+
+def input_tokens(usage):
+    """Input tokens counted against the ITPM limit (cache reads are not)"""
+    if usage is None:
+        return None
+    return (getattr(usage, 'input_tokens', 0) or 0) + (getattr(usage, 'cache_creation_input_tokens', 0) or 0)
+
+
+def retry_after(error):
+    """Seconds from the retry-after-ms / retry-after headers, or None"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def is_retryable(error):
+    """429 / 529 / 5xx / timeouts / dropped connections"""
+    if isinstance(error, APIConnectionError):
+        return True
+    return getattr(error, 'status_code', None) in RETRYABLE_STATUS
+
+
+class Slot:
+    """One reserved request in the limiter's window"""
+
+    def __init__(self, tokens):
+        self.started = time.monotonic()
+        self.tokens = tokens
+
+
+class RateLimiter:
+    """Sliding one-minute RPM / ITPM window plus a concurrency cap
+
+    reserve() never blocks: it returns a Slot, or the seconds to wait before
+    asking again, so the same limiter serves threads and asyncio tasks.
+    Batch callers are held back while an interactive caller is waiting.
+    """
+
+    def __init__(self, rpm=DEFAULT_RPM, itpm=DEFAULT_ITPM, max_concurrency=DEFAULT_CONCURRENCY):
+        self.rpm = rpm
+        self.itpm = itpm
+        self.max_concurrency = max_concurrency
+        self.window = deque()       # Slots started in the last minute
+        self.in_flight = 0
+        self.interactive_waiting = 0
+        self.paused_until = 0.0     # Set from retry-after: the whole process backs off
+        self.lock = threading.Lock()
+
+    def waiting(self, priority, delta):
+        if priority == INTERACTIVE:
+            with self.lock:
+                self.interactive_waiting += delta
+
+    def reserve(self, tokens, priority=INTERACTIVE):
+        """Slot, or seconds to wait before trying again"""
+        now = time.monotonic()
+        with self.lock:
+            while self.window and now - self.window[0].started >= WINDOW_SECONDS:
+                self.window.popleft()
+
+            if now < self.paused_until:
+                return self.paused_until - now
+            if priority == BATCH and self.interactive_waiting:
+                return POLL_SECONDS
+            if self.max_concurrency and self.in_flight >= self.max_concurrency:
+                return POLL_SECONDS
+            if self.rpm and len(self.window) >= self.rpm:
+                return self.window[-self.rpm].started + WINDOW_SECONDS - now
+
+            if self.itpm and self.window:
+                # A request bigger than the whole budget still goes, once the window is empty
+                excess = sum(slot.tokens for slot in self.window) + min(tokens, self.itpm) - self.itpm
+                if excess > 0:
+                    for slot in self.window:
+                        excess -= slot.tokens
+                        if excess <= 0:
+                            return max(POLL_SECONDS, slot.started + WINDOW_SECONDS - now)
+
+            slot = Slot(tokens)
+            self.window.append(slot)
+            self.in_flight += 1
+            return slot
+
+    def release(self, slot, tokens=None):
+        """Finish a request, correcting its token count from the response usage"""
+        with self.lock:
+            self.in_flight -= 1
+            if tokens is not None:
+                slot.tokens = tokens
+
+    def pause(self, seconds):
+        """Hold every caller back (server said retry-after)"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class SchedulerStats:
+    """Counters for how often calls were throttled, retried and queued"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failed = 0
+        self.queued_seconds = 0.0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self.lock:
+            return {'calls': self.calls, 'retries': self.retries, 'throttled': self.throttled,
+                    'failed': self.failed, 'queued_seconds': round(self.queued_seconds, 3)}
+
+
+class RequestScheduler:
+    """Run model calls within the rate budget, retrying transient failures"""
+
+    def __init__(self, limiter=None, max_retries=DEFAULT_RETRIES,
+                 backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX):
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = SchedulerStats()
+
+    @classmethod
+    def from_env(cls):
+        """ANTHROPIC_RPM / ANTHROPIC_ITPM / ANTHROPIC_CONCURRENCY (0 = no limit),
+        ANTHROPIC_RETRIES, ANTHROPIC_BACKOFF_BASE / ANTHROPIC_BACKOFF_MAX"""
+        return cls(
+            RateLimiter(rpm=int(os.getenv('ANTHROPIC_RPM', DEFAULT_RPM)),
+                        itpm=int(os.getenv('ANTHROPIC_ITPM', DEFAULT_ITPM)),
+                        max_concurrency=int(os.getenv('ANTHROPIC_CONCURRENCY', DEFAULT_CONCURRENCY))),
+            max_retries=int(os.getenv('ANTHROPIC_RETRIES', DEFAULT_RETRIES)),
+            backoff_base=float(os.getenv('ANTHROPIC_BACKOFF_BASE', DEFAULT_BACKOFF_BASE)),
+            backoff_max=float(os.getenv('ANTHROPIC_BACKOFF_MAX', DEFAULT_BACKOFF_MAX))
+        )
+
+    def backoff(self, error, attempt):
+        """Delay before retry number attempt+1: retry-after if sent, else full jitter"""
+        delay = retry_after(error)
+        if delay is not None:
+            self.limiter.pause(delay)
+            return delay
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def should_retry(self, error, attempt):
+        retry = is_retryable(error) and attempt < self.max_retries
+        self.stats.add(retries=int(retry), throttled=int(getattr(error, 'status_code', None) == 429),
+                       failed=int(not retry))
+        return retry
+
+    def acquire(self, params, priority=INTERACTIVE):
+        """Block until the request fits the budget; returns its Slot"""
+        tokens = estimate_tokens(params)
+        start = time.monotonic()
+        self.limiter.waiting(priority, 1)
+        try:
+            while True:
+                slot = self.limiter.reserve(tokens, priority)
+                if isinstance(slot, Slot):
+                    break
+                time.sleep(slot)
+        finally:
+            self.limiter.waiting(priority, -1)
+        self.stats.add(calls=1, queued_seconds=time.monotonic() - start)
+        return slot
+
+    async def acquire_async(self, params, priority=BATCH):
+        tokens = estimate_tokens(params)
+        start = time.monotonic()
+        self.limiter.waiting(priority, 1)
+        try:
+            while True:
+                slot = self.limiter.reserve(tokens, priority)
+                if isinstance(slot, Slot):
+                    break
+                await asyncio.sleep(slot)
+        finally:
+            self.limiter.waiting(priority, -1)
+        self.stats.add(calls=1, queued_seconds=time.monotonic() - start)
+        return slot
+
+    def call(self, fn, params, priority=INTERACTIVE):
+        """fn(params) -> Message, within budget and with retries"""
+        attempt = 0
+        while True:
+            slot = self.acquire(params, priority)
+            message = None
+            try:
+                message = fn(params)
+                return message
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                delay = self.backoff(e, attempt)
+            finally:
+                self.limiter.release(slot, input_tokens(getattr(message, 'usage', None)))
+            attempt += 1
+            time.sleep(delay)
+
+    async def call_async(self, fn, params, priority=BATCH):
+        """await fn(params) -> Message, within budget and with retries"""
+        attempt = 0
+        while True:
+            slot = await self.acquire_async(params, priority)
+            message = None
+            try:
+                message = await fn(params)
+                return message
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                delay = self.backoff(e, attempt)
+            finally:
+                self.limiter.release(slot, input_tokens(getattr(message, 'usage', None)))
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stream(self, open_stream, params, priority=INTERACTIVE, on_message=None):
+        """Yield text from open_stream(params) (a messages.stream manager)
+
+        on_message receives the final Message. Failures are only retried
+        before the first chunk - after that the caller already has part of
+        the reply.
+        """
+        attempt = 0
+        while True:
+            slot = self.acquire(params, priority)
+            started = False
+            usage = None
+            try:
+                with open_stream(params) as stream:
+                    for text in stream.text_stream:
+                        started = True
+                        yield text
+                    message = stream.get_final_message()
+                    usage = message.usage
+                if on_message is not None:
+                    on_message(message)
+                return
+            except Exception as e:
+                if started or not self.should_retry(e, attempt):
+                    raise
+                delay = self.backoff(e, attempt)
+            finally:
+                self.limiter.release(slot, input_tokens(usage))
+            attempt += 1
+            time.sleep(delay)
+
+
+_lock = threading.Lock()
+_scheduler = None
+
+
+def get_scheduler():
+    """The process-wide scheduler (one budget shared by every transformer)"""
+    global _scheduler
+    if _scheduler is None:
+        with _lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler.from_env()
+    return _scheduler
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compiled Template Engine
+Parses each placeholder template once into literal chunks + slot references,
+caches the result in-process, and renders with a single join
+"""
+
+import os
+import re
+import threading
+from pathlib import Path
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{([A-Z0-9_]+)\}\}')
+
+
+class CompiledTemplate:
+    """A template pre-split into literal segments and {{SLOT}} positions"""
+
+    def __init__(self, source):
+        self.segments = []
+        self.slots = []  # (segment index, placeholder name)
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            self.segments.append(source[position:match.start()])
+            self.slots.append((len(self.segments), match.group(1)))
+            self.segments.append('')
+            position = match.end()
+        self.segments.append(source[position:])
+        self.placeholders = frozenset(name for _, name in self.slots)
+
+    def render(self, context):
+        """Fill every slot from context (missing names render empty)"""
+        parts = self.segments[:]
+        for index, name in self.slots:
+            parts[index] = context.get(name, '')
+        return ''.join(parts)
+
+
+class TemplateLoader:
+    """Load and cache compiled templates keyed by path and mtime
+
+    With hot_reload=False a template is read and compiled once per process.
+    With hot_reload=True every lookup stats the file and recompiles it when
+    the mtime changes - for editing templates while the web UI is running.
+    """
+
+    def __init__(self, template_dir, hot_reload=False):
+        self.template_dir = Path(template_dir)
+        self.hot_reload = hot_reload
+        self._cache = {}  # path -> (mtime_ns, CompiledTemplate)
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """Return the compiled template for a path relative to template_dir"""
+        path = self.template_dir / name
+        cached = self._cache.get(path)
+        if cached is not None and not self.hot_reload:
+            return cached[1]
+
+        mtime = os.stat(path).st_mtime_ns
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            with open(path, 'r', encoding='utf-8') as f:
+                template = CompiledTemplate(f.read())
+            self._cache[path] = (mtime, template)
+            return template
+
+    def render(self, name, context):
+        """Render a template by name"""
+        return self.get(name).render(context)
+
+    def clear(self):
+        """Drop all cached templates"""
+        with self._lock:
+            self._cache.clear()
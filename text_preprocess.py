@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Token-Budgeted Text Preprocessing
+Shrinks pasted / DOCX-derived booking text before it goes into a text
+extraction prompt: whitespace is normalized, our own rate terms (the
+docs/*_terms.txt boilerplate agents paste back into vouchers) and page
+markers are removed, repeated header lines are dropped, and whatever is
+still over the token budget is cut, prose first, so lines carrying booking
+data (numbers, emails, labels, table rows) are the last to go. Clean
+vouchers pass through almost unchanged (the reference voucher: 541 -> 540
+tokens); only text with our terms or repeated headers pasted in shrinks
+"""
+
+import glob
+import hashlib
+import math
+import os
+import re
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_BOILERPLATE = str(BASE_DIR / 'docs' / '*_terms.txt')
+DEFAULT_TOKEN_BUDGET = 3000
+CHARS_PER_TOKEN = 4         # Same rough estimate the request scheduler uses
+MIN_FRAGMENT_CHARS = 30     # Shorter lines must match a boilerplate line exactly
+MIN_DUPLICATE_CHARS = 12
+
+MARKDOWN_PREFIX = re.compile(r'^\s*(?:#+|[-*•]|\d+[.)])\s+')
+NON_WORD = re.compile(r'[^a-z0-9]+')
+PAGE_MARKER = re.compile(r'^(?:page\s*)?\d+\s*(?:of|/)\s*\d+$|^page\s+\d+$', re.IGNORECASE)
+DATA_LINE = re.compile(r'\d|@|:|\|')
+INLINE_SPACE = re.compile(r'[ \t\u00a0\u2000-\u200b\u202f\u3000]+')
+
+_lock = threading.Lock()
+_boilerplate = {}   # glob pattern -> (exact fingerprints, joined corpus)
+
+
+class PreparedText(str):
+    """Text returned by prepare_text, so it isn't prepared a second time"""
+
+
+def fingerprint(line):
+    """Comparison key for a line: lowercase words only, list / heading markers dropped"""
+    line = MARKDOWN_PREFIX.sub('', line.replace('**', ''))
+    return NON_WORD.sub(' ', line.lower()).strip()
+
+
+def count_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def boilerplate(pattern=None):
+    """(set of line fingerprints, corpus string) for the boilerplate files, loaded once"""
+    pattern = pattern or os.getenv('TEXT_BOILERPLATE', DEFAULT_BOILERPLATE)
+    entry = _boilerplate.get(pattern)
+    if entry is None:
+        with _lock:
+            entry = _boilerplate.get(pattern)
+            if entry is None:
+                lines = []
+                for path in sorted(glob.glob(pattern)):
+                    with open(path, encoding='utf-8') as f:
+                        lines.extend(fingerprint(line) for line in f)
+                lines = [line for line in lines if line]
+                entry = (set(lines), ' '.join(lines))
+                _boilerplate[pattern] = entry
+    return entry
+
+
+def token_budget():
+    return int(os.getenv('TEXT_TOKEN_BUDGET', DEFAULT_TOKEN_BUDGET))
+
+
+def settings_key(boilerplate_pattern=None):
+    """The settings prepare_text's output depends on, for cache keys"""
+    corpus = boilerplate(boilerplate_pattern)[1]
+    return f"budget={token_budget()};boilerplate={hashlib.sha256(corpus.encode('utf-8')).hexdigest()[:16]}"
+
+
+def normalize_whitespace(text):
+    """Unix newlines, single spaces inside lines, no blank-line runs"""
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = [INLINE_SPACE.sub(' ', line).strip() for line in text.split('\n')]
+    collapsed = []
+    for line in lines:
+        if line or (collapsed and collapsed[-1]):
+            collapsed.append(line)
+    return '\n'.join(collapsed).strip()
+
+
+def is_boilerplate(key, exact, corpus):
+    if not key:
+        return False
+    if key in exact:
+        return True
+    # Wrapped or re-flowed terms: any long enough piece of the corpus
+    return len(key) >= MIN_FRAGMENT_CHARS and key in corpus
+
+
+def fit_budget(lines, budget):
+    """Lines that fit in budget tokens, data lines first, in their original order"""
+    costs = [count_tokens(line + '\n') for line in lines]
+    if sum(costs) <= budget:
+        return lines
+    keep = set()
+    used = 0
+    for data_pass in (True, False):
+        for idx, line in enumerate(lines):
+            if bool(DATA_LINE.search(line)) == data_pass and used + costs[idx] <= budget:
+                keep.add(idx)
+                used += costs[idx]
+    return [line for idx, line in enumerate(lines) if idx in keep]
+
+
+def prepare_text(text, budget=None, stats=None, boilerplate_pattern=None):
+    """Booking text reduced for the extraction prompt
+
+    budget is in (estimated) tokens, default TEXT_TOKEN_BUDGET; 0 means no
+    limit. If a dict is passed as stats it receives original_tokens, tokens,
+    boilerplate_lines, duplicate_lines and budget_lines (lines cut to fit).
+    """
+    if budget is None:
+        budget = token_budget()
+    exact, corpus = boilerplate(boilerplate_pattern)
+
+    lines = []
+    seen = set()
+    removed_boilerplate = removed_duplicates = 0
+    for line in normalize_whitespace(text).split('\n'):
+        key = fingerprint(line)
+        if PAGE_MARKER.match(line) or is_boilerplate(key, exact, corpus):
+            removed_boilerplate += 1
+            continue
+        # Repeated page headers / footers; lines with numbers may be real
+        # data (two identical room rows are two rooms), so they always stay
+        if key and key in seen and len(key) >= MIN_DUPLICATE_CHARS and not re.search(r'\d', line):
+            removed_duplicates += 1
+            continue
+        seen.add(key)
+        if line or (lines and lines[-1]):
+            lines.append(line)
+
+    kept = fit_budget(lines, budget) if budget > 0 else lines
+    prepared = PreparedText('\n'.join(kept).strip())
+    if stats is not None:
+        stats.update(original_tokens=count_tokens(text), tokens=count_tokens(prepared),
+                     boilerplate_lines=removed_boilerplate, duplicate_lines=removed_duplicates,
+                     budget_lines=sum(1 for line in lines if line) - sum(1 for line in kept if line))
+    return prepared
+
+
+def describe(stats):
+    """One-line report, e.g. for debug output"""
+    saved = stats['original_tokens'] - stats['tokens']
+    share = saved / stats['original_tokens'] if stats['original_tokens'] else 0
+    return (f"~{stats['original_tokens']} → ~{stats['tokens']} tokens ({share:.0%} saved; "
+            f"{stats['boilerplate_lines']} boilerplate, {stats['duplicate_lines']} duplicate, "
+            f"{stats['budget_lines']} over-budget lines removed)")
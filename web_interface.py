@@ -5,12 +5,18 @@ Drag-and-drop PDFs, Word docs, or paste text to generate confirmations
 """
 
 import os
-import json
 import tempfile
+import time
+import uuid
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify, send_file, session
+from flask import Flask, Response, render_template, request, jsonify, send_file, session
 from werkzeug.utils import secure_filename
-from claude_transform import CloudbedsTransformer
+from booking_store import BookingStore
+from client_pool import connection_stats, shared_transformer
+from document_text import extract_text
+from job_queue import DONE, FAILED, JobQueue
+from metrics import counter_lines, metrics
+from request_scheduler import get_scheduler
 import secrets
 
 app = Flask(__name__, template_folder='web_templates')
@@ -21,6 +27,16 @@ app.config['UPLOAD_FOLDER'].mkdir(exist_ok=True)
 
 ALLOWED_EXTENSIONS = {'pdf', 'docx', 'doc', 'txt'}
 
+# Generate HTML with Claude instead of the local templates
+GENERATE_WITH_LLM = os.getenv('GENERATE_WITH_LLM', 'false').lower() == 'true'
+
+# Extraction and generation run here so requests return straight away
+jobs = JobQueue()
+# Booking JSON lives server-side; the session cookie only carries its id
+bookings = BookingStore()
+MAX_SESSION_JOBS = 10
+PROGRESS_INTERVAL = 0.5  # seconds between progress updates while generating
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -30,65 +46,95 @@ def index():
     """Main upload page"""
     return render_template('upload.html')
 
-@app.route('/upload', methods=['POST'])
-def upload():
-    """Handle file upload or text paste"""
+def extract_document(report, filepath, filename):
+    """Job: extract booking data from an uploaded PDF, Word doc or text file"""
     try:
-        # Check if file or text was provided
-        if 'file' in request.files and request.files['file'].filename:
-            file = request.files['file']
+        # Extract data using Claude API
+        transformer = shared_transformer(debug=True)
+        report(stage='extracting')
+
+        if filename.lower().endswith('.pdf'):
+            booking_data = transformer.extract_booking_data(str(filepath))
+        else:  # .docx, .doc, .txt - converted on the document process pool
+            text_content = extract_text(filepath)
+            kind = 'Text file' if filename.lower().endswith('.txt') else 'Word document'
+
+            # Validate extraction
+            print(f"📄 Extracted {len(text_content)} characters from {kind.lower()}")
+            print(f"📝 Preview: {text_content[:200]}...")
 
-            if not allowed_file(file.filename):
-                return jsonify({'error': 'Invalid file type. Allowed: PDF, DOCX, DOC, TXT'}), 400
+            if len(text_content) < 50:
+                raise ValueError(f"{kind} appears empty (only {len(text_content)} characters extracted). Please check the file format.")
 
-            # Save file temporarily
-            filename = secure_filename(file.filename)
-            filepath = app.config['UPLOAD_FOLDER'] / filename
-            file.save(filepath)
+            booking_data = transformer.extract_from_text(text_content)
+    finally:
+        # Clean up temp file
+        Path(filepath).unlink(missing_ok=True)
+
+    return checked_booking(booking_data)
+
+def extract_pasted_text(report, text_content):
+    """Job: extract booking data from pasted text"""
+    transformer = shared_transformer(debug=True)
+    report(stage='extracting')
+    booking_data = transformer.extract_from_text(text_content)
+
+    # Validate extraction results
+    if not booking_data or not booking_data.get('guest_name'):
+        raise ValueError('Could not extract booking data. Please check the text format and try again.')
 
-            # Extract data using Claude API
-            transformer = CloudbedsTransformer(debug=True)
+    return checked_booking(booking_data)
 
-            if filename.lower().endswith('.pdf'):
-                booking_data = transformer.extract_booking_data(str(filepath))
-            elif filename.lower().endswith(('.docx', '.doc')):
-                # Extract text from Word doc (paragraphs AND tables)
-                from docx import Document
-                doc = Document(filepath)
+def checked_booking(booking_data):
+    """Log missing required fields (not fatal - they can be filled in on review)"""
+    # Validate booking data has minimum required fields
+    # Email is NOT required for agent bookings (guest hasn't arrived yet)
+    if booking_data.get('booking_type') == 'agent':
+        required_fields = ['guest_name', 'check_in', 'check_out', 'res_id']
+    else:
+        required_fields = ['guest_name', 'email', 'check_in', 'check_out', 'res_id']
 
-                # Extract from paragraphs
-                text_parts = [para.text for para in doc.paragraphs if para.text.strip()]
+    missing_fields = [f for f in required_fields if not booking_data.get(f)]
 
-                # Extract from tables (where most booking data usually is)
-                for table in doc.tables:
-                    for row in table.rows:
-                        row_text = ' | '.join([cell.text.strip() for cell in row.cells if cell.text.strip()])
-                        if row_text:
-                            text_parts.append(row_text)
+    if missing_fields:
+        print(f"⚠️ Warning: Missing fields: {', '.join(missing_fields)}")
+        # Don't fail, but log the warning
 
-                text_content = '\n'.join(text_parts)
+    print(f"✅ Extraction successful: {booking_data.get('guest_name', 'Unknown guest')}")
+    return booking_data
 
-                # Validate extraction
-                print(f"📄 Extracted {len(text_content)} characters from Word document")
-                print(f"📝 Preview: {text_content[:200]}...")
+def stored_booking(report, extract, *args):
+    """Job: run an extraction job function and keep its result in the booking store"""
+    booking_data = extract(report, *args)
+    return {'booking_id': bookings.create(booking_data), 'booking_data': booking_data}
 
-                if len(text_content) < 50:
-                    raise ValueError(f"Word document appears empty (only {len(text_content)} characters extracted). Please check the file format.")
+def current_booking():
+    """This browser's booking record, or None"""
+    return bookings.get(session.get('booking_id'))
 
-                booking_data = transformer.extract_from_text(text_content)
-            else:  # .txt
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    text_content = f.read()
+def submit_job(kind, fn, *args):
+    """Queue a job and remember it in this browser's session"""
+    job_id = jobs.submit(kind, fn, *args)
+    session['job_ids'] = (session.get('job_ids', []) + [job_id])[-MAX_SESSION_JOBS:]
+    return jsonify({'success': True, 'job_id': job_id, 'status_url': f'/jobs/{job_id}'}), 202
 
-                print(f"📄 Text file: {len(text_content)} characters")
+@app.route('/upload', methods=['POST'])
+def upload():
+    """Handle file upload or text paste (extraction runs as a background job)"""
+    try:
+        # Check if file or text was provided
+        if 'file' in request.files and request.files['file'].filename:
+            file = request.files['file']
 
-                if len(text_content) < 50:
-                    raise ValueError(f"Text file appears empty (only {len(text_content)} characters). Please check the file content.")
+            if not allowed_file(file.filename):
+                return jsonify({'error': 'Invalid file type. Allowed: PDF, DOCX, DOC, TXT'}), 400
 
-                booking_data = transformer.extract_from_text(text_content)
+            # Save file temporarily (unique name - uploads run concurrently)
+            filename = secure_filename(file.filename)
+            filepath = app.config['UPLOAD_FOLDER'] / f"{uuid.uuid4().hex}_{filename}"
+            file.save(filepath)
 
-            # Clean up temp file
-            filepath.unlink()
+            return submit_job('extract', stored_booking, extract_document, str(filepath), filename)
 
         elif 'text_content' in request.form and request.form['text_content'].strip():
             # Handle pasted text
@@ -100,91 +146,109 @@ def upload():
             if len(text_content) < 50:
                 return jsonify({'error': f'Text is too short ({len(text_content)} characters). Please paste the complete booking confirmation.'}), 400
 
-            transformer = CloudbedsTransformer(debug=True)
-            booking_data = transformer.extract_from_text(text_content)
-
-            # Validate extraction results
-            if not booking_data or not booking_data.get('guest_name'):
-                return jsonify({'error': 'Could not extract booking data. Please check the text format and try again.'}), 400
+            return submit_job('extract', stored_booking, extract_pasted_text, text_content)
         else:
             return jsonify({'error': 'Please upload a file or paste text'}), 400
 
-        # Validate booking data has minimum required fields
-        # Email is NOT required for agent bookings (guest hasn't arrived yet)
-        if booking_data.get('booking_type') == 'agent':
-            required_fields = ['guest_name', 'check_in', 'check_out', 'res_id']
-        else:
-            required_fields = ['guest_name', 'email', 'check_in', 'check_out', 'res_id']
-
-        missing_fields = [f for f in required_fields if not booking_data.get(f)]
-
-        if missing_fields:
-            print(f"⚠️ Warning: Missing fields: {', '.join(missing_fields)}")
-            # Don't fail, but log the warning
-
-        print(f"✅ Extraction successful: {booking_data.get('guest_name', 'Unknown guest')}")
-
-        # Store booking data in session for review
-        session['booking_data'] = booking_data
-
-        return jsonify({
-            'success': True,
-            'booking_data': booking_data,
-            'redirect': '/review'
-        })
-
-    except ValueError as e:
-        # Validation errors (empty files, etc.)
-        print(f"❌ Validation error: {str(e)}")
-        return jsonify({'error': str(e)}), 400
     except Exception as e:
         # Unexpected errors
         print(f"❌ Unexpected error: {str(e)}")
         import traceback
         traceback.print_exc()
-        return jsonify({'error': f'Extraction failed: {str(e)}'}), 500
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Poll a background job; a finished extraction becomes this session's booking"""
+    job = jobs.get(job_id) if job_id in session.get('job_ids', []) else None
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    response = {'job_id': job_id, 'kind': job['kind'], 'status': job['status'],
+                'progress': job['progress']}
+
+    if job['status'] == FAILED:
+        response['error'] = job['error']
+    elif job['status'] == DONE and job['kind'] == 'extract':
+        session['booking_id'] = job['result']['booking_id']
+        response.update(booking_data=job['result']['booking_data'], redirect='/review')
+    elif job['status'] == DONE and job['kind'] == 'generate':
+        response.update(job['result'], redirect='/success')
+
+    return jsonify(response)
+
+@app.route('/jobs/<job_id>/preview')
+def job_preview(job_id):
+    """Confirmation HTML generated so far by a generate job"""
+    job = jobs.get(job_id) if job_id in session.get('job_ids', []) else None
+    if job is None or job['kind'] != 'generate':
+        return "Job not found", 404
+
+    output = (job['result'] or {}).get('html_output') or job['progress'].get('output')
+    for path in (Path(output), Path(output + '.part')) if output else ():
+        if path.exists():
+            return Response(path.read_text(encoding='utf-8'), mimetype='text/html')
+    return Response('', mimetype='text/html')
 
 @app.route('/review')
 def review():
     """Review extracted booking data"""
-    booking_data = session.get('booking_data')
-    if not booking_data:
+    booking = current_booking()
+    if not booking:
         return "No booking data found. Please upload a file first.", 400
 
-    return render_template('review.html', data=booking_data)
+    return render_template('review.html', data=booking['booking_data'])
 
 @app.route('/update', methods=['POST'])
 def update():
     """Update booking data from review form"""
     try:
         updated_data = request.json
-        session['booking_data'] = updated_data
+        # Files generated from the old data no longer match it; /download
+        # 404s until the confirmation is generated again
+        if not bookings.update(session.get('booking_id'), booking_data=updated_data,
+                               html_output=None, pdf_output=None):
+            return jsonify({'error': 'No booking data found'}), 400
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def generate_document(report, booking_id):
+    """Job: generate and save the confirmation, reporting progress as HTML streams in"""
+    booking = bookings.get(booking_id)
+    if booking is None:
+        raise ValueError('Booking data has expired. Please upload the file again.')
+    booking_data = booking['booking_data']
+    transformer = shared_transformer(debug=True, use_llm=GENERATE_WITH_LLM)
+    html_output = transformer.output_path(booking_data)
+    received, last_report = 0, 0.0
+    report(output=str(html_output), chars=0)
+
+    for chunk in transformer.stream_confirmation(booking_data):
+        received += len(chunk)
+        if time.monotonic() - last_report > PROGRESS_INTERVAL:
+            report(output=str(html_output), chars=received)
+            last_report = time.monotonic()
+
+    report(output=str(html_output), chars=received, stage='pdf')
+    pdf_output = transformer.save_pdf(html_output)
+    bookings.update(booking_id, html_output=str(html_output),
+                    pdf_output=str(pdf_output) if pdf_output else None)
+    return {
+        'html_output': str(html_output),
+        'html_file': html_output.name,
+        'pdf_file': pdf_output.name if pdf_output else None,
+        'confirmation_number': booking_data.get('res_id', 'N/A')
+    }
+
 @app.route('/generate', methods=['POST'])
 def generate():
-    """Generate final confirmation"""
+    """Generate final confirmation (as a background job)"""
     try:
-        booking_data = session.get('booking_data')
-        if not booking_data:
+        if not current_booking():
             return jsonify({'error': 'No booking data found'}), 400
 
-        # Generate confirmation
-        transformer = CloudbedsTransformer(debug=True)
-        html_output, pdf_output = transformer.generate_confirmation(booking_data)
-
-        # Store output paths in session
-        session['html_output'] = str(html_output)
-        session['pdf_output'] = str(pdf_output)
-
-        return jsonify({
-            'success': True,
-            'html_file': html_output.name,
-            'pdf_file': pdf_output.name if pdf_output else None,
-            'confirmation_number': booking_data.get('res_id', 'N/A')
-        })
+        return submit_job('generate', generate_document, session['booking_id'])
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -193,13 +257,12 @@ def generate():
 def download(file_type):
     """Download generated HTML or PDF"""
     try:
-        if file_type == 'html':
-            filepath = session.get('html_output')
-        elif file_type == 'pdf':
-            filepath = session.get('pdf_output')
-        else:
+        if file_type not in ('html', 'pdf'):
             return "Invalid file type", 400
 
+        booking = current_booking() or {}
+        filepath = booking.get(f'{file_type}_output')
+
         if not filepath or not Path(filepath).exists():
             return "File not found", 404
 
@@ -208,11 +271,26 @@ def download(file_type):
     except Exception as e:
         return str(e), 500
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Stage latency, token, scheduler and connection counters (Prometheus text format)"""
+    body = (metrics.prometheus()
+            + counter_lines('booking_scheduler', 'Request scheduler', get_scheduler().stats.snapshot())
+            + counter_lines('booking_anthropic_connections', 'Shared client connection pool',
+                            connection_stats()))
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats/connections')
+def connection_reuse():
+    """Connection reuse counters for the shared Anthropic client"""
+    return jsonify(connection_stats())
+
 @app.route('/success')
 def success():
     """Success page with download links"""
-    html_file = session.get('html_output')
-    pdf_file = session.get('pdf_output')
+    booking = current_booking() or {}
+    html_file = booking.get('html_output')
+    pdf_file = booking.get('pdf_output')
 
     if not html_file:
         return "No confirmation generated yet.", 400